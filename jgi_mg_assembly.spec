@@ -18,6 +18,10 @@ module jgi_mg_assembly {
     Inputs for the Assembly pipeline.
     reads_upa:
         UPA for the input reads object. This should be a Paired-End Illumina reads file.
+    reads_upas (optional):
+        A list of UPAs for more Paired-End Illumina reads objects. All the reads given here, and in
+        reads_upa, get combined and assembled together (co-assembly). At least one of reads_upa or
+        reads_upas is required.
     workspace_name:
         name of the workspace to upload to at the end.
     output_assembly_name:
@@ -38,6 +42,7 @@ module jgi_mg_assembly {
     */
     typedef structure {
         reads_upa reads_upa;
+        list<reads_upa> reads_upas;
         string workspace_name;
         string output_assembly_name;
         string cleaned_reads_name;
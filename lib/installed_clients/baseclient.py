@@ -12,8 +12,11 @@ import requests as _requests
 import random as _random
 import os as _os
 import traceback as _traceback
+import threading as _threading
+from requests.adapters import HTTPAdapter as _HTTPAdapter
 from requests.exceptions import ConnectionError
 from urllib3.exceptions import ProtocolError
+from urllib3.util.retry import Retry as _Retry
 
 try:
     from configparser import ConfigParser as _ConfigParser  # py 3
@@ -31,6 +34,78 @@ _AJ = 'application/json'
 _URL_SCHEME = frozenset(['http', 'https'])
 _CHECK_JOB_RETRYS = 3
 
+# Connection pooling and retries for all the clients. Only failures to connect
+# are retried, since a call that reached the server may have already run.
+_MAX_RETRIES = 5
+_RETRY_BACKOFF = 0.5      # seconds, doubled after each retry
+_POOL_CONNECTIONS = 10    # number of hosts to keep connections to
+_POOL_MAXSIZE = 20        # number of connections to keep to each host
+_session = None
+_session_lock = _threading.Lock()
+# service method (or None, for all methods) -> max seconds between job checks,
+# overriding async_job_check_max_time_ms. See set_job_check_max_time.
+_job_check_max_times = dict()
+_job_check_lock = _threading.Lock()
+
+
+def configure_session(max_retries=_MAX_RETRIES, retry_backoff=_RETRY_BACKOFF,
+                      pool_connections=_POOL_CONNECTIONS,
+                      pool_maxsize=_POOL_MAXSIZE):
+    '''
+    Sets up the requests.Session shared by every client, and returns it.
+    max_retries - the number of times to retry a call that couldn't connect.
+    retry_backoff - the backoff factor between those retries, in seconds.
+    pool_connections - the number of hosts to keep connection pools for.
+    pool_maxsize - the number of connections to keep open to each host. This
+        should be at least the number of threads making calls at once.
+    Calls made after this use the new session.
+    '''
+    global _session
+    session = _make_session(max_retries, retry_backoff, pool_connections,
+                            pool_maxsize)
+    with _session_lock:
+        _session = session
+    return session
+
+
+def set_job_check_max_time(max_time_ms, service_method=None):
+    '''
+    Caps the time between checks on the state of jobs started by run_job (or
+    submit_job) at max_time_ms, for every client. If service_method (e.g.
+    BBTools.run_RQCFilter_local) is given, this only applies to jobs of that
+    method, otherwise to all of them. A method's own cap takes precedence.
+    With the defaults, the time between checks grows to 5 minutes, so a
+    long job can sit finished for that long before anyone notices.
+    '''
+    with _job_check_lock:
+        _job_check_max_times[service_method] = max_time_ms / 1000.0
+
+
+def _make_session(max_retries=_MAX_RETRIES, retry_backoff=_RETRY_BACKOFF,
+                  pool_connections=_POOL_CONNECTIONS,
+                  pool_maxsize=_POOL_MAXSIZE):
+    retries = _Retry(total=max_retries, connect=max_retries, read=0,
+                     status=0, backoff_factor=retry_backoff)
+    adapter = _HTTPAdapter(pool_connections=pool_connections,
+                           pool_maxsize=pool_maxsize, max_retries=retries)
+    session = _requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_session():
+    '''
+    Returns the shared session, making it with the defaults the first time.
+    Its connection pools are thread safe, so it's used by clients in every
+    thread, and connections get reused across clients and threads.
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _make_session()
+        return _session
+
 
 def _get_token(user_id, password, auth_svc):
     # This is bandaid helper function until we get a full
@@ -176,9 +251,9 @@ class BaseClient(object):
             arg_hash['context'] = context
 
         body = _json.dumps(arg_hash, cls=_JSONObjectEncoder)
-        ret = _requests.post(url, data=body, headers=self._headers,
-                             timeout=self.timeout,
-                             verify=not self.trust_all_ssl_certificates)
+        ret = _get_session().post(url, data=body, headers=self._headers,
+                                  timeout=self.timeout,
+                                  verify=not self.trust_all_ssl_certificates)
         ret.encoding = 'utf-8'
         if ret.status_code == 500:
             if ret.headers.get(_CT) == _AJ:
@@ -226,6 +301,13 @@ class BaseClient(object):
         return self._call(self.url, mod + '._' + meth + '_submit',
                           args, context)
 
+    def _job_check_max_time(self, service_method):
+        with _job_check_lock:
+            if service_method in _job_check_max_times:
+                return _job_check_max_times[service_method]
+            return _job_check_max_times.get(
+                None, self.async_job_check_max_time)
+
     def run_job(self, service_method, args, service_ver=None, context=None):
         '''
         Run a SDK method asynchronously.
@@ -237,33 +319,77 @@ class BaseClient(object):
             or dev/beta/release.
         context - the rpc context dict.
         '''
-        mod, _ = service_method.split('.')
-        job_id = self._submit_job(service_method, args, service_ver, context)
-        async_job_check_time = self.async_job_check_time
-        check_job_failures = 0
-        while check_job_failures < _CHECK_JOB_RETRYS:
-            time.sleep(async_job_check_time)
-            async_job_check_time = (async_job_check_time *
-                                    self.async_job_check_time_scale_percent /
-                                    100.0)
-            if async_job_check_time > self.async_job_check_max_time:
-                async_job_check_time = self.async_job_check_max_time
+        job_id = self.submit_job(service_method, args, service_ver, context)
+        return self.wait_for_jobs([(service_method, job_id)])[0]
+
+    def submit_job(self, service_method, args, service_ver=None,
+                   context=None):
+        '''
+        Start a SDK method asynchronously, and return its job id, to pass
+        to wait_for_jobs. Arguments are the same as run_job.
+        '''
+        return self._submit_job(service_method, args, service_ver, context)
 
+    def wait_for_jobs(self, jobs):
+        '''
+        Wait for several jobs started with submit_job to finish.
+        jobs - a list of (service_method, job_id) tuples.
+        Returns a list of the jobs' results, in the same order. Each job is
+        checked on its own schedule - the time between checks starts at
+        async_job_check_time_ms and grows by
+        async_job_check_time_scale_percent each time, up to the cap for that
+        method (see set_job_check_max_time). Raises a ServerError if a job
+        failed.
+        '''
+        now = time.time()
+        waiting = dict()
+        for i, (service_method, job_id) in enumerate(jobs):
+            waiting[i] = {
+                'service': service_method.split('.')[0],
+                'job_id': job_id,
+                'check_time': self.async_job_check_time,
+                'max_time': self._job_check_max_time(service_method),
+                'next_check': now + self.async_job_check_time,
+                'failures': 0
+            }
+        results = [None] * len(jobs)
+        while waiting:
+            i = min(waiting, key=lambda j: waiting[j]['next_check'])
+            job = waiting[i]
+            delay = job['next_check'] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            job['check_time'] = min(job['check_time'] *
+                                    self.async_job_check_time_scale_percent /
+                                    100.0, job['max_time'])
+            job['next_check'] = time.time() + job['check_time']
             try:
-                job_state = self._check_job(mod, job_id)
+                job_state = self._check_job(job['service'], job['job_id'])
             except (ConnectionError, ProtocolError):
                 _traceback.print_exc()
-                check_job_failures += 1
+                job['failures'] += 1
+                if job['failures'] >= _CHECK_JOB_RETRYS:
+                    raise RuntimeError(
+                        "_check_job failed {} times and exceeded limit".format(
+                            job['failures']))
                 continue
 
             if job_state['finished']:
-                if not job_state['result']:
-                    return
-                if len(job_state['result']) == 1:
-                    return job_state['result'][0]
-                return job_state['result']
-        raise RuntimeError("_check_job failed {} times and exceeded limit".format(
-            check_job_failures))
+                del waiting[i]
+                error = job_state.get('error')
+                if error:
+                    raise ServerError(error.get('name', 'Unknown'),
+                                      error.get('code', 0),
+                                      error.get('message'),
+                                      error.get('error'))
+                result = job_state.get('result')
+                if not result:
+                    results[i] = None
+                elif len(result) == 1:
+                    results[i] = result[0]
+                else:
+                    results[i] = result
+        return results
 
     def call_method(self, service_method, args, service_ver=None,
                     context=None):
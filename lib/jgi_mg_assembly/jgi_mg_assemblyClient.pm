@@ -123,6 +123,7 @@ $params is a jgi_mg_assembly.AssemblyPipelineParams
 $results is a jgi_mg_assembly.AssemblyPipelineResults
 AssemblyPipelineParams is a reference to a hash where the following keys are defined:
 	reads_upa has a value which is a jgi_mg_assembly.reads_upa
+	reads_upas has a value which is a reference to a list where each element is a jgi_mg_assembly.reads_upa
 	workspace_name has a value which is a string
 	output_assembly_name has a value which is a string
 	cleaned_reads_name has a value which is a string
@@ -149,6 +150,7 @@ $params is a jgi_mg_assembly.AssemblyPipelineParams
 $results is a jgi_mg_assembly.AssemblyPipelineResults
 AssemblyPipelineParams is a reference to a hash where the following keys are defined:
 	reads_upa has a value which is a jgi_mg_assembly.reads_upa
+	reads_upas has a value which is a reference to a list where each element is a jgi_mg_assembly.reads_upa
 	workspace_name has a value which is a string
 	output_assembly_name has a value which is a string
 	cleaned_reads_name has a value which is a string
@@ -411,6 +413,10 @@ a string
 Inputs for the Assembly pipeline.
 reads_upa:
     UPA for the input reads object. This should be a Paired-End Illumina reads file.
+reads_upas (optional):
+    A list of UPAs for more Paired-End Illumina reads objects. All the reads given here, and in
+    reads_upa, get combined and assembled together (co-assembly). At least one of reads_upa or
+    reads_upas is required.
 workspace_name:
     name of the workspace to upload to at the end.
 output_assembly_name:
@@ -437,6 +443,7 @@ debug (hidden option):
 <pre>
 a reference to a hash where the following keys are defined:
 reads_upa has a value which is a jgi_mg_assembly.reads_upa
+reads_upas has a value which is a reference to a list where each element is a jgi_mg_assembly.reads_upa
 workspace_name has a value which is a string
 output_assembly_name has a value which is a string
 cleaned_reads_name has a value which is a string
@@ -452,6 +459,7 @@ debug has a value which is a jgi_mg_assembly.boolean
 
 a reference to a hash where the following keys are defined:
 reads_upa has a value which is a jgi_mg_assembly.reads_upa
+reads_upas has a value which is a reference to a list where each element is a jgi_mg_assembly.reads_upa
 workspace_name has a value which is a string
 output_assembly_name has a value which is a string
 cleaned_reads_name has a value which is a string
@@ -37,8 +37,12 @@ class jgi_mg_assembly(object):
         """
         :param params: instance of type "AssemblyPipelineParams" (Inputs for
            the Assembly pipeline. reads_upa: UPA for the input reads object.
-           This should be a Paired-End Illumina reads file. workspace_name:
-           name of the workspace to upload to at the end.
+           This should be a Paired-End Illumina reads file. reads_upas
+           (optional): A list of UPAs for more Paired-End Illumina reads
+           objects. All the reads given here, and in reads_upa, get combined
+           and assembled together (co-assembly). At least one of reads_upa or
+           reads_upas is required. workspace_name: name of the workspace to
+           upload to at the end.
            output_assembly_name: name of the output assembly file.
            skip_rqcfilter: If 1, skip the RQCFilter step of the pipeline. If
            0, run it. (default = 0) cleaned_reads_name (optional): If not
@@ -54,7 +58,9 @@ class jgi_mg_assembly(object):
            various steps so it can run locally(ish). You probably don't want
            to do this in production, it's meant for testing.) -> structure:
            parameter "reads_upa" of type "reads_upa" (Should be only
-           Paired-end reads.), parameter "workspace_name" of String,
+           Paired-end reads.), parameter "reads_upas" of list of type
+           "reads_upa" (Should be only Paired-end reads.), parameter
+           "workspace_name" of String,
            parameter "output_assembly_name" of String, parameter
            "cleaned_reads_name" of String, parameter "filtered_reads_name" of
            String, parameter "skip_rqcfilter" of type "boolean" (A boolean -
@@ -6,6 +6,10 @@ from Bio import SeqIO
 from pprint import pprint, pformat
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.KBaseReportClient import KBaseReport
+from installed_clients.baseclient import (
+    configure_session,
+    set_job_check_max_time
+)
 
 from jgi_mg_assembly.runner.pipeline import Pipeline
 #END_HEADER
@@ -43,6 +47,22 @@ class jgi_mg_assembly:
         # saved in the constructor.
         self.callback_url = os.environ['SDK_CALLBACK_URL']
         self.scratch_dir = config['scratch']
+        # optional shared cache of deterministic step results - see runner/cache.py
+        self.cache_dir = config.get('result-cache-dir') or None
+        self.cache_max_gb = float(config.get('result-cache-max-gb') or 500)
+        # what drops unpaired reads after BFC: seqtk, or python for the in-process filter
+        self.dropse = config.get('dropse') or 'seqtk'
+        # zlib compression level (0-9) for the files in the report zip
+        self.report_compresslevel = int(config.get('report-compresslevel') or 6)
+        # where RQCFilter runs: remote (the BBTools module) or local (rqcfilter2.sh in this image)
+        self.rqcfilter = config.get('rqcfilter') or 'remote'
+        self.rqcfilter_data = config.get('rqcfilter-data') or None
+        # retries and connection pooling for the calls to the callback server (and other services)
+        configure_session(max_retries=int(config.get('client-max-retries') or 5),
+                          retry_backoff=float(config.get('client-retry-backoff') or 0.5))
+        # the most time between checks on whether a job on the callback server (e.g. RQCFilter) is done
+        if config.get('job-check-max-ms'):
+            set_job_check_max_time(int(config['job-check-max-ms']))
 
         #END_CONSTRUCTOR
         pass
@@ -52,8 +72,12 @@ class jgi_mg_assembly:
         """
         :param params: instance of type "AssemblyPipelineParams" (Inputs for
            the Assembly pipeline. reads_upa: UPA for the input reads object.
-           This should be a Paired-End Illumina reads file. workspace_name:
-           name of the workspace to upload to at the end.
+           This should be a Paired-End Illumina reads file. reads_upas
+           (optional): A list of UPAs for more Paired-End Illumina reads
+           objects. All the reads given here, and in reads_upa, get combined
+           and assembled together (co-assembly). At least one of reads_upa or
+           reads_upas is required. workspace_name: name of the workspace to
+           upload to at the end.
            output_assembly_name: name of the output assembly file.
            skip_rqcfilter: If 1, skip the RQCFilter step of the pipeline. If
            0, run it. (default = 0) cleaned_reads_name (optional): If not
@@ -69,7 +93,9 @@ class jgi_mg_assembly:
            various steps so it can run locally(ish). You probably don't want
            to do this in production, it's meant for testing.) -> structure:
            parameter "reads_upa" of type "reads_upa" (Should be only
-           Paired-end reads.), parameter "workspace_name" of String,
+           Paired-end reads.), parameter "reads_upas" of list of type
+           "reads_upa" (Should be only Paired-end reads.), parameter
+           "workspace_name" of String,
            parameter "output_assembly_name" of String, parameter
            "cleaned_reads_name" of String, parameter "filtered_reads_name" of
            String, parameter "skip_rqcfilter" of type "boolean" (A boolean -
@@ -92,7 +118,10 @@ class jgi_mg_assembly:
         # ctx is the context object
         # return variables are: results
         #BEGIN run_mg_assembly_pipeline
-        pipeline = Pipeline(self.callback_url, self.scratch_dir)
+        pipeline = Pipeline(self.callback_url, self.scratch_dir,
+                            cache_dir=self.cache_dir, cache_max_gb=self.cache_max_gb,
+                            dropse=self.dropse, report_compresslevel=self.report_compresslevel,
+                            rqcfilter=self.rqcfilter, rqcfilter_data=self.rqcfilter_data)
         results = pipeline.run(params)
         #END run_mg_assembly_pipeline
 
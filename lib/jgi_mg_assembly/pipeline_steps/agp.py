@@ -8,9 +8,10 @@ class AgpRunner(Step):
     def __init__(self, scratch_dir, output_dir):
         super(AgpRunner, self).__init__("createAGPFile", "BBTools", AGP_FILE_TOOL, scratch_dir, output_dir, False)
 
-    def run(self, spades_scaffolds, spades_contigs):
+    def run(self, spades_scaffolds, spades_contigs, max_memory_gb=40):
         """
         Runs bbmap/fungalrelease.sh to build AGP files and do some mapping and cleanup.
+        max_memory_gb sets the Java heap size (-Xmx).
         Returns a dictionary where values are paths to files and keys are the following:
         scaffolds - mapped scaffolds fasta file
         contigs - mapped contigs fasta file
@@ -32,7 +33,7 @@ class AgpRunner(Step):
         out_agp = os.path.join(agp_dir, "assembly.agp")
         out_legend = os.path.join(agp_dir, "assembly.scaffolds.legend")
         agp_cmd_params = [
-            "-Xmx40g",
+            "-Xmx{}g".format(max_memory_gb),
             "in={}".format(spades_scaffolds),
             "out={}".format(out_scaffolds),
             "outc={}".format(out_contigs),
@@ -55,5 +56,6 @@ class AgpRunner(Step):
             "agp_file": out_agp,
             "legend_file": out_legend,
             "command": command,
-            "version_string": self.version_string()
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
         }
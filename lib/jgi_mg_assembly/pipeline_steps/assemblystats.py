@@ -1,48 +1,56 @@
-from jgi_mg_assembly.pipeline_steps.step import Step
+"""
+Builds the assembly stats reports, the same as BBTools stats.sh would.
+
+This used to run stats.sh twice over the scaffolds - once with format=6 for the tab-delimited
+report, and once for the text report. It now uses the in-process engine in
+jgi_mg_assembly.utils.assembly_stats, which makes both files from a single pass over the
+scaffolds, without starting a JVM.
+"""
+from __future__ import print_function
 import os
+from jgi_mg_assembly.pipeline_steps.step import Step
 from jgi_mg_assembly.utils.util import mkdir
+from jgi_mg_assembly.utils.assembly_stats import assembly_stats
 
-
-BBTOOLS_STATS = "/kb/module/bbmap/stats.sh"
+BBTOOLS_STATS = "assembly_stats"
+STATS_VERSION = "jgi_mg_assembly in-process assembly stats, compatible with BBTools stats.sh"
 
 class StatsRunner(Step):
     def __init__(self, scratch_dir, output_dir):
         super(StatsRunner, self).__init__("BBTools stats", "BBTools", BBTOOLS_STATS, scratch_dir, output_dir, False)
 
+    def version_string(self):
+        return STATS_VERSION
+
     def run(self, scaffold_file):
+        """
+        Writes the stats.sh format=6 (tab-delimited) and text reports for scaffold_file under
+        the output_dir. The keys to the return dict are:
+        stats_tsv - the tab-delimited report
+        stats_txt - the text report
+        stats_err - a log file, kept for the report's list of files
+        """
+        if not os.path.exists(scaffold_file):
+            raise ValueError("The scaffold file '{}' can't be found!".format(scaffold_file))
         stats_output_dir = os.path.join(self.output_dir, "assembly_stats")
         mkdir(stats_output_dir)
         stats_output = os.path.join(stats_output_dir, "assembly.scaffolds.fasta.stats.tsv")
         stats_stdout = os.path.join(stats_output_dir, "assembly.scaffolds.fasta.stats.txt")
         stats_stderr = os.path.join(stats_output_dir, "stderr.out")
 
-        stats_first_params = [
-            "format=6",
-            "in={}".format(scaffold_file),
-            "1>",
-            stats_output,
-            "2>",
-            stats_stderr
-        ]
-        (exit_code, command) = super(StatsRunner, self).run(*stats_first_params)
-        if exit_code != 0:
-            raise RuntimeError("Unable to run first pass at stats to generate tab-delimited files!")
-
-        stats_second_params = [
-            "in={}".format(scaffold_file),
-            "1>",
-            stats_stdout,
-            "2>>",
-            stats_stderr
-        ]
-        (exit_code, command2) = super(StatsRunner, self).run(*stats_second_params)
-        if exit_code != 0:
-            raise RuntimeError("Unable to run second pass at stats to generate standard text files!")
+        command = "{} in={} format=6 out={} && {} in={} out={}".format(
+            self.base_command, scaffold_file, stats_output, self.base_command, scaffold_file, stats_stdout)
+        print("Running Pipeline Step: {}".format(self.step_name))
+        print("Running command: {}".format(command))
+        summary = assembly_stats(scaffold_file, stats_output, stats_stdout)
+        with open(stats_stderr, "w") as err:
+            err.write("Read {} scaffolds ({} bp) from {}\n".format(summary["n_scaffolds"], summary["scaf_bp"], scaffold_file))
+        print("Successfully ran {}".format(self.step_name))
 
         return {
             "stats_tsv": stats_output,
             "stats_txt": stats_stdout,
             "stats_err": stats_stderr,
             "version_string": self.version_string(),
-            "command": command + " && " + command2
+            "command": command
         }
@@ -8,11 +8,18 @@ class BBMapRunner(Step):
     def __init__(self, scratch_dir, output_dir):
         super(BBMapRunner, self).__init__("BBMap", "BBTools", BBMAP, scratch_dir, output_dir, False)
 
-    def run(self, reads_file, contigs_file):
+    def run(self, reads_file, contigs_file, max_memory_gb=100, threads=None):
         """
         Runs BBMap to map the given reads file (FASTQ) to the contigs file (FASTA).
         Returns the paths to the SAM file, coverage stats, and overall BBMap stats as
         map_file, coverage_file, and stats_file, respectively.
+
+        BBMap reads the reads file itself. (The filtered reads stats used to be gathered here, by
+        streaming the reads through Python into BBMap's standard input, but that capped BBMap at
+        Python's throughput - see the reads_info_filtered step in Pipeline._run_assembly_pipeline.)
+
+        max_memory_gb sets the Java heap size (-Xmx). If threads is given, BBMap uses that many
+        threads, otherwise it uses all the cores it can see.
         """
         bbmap_output_dir = os.path.join(self.output_dir, "readMappingPairs")
         mkdir(bbmap_output_dir)
@@ -22,24 +29,27 @@ class BBMapRunner(Step):
         bbmap_stats_output = os.path.join(bbmap_output_dir, "bbmap_stats.txt")
 
         bbmap_params = [
-            "-Xmx100g",
+            "-Xmx{}g".format(max_memory_gb),
             "nodisk=true",
             "interleaved=true",
             "ambiguous=random",
             "in={}".format(reads_file),
             "ref={}".format(contigs_file),
             "out={}".format(sam_output),
-            "covstats={}".format(coverage_stats_output),
-            "2>",
-            bbmap_stats_output
+            "covstats={}".format(coverage_stats_output)
         ]
-        (exit_code, command) = super(BBMapRunner, self).run(*bbmap_params)
+        if threads is not None:
+            bbmap_params.append("threads={}".format(threads))
+        (exit_code, command) = super(BBMapRunner, self).run_streaming(
+            *bbmap_params, stderr_file=bbmap_stats_output)
         if exit_code != 0:
             raise RuntimeError("An error occurred while running BBMap!")
+        command = "{} 2> {}".format(command, bbmap_stats_output)
         return {
             "map_file": sam_output,
             "coverage_file": coverage_stats_output,
             "stats_file": bbmap_stats_output,
             "command": command,
-            "version_string": self.version_string()
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
         }
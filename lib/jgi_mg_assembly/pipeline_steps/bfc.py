@@ -7,21 +7,29 @@ class BFCRunner(Step):
     def __init__(self, scratch_dir, output_dir):
         super(BFCRunner, self).__init__("BFC", "BFC", BFC, scratch_dir, output_dir, True)
 
-    def run(self, filtered_reads_file, debug=False):
+    def _options(self, debug, threads, genome_size):
+        options = ["-1", "-k", "21", "-t", str(threads)]
+        if not debug:
+            options = options + ["-s", genome_size]
+        return options
+
+    def run(self, filtered_reads_file, debug=False, threads=10, genome_size="10g"):
         """
         Takes in a (filtered) reads file, returns a dict with the keys:
         command - the command that was run
+        parameters - the BFC options, without the input and output files
         corrected_reads - the corrected fastq file
+
+        threads - the number of threads for BFC to use (-t)
+        genome_size - the approximate genome size (-s), used by BFC to size its bloom filter.
+                      This isn't used in debug mode.
         """
         # command:
         # bfc <flag params> filtered_fastq_file
         mkdir(os.path.join(self.output_dir, "bfc"))
         bfc_output_file = os.path.join(self.output_dir, "bfc", "bfc_output.fastq")
-        bfc_params = ["-1", "-k", "21", "-t", "10"]
-
-        if not debug:
-            bfc_params = bfc_params + ["-s", "10g"]
-        bfc_params = bfc_params + [filtered_reads_file, ">", bfc_output_file]
+        bfc_options = self._options(debug, threads, genome_size)
+        bfc_params = bfc_options + [filtered_reads_file, ">", bfc_output_file]
 
         (exit_code, command) = super(BFCRunner, self).run(*bfc_params)
 
@@ -29,6 +37,37 @@ class BFCRunner(Step):
             raise RuntimeError("An error occurred while running BFC!")
         return {
             "command": command,
+            "parameters": " ".join(bfc_options),
             "corrected_reads": bfc_output_file,
-            "version_string": self.version_string()
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
+        }
+
+    def start_streaming(self, filtered_reads_file, debug=False, threads=10, genome_size="10g"):
+        """
+        Starts BFC on a (filtered) reads file with the corrected reads going to a pipe instead
+        of a file, and returns the process. That can be passed on as the input to the next step
+        (see SeqtkRunner.run), then to finish_streaming once that step is done.
+        The options are the same as for run.
+        """
+        mkdir(os.path.join(self.output_dir, "bfc"))
+        bfc_params = self._options(debug, threads, genome_size) + [filtered_reads_file]
+        process = super(BFCRunner, self).start(*bfc_params)
+        if process is None:
+            raise RuntimeError("An error occurred while running BFC!")
+        return process
+
+    def finish_streaming(self, process):
+        """
+        Waits for a BFC process from start_streaming to finish, and returns the same dict as
+        run, without corrected_reads (those only went through the pipe).
+        """
+        (exit_code, command) = super(BFCRunner, self).finish(process)
+        if exit_code != 0:
+            raise RuntimeError("An error occurred while running BFC!")
+        return {
+            "command": command,
+            "parameters": " ".join(process.args[1:-1]),
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
         }
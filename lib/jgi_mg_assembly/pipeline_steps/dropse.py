@@ -0,0 +1,81 @@
+"""
+Drops unpaired reads from interleaved FASTQ, the same as seqtk dropse would.
+
+This is an in-process stand-in for SeqtkRunner, using the chunked filter in
+jgi_mg_assembly.utils.fastq.PairedReadsFilter. It takes the same inputs and returns the same
+results, so the pipeline can use either one (see the dropse option in deploy.cfg). Without an
+external seqtk process, the reads go straight from BFC (or a file) through the filter and the
+read length stats into the compressor.
+"""
+from __future__ import print_function
+import os
+import subprocess
+from jgi_mg_assembly.pipeline_steps.step import Step
+from jgi_mg_assembly.pipeline_steps.readlength import ReadLengthRunner
+from jgi_mg_assembly.utils.util import mkdir
+from jgi_mg_assembly.utils.fastq import (
+    FastqStatsTap,
+    PairedReadsFilter,
+    gzip_writer,
+    open_reads,
+    CHUNK_SIZE
+)
+
+DROPSE = "dropse"
+DROPSE_VERSION = "jgi_mg_assembly in-process dropse, compatible with seqtk dropse"
+PIGZ = "pigz"
+PIGZ_THREADS = 4
+
+class DropseRunner(Step):
+    def __init__(self, scratch_dir, output_dir):
+        super(DropseRunner, self).__init__("dropse", "SeqTK", DROPSE, scratch_dir, output_dir, False)
+
+    def version_string(self):
+        return DROPSE_VERSION
+
+    def run(self, corrected_reads, reads_info_file_name="corrected_readlen.txt", compress_threads=PIGZ_THREADS):
+        """
+        Drops the unpaired reads from the corrected reads, and compresses the results with pigz.
+        This takes the same arguments and returns the same dict as SeqtkRunner.run -
+        corrected_reads can be a file (plain or gzipped), or a running BFC process (see
+        BFCRunner.start_streaming).
+        """
+        zipped_output = os.path.join(self.output_dir, "bfc", "input.corr.fastq.gz")
+        piped = isinstance(corrected_reads, subprocess.Popen)
+        source = "-" if piped else corrected_reads
+        command = "{} in={} | {} -c - -p {} -2 > {}".format(self.base_command, source, PIGZ, compress_threads, zipped_output)
+        print("Running Pipeline Step: {}".format(self.step_name))
+        print("Running command: {}".format(command))
+
+        mkdir(os.path.dirname(zipped_output))
+        paired = PairedReadsFilter()
+        with gzip_writer(zipped_output, threads=compress_threads) as compressed:
+            tap = FastqStatsTap(compressed)
+            if piped:
+                self._filter(corrected_reads.stdout, paired, tap)
+                corrected_reads.stdout.close()
+            else:
+                with open_reads(corrected_reads) as reads:
+                    self._filter(reads, paired, tap)
+            tap.write(paired.finish())
+        print("Kept {} of {} reads, dropped {} unpaired reads".format(
+            paired.reads_out, paired.reads_in, paired.reads_in - paired.reads_out))
+        print("Successfully ran {}".format(self.step_name))
+
+        readlength = ReadLengthRunner(self.scratch_dir, self.output_dir)
+        reads_info = readlength.run_on_stats(tap.stats, "dropse output", reads_info_file_name)
+
+        return {
+            "command": command,
+            "cleaned_reads": zipped_output,
+            "reads_info": reads_info,
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
+        }
+
+    def _filter(self, reads, paired, out):
+        while True:
+            chunk = reads.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(paired.update(chunk))
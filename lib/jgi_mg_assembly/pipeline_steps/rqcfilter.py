@@ -1,31 +1,55 @@
 import os
 import json
 from time import time
-from installed_clients.BBToolsClient import BBTools
-from installed_clients.DataFileUtilClient import DataFileUtil
-from jgi_mg_assembly.utils.util import mkdir
+from installed_clients.baseclient import BaseClient
+from jgi_mg_assembly.utils.util import (
+    mkdir,
+    link_file
+)
 from jgi_mg_assembly.pipeline_steps.step import Step
 
+BBTOOLS_VERSION = "beta"
+RQCFILTER_METHOD = "BBTools.run_RQCFilter_local"
+RQCFILTER = "/kb/module/bbmap/rqcfilter2.sh"
+RQCFILTER_OUTPUT = "filtered.fastq.gz"
+
 class RQCFilterRunner(Step):
     """
     Acts as a runner for RQCFilter.
-    This has two functions.
+    This has three functions.
     run: does the job of invoking BBTools to run RQCFilter. This calls out to the
          KBase BBTools module and runs the app there, returning the results (see
          the run docstring for details).
+    run_local: runs rqcfilter2.sh from the BBTools installed in this image, with the
+               same parameters. run uses this instead of the BBTools module if the
+               runner was made with local=True. That saves copying the reads to the
+               BBTools container and the filtered reads back.
     run_skip: does a "fake" run of RQCFilter. This returns the same result structure
-              but does not run RQCFilter. Instead, it just compresses the given
-              reads file (as the results of RQCFilter are done) and creates an
-              empty log file.
+              but does not run RQCFilter. Instead, it just links the given reads
+              file into its output directory, and creates an empty log file.
               This way if the user (or a testing developer) wants to skip that step,
               the rest of the pipeline doesn't fork.
     """
 
-    def __init__(self, callback_url, scratch_dir, output_dir, options):
-        super(RQCFilterRunner, self).__init__("RQCFilter", "BBTools", None, scratch_dir, output_dir, False)
+    def __init__(self, callback_url, scratch_dir, output_dir, options, local=False, rqcfilter_data=None,
+                 threads=None, max_memory_gb=None):
+        """
+        local: if True, run rqcfilter2.sh here instead of through the BBTools module.
+        The rest only apply to local runs:
+        rqcfilter_data: the path to the RQCFilter reference data (RQCFilterData), if it's
+                        somewhere other than where rqcfilter2.sh expects it.
+        threads: the number of threads for RQCFilter to use (by default, all the cores it sees).
+        max_memory_gb: the Java heap size for RQCFilter, in GB. It's never more than the
+                       maxmem parameter.
+        """
+        super(RQCFilterRunner, self).__init__("RQCFilter", "BBTools", RQCFILTER, scratch_dir, output_dir, False)
         self.callback_url = callback_url
         self.skip = options.get("skip_rqcfilter")
         self.debug = options.get("debug")
+        self.local = local
+        self.rqcfilter_data = rqcfilter_data
+        self.threads = threads
+        self.max_memory_gb = max_memory_gb
 
     def get_parameters(self):
         return {
@@ -55,27 +79,81 @@ class RQCFilterRunner(Step):
         reads_file: string, the path to the FASTQ file to be filtered.
         result = dictionary with three keys -
             output_directory = path to the output directory
-            filtered_fastq_file = as it says, gzipped
+            filtered_fastq_file = as it says, gzipped (if skipped, it's the input reads file as is,
+                                  so the steps that use it have to take plain or gzipped FASTQ)
             run_log = path to the stderr log from RQCFilter
         """
         if (self.skip):
             return self.run_skip(reads_file)
+        if self.local:
+            return self.run_local(reads_file)
 
         print("Running RQCFilter remotely using the KBase-wrapped BBTools module...")
-        bbtools = BBTools(self.callback_url, service_ver='beta')
-        result = bbtools.run_RQCFilter_local({ "reads_file": reads_file }, self.get_parameters())
+        # The version lookup runs alongside RQCFilter, and both jobs are waited on together
+        # (the same calls as BBTools.run_RQCFilter_local and BBTools.bbtools_version).
+        client = BaseClient(self.callback_url)
+        jobs = [
+            (RQCFILTER_METHOD, client.submit_job(RQCFILTER_METHOD, [{"reads_file": reads_file}, self.get_parameters()],
+                                                 BBTOOLS_VERSION)),
+            ("BBTools.bbtools_version", client.submit_job("BBTools.bbtools_version", [], BBTOOLS_VERSION))
+        ]
+        (result, bbtools_version) = client.wait_for_jobs(jobs)
         print("Done running RQCFilter")
         result.update({
-            "command": result.get("run_command", "BBTools.run_RQCFilter_local {}".format(json.dumps(self.get_parameters()))),
-            "version_string": "KBase BBTools module - BBTools version {}".format(bbtools.bbtools_version())
+            "command": result.get("run_command", "{} {}".format(RQCFILTER_METHOD, json.dumps(self.get_parameters()))),
+            "version_string": "KBase BBTools module - BBTools version {}".format(bbtools_version)
         })
         return result
 
+    def run_local(self, reads_file):
+        """
+        Runs rqcfilter2.sh on reads_file in this container, with the same parameters the
+        BBTools module gets (see get_parameters), and returns the same result structure as run.
+        The filtered reads and logs are put in the rqcfilter directory of the output directory.
+        """
+        outdir = os.path.join(self.output_dir, "rqcfilter")
+        mkdir(outdir)
+        run_log = os.path.join(outdir, "rqcfilter.log")
+        parameters = self.get_parameters()
+        max_memory_gb = parameters.pop("maxmem")
+        if self.max_memory_gb is not None:
+            max_memory_gb = min(max_memory_gb, self.max_memory_gb)
+        rqcfilter_params = [
+            "-Xmx{}g".format(max_memory_gb),
+            "jni=t",
+            "in={}".format(reads_file),
+            "path={}".format(outdir),
+            "out={}".format(RQCFILTER_OUTPUT),
+            "usetmpdir=t",
+            "tmpdir={}".format(self.scratch_dir)
+        ]
+        if self.threads is not None:
+            rqcfilter_params.append("threads={}".format(self.threads))
+        if self.rqcfilter_data:
+            rqcfilter_params.append("rqcfilterdata={}".format(self.rqcfilter_data))
+        rqcfilter_params.extend("{}={}".format(key, value) for (key, value) in sorted(parameters.items()))
+
+        (exit_code, command) = super(RQCFilterRunner, self).run_streaming(*rqcfilter_params, stderr_file=run_log)
+        if exit_code != 0:
+            raise RuntimeError("An error occurred while running RQCFilter!")
+        filtered_reads = os.path.join(outdir, RQCFILTER_OUTPUT)
+        if not os.path.exists(filtered_reads):
+            raise RuntimeError("RQCFilter didn't make its filtered reads file {}".format(filtered_reads))
+        return {
+            "output_directory": outdir,
+            "filtered_fastq_file": filtered_reads,
+            "run_log": run_log,
+            "command": "{} 2> {}".format(command, run_log),
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
+        }
+
     def run_skip(self, reads_file):
         """
         Doesn't run RQCFilter, but a dummy skip version. It returns the same
         result structure, so it doesn't derail the other pipeline steps. However, the
-        "filtered_fastq_file" is the unchanged fastq file, other than gzipping it.
+        "filtered_fastq_file" is the unchanged fastq file, linked (not copied) into the output
+        directory. It isn't compressed - BFC and BBMap read plain or gzipped FASTQ the same.
         run_log is just an empty (but existing!) file.
         """
         print("NOT running RQCFilter, just putting together some results.")
@@ -85,16 +163,9 @@ class RQCFilterRunner(Step):
         # mock up a log file
         dummy_log = os.path.join(outdir, "dummy_rqcfilter_log.txt")
         open(dummy_log, 'w').close()
-        # just compress the reads and move them into that output dir (probably don't need to
-        # move them, but let's be consistent)
-        dfu = DataFileUtil(self.callback_url)
-        compressed_reads = dfu.pack_file({
-            "file_path": reads_file,
-            "pack": "gzip"
-        })["file_path"]
-        base_name = os.path.basename(compressed_reads)
-        not_filtered_reads = os.path.join(outdir, base_name)
-        os.rename(compressed_reads, not_filtered_reads)
+        # link the reads into that output dir (probably don't need to, but let's be consistent)
+        not_filtered_reads = os.path.join(outdir, os.path.basename(reads_file))
+        link_file(reads_file, not_filtered_reads)
         return {
             "output_directory": outdir,
             "filtered_fastq_file": not_filtered_reads,
@@ -1,40 +1,61 @@
 from jgi_mg_assembly.pipeline_steps.step import Step
+from jgi_mg_assembly.pipeline_steps.readlength import ReadLengthRunner
+from jgi_mg_assembly.utils.fastq import (
+    FastqStatsTap,
+    gzip_writer
+)
+from jgi_mg_assembly.utils.util import mkdir
 import os
+import subprocess
 
 SEQTK = "/kb/module/bin/seqtk"
 PIGZ = "pigz"
+PIGZ_THREADS = 4
 
 class SeqtkRunner(Step):
     def __init__(self, scratch_dir, output_dir):
-        super(SeqtkRunner, self).__init__("SeqTK", "SeqTK", SEQTK, scratch_dir, output_dir, True)
+        super(SeqtkRunner, self).__init__("SeqTK", "SeqTK", SEQTK, scratch_dir, output_dir, False)
 
-    def run(self, corrected_reads):
+    def run(self, corrected_reads, reads_info_file_name="corrected_readlen.txt", compress_threads=PIGZ_THREADS):
         """
+        Runs seqtk dropse on the corrected reads, and compresses the results with pigz.
+        The read length stats of the cleaned reads are gathered as they stream from seqtk
+        to pigz, so they don't need to be decompressed and read again later.
+
+        corrected_reads can be a file, or a running BFC process (see BFCRunner.start_streaming).
+        In that case, the corrected reads are piped straight from BFC into seqtk, and never get
+        written to disk uncompressed.
+        compress_threads - the number of threads for pigz to use
+
         Returns the following dict:
         - command - string, the run command
         - version_string - string, the version tag
         - cleaned_reads - string, path to the zipped cleaned reads file
+        - reads_info - dict, the read length stats of the cleaned reads, in the same format
+          as ReadLengthRunner.run returns, with the report file named reads_info_file_name
         """
         zipped_output = os.path.join(self.output_dir, "bfc", "input.corr.fastq.gz")
+        piped = isinstance(corrected_reads, subprocess.Popen)
         seqtk_params = [
             "dropse",
-            corrected_reads,
-            "|",
-            PIGZ,
-            "-c",
-            "-",
-            "-p",
-            "4",
-            "-2",
-            ">",
-            zipped_output
+            "-" if piped else corrected_reads
         ]
-        (exit_code, command) = super(SeqtkRunner, self).run(*seqtk_params)
+        mkdir(os.path.dirname(zipped_output))
+        with gzip_writer(zipped_output, threads=compress_threads) as compressed:
+            tap = FastqStatsTap(compressed)
+            (exit_code, command) = super(SeqtkRunner, self).run_streaming(
+                *seqtk_params, stdin=corrected_reads if piped else None, stdout=tap)
         if exit_code != 0:
             raise RuntimeError("Error while running seqtk!")
+        command = "{} | {} -c - -p {} -2 > {}".format(command, PIGZ, compress_threads, zipped_output)
+
+        readlength = ReadLengthRunner(self.scratch_dir, self.output_dir)
+        reads_info = readlength.run_on_stats(tap.stats, "seqtk dropse output", reads_info_file_name)
 
         return {
             "command": command,
             "cleaned_reads": zipped_output,
-            "version_string": self.version_string()
+            "reads_info": reads_info,
+            "version_string": self.version_string(),
+            "resource_profile": self.resource_profile()
         }
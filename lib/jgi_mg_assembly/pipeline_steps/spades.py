@@ -10,6 +10,8 @@ from jgi_mg_assembly.utils.util import (
 )
 
 SPADES = "/opt/SPAdes-3.12.0-Linux/bin/spades.py"
+# the k values SPAdes gets run with, as in the JGI pipeline (see SpadesRunner.run)
+SPADES_KMERS = [33, 55, 77, 99, 127]
 
 class SpadesRunner(Step):
     def __init__(self, scratch_dir, output_dir):
@@ -27,19 +29,20 @@ class SpadesRunner(Step):
             - info about the reads from readlength.py. This uses the output_file and avg keys.
         :param options: dict
             - "max_memory" - max allowed memory in GB (default 2000)
+            - "threads" - number of threads to use (default 32)
         """
         spades_output_dir = os.path.join(self.output_dir, "spades", "spades3")
         mkdir(spades_output_dir)
 
-        spades_kmers = [33, 55, 77, 99, 127]
-        used_kmers = [k for k in spades_kmers if k <= reads_info["avg"]]
+        used_kmers = [k for k in SPADES_KMERS if k <= reads_info["avg"]]
 
         max_memory = str(options.get("max_memory", 2000))
+        threads = str(options.get("threads", 32))
 
         spades_params = ["--only-assembler",
                          "-k", ",".join(map(str, used_kmers)),
                          "--meta",
-                         "-t", "32",
+                         "-t", threads,
                          "-m", max_memory,
                          "-o", spades_output_dir,
                          "--12", input_file]
@@ -68,6 +71,7 @@ class SpadesRunner(Step):
         return_dict = {
             "command": command,
             "version_string": self.version_string(),
+            "resource_profile": self.resource_profile(),
             "output_dir": spades_output_dir,
             "run_log": os.path.join(spades_output_dir, "spades.log"),
             "params_log": os.path.join(spades_output_dir, "params.txt")
@@ -1,7 +1,14 @@
 from __future__ import print_function
 import subprocess
+import threading
 from configparser import ConfigParser  # py3
 import sys
+from jgi_mg_assembly.utils.profiler import (
+    ProcessProfiler,
+    combine_profiles
+)
+
+STREAM_CHUNK_SIZE = 16 * 1024 * 1024
 
 class Step(object):
     def __init__(self, name, version_name, base_command, scratch_dir, output_dir, shell_cmd):
@@ -24,6 +31,9 @@ class Step(object):
         except:
             self.version = "version unknown"
         self.version_name = version_name
+        self.profiles = list()
+        # profilers and command strings of processes started with start, keyed by pid
+        self._started = dict()
 
     def run(self, *params):
         """
@@ -36,6 +46,7 @@ class Step(object):
         exception raising based on the exit code.
 
         Returns the exit code, and the command string (concatenated with spaces), mainly for reporting out to the user.
+        The command's resource use gets added to self.profiles (see resource_profile).
         """
         command = [self.base_command] + list(params)
         print("In working directory: ")
@@ -47,10 +58,80 @@ class Step(object):
             run_command = " ".join(run_command)
         try:
             p = subprocess.Popen(run_command, cwd=self.scratch_dir, shell=self.shell_cmd)
-            exit_code = p.wait()
+            profiler = ProcessProfiler(p.pid)
+            profiler.start()
+            exit_code = profiler.wait(p)
+            self._add_profile(profiler.stop())
+        except OSError:
+            exit_code = -1
+            print("========================================\nPipeline step {} raised an OSError exception!\nIt's possible that the tool was not found, or should be run in a shell.")
+
+        if exit_code == 0:
+            print("Successfully ran {}".format(self.step_name), file=sys.stdout)
+        else:
+            print("========================================\nPipeline step {} returned a nonzero error code!\nCommand: {}\nExit code: {}\n\n".format(self.step_name, ' '.join(command), exit_code), file=sys.stderr)
+        return (exit_code, ' '.join(command))
+
+    def run_streaming(self, *params, stdin=None, stdout=None, stderr_file=None):
+        """
+        params: the list of command line parameters to use for the command.
+        stdin: optional, a readable binary file-like object. Its contents get streamed into the
+               command's standard input. This can also be a process returned by another step's
+               start, in which case that process's output is piped straight into this command.
+        stdout: optional, a writable binary file-like object. The command's standard output gets
+                streamed into it.
+        stderr_file: optional, path to a file to write the command's standard error to.
+
+        This works like run, except that the command's input and output can be passed through
+        Python as they're read and written, in large chunks. That way something like a stats
+        counter can watch the data go by, without having to write it to disk and read it again.
+        The command is never run in a shell here, so it can't contain pipes or redirects.
+
+        Returns the exit code and the command string, the same as run.
+        """
+        command = [self.base_command] + list(params)
+        print("In working directory: ")
+        print("Running Pipeline Step: {}".format(self.step_name))
+        print("Running command: {}".format(command))
+
+        piped = isinstance(stdin, subprocess.Popen)
+        stdin_arg = None
+        if piped:
+            stdin_arg = stdin.stdout
+        elif stdin is not None:
+            stdin_arg = subprocess.PIPE
+        err_handle = open(stderr_file, "w") if stderr_file else None
+        try:
+            p = subprocess.Popen(command, cwd=self.scratch_dir,
+                                 stdin=stdin_arg,
+                                 stdout=subprocess.PIPE if stdout is not None else None,
+                                 stderr=err_handle)
         except OSError:
+            p = None
             exit_code = -1
             print("========================================\nPipeline step {} raised an OSError exception!\nIt's possible that the tool was not found, or should be run in a shell.")
+        finally:
+            if err_handle is not None:
+                err_handle.close()
+            if piped:
+                # the command has its own copy of the pipe now. Closing this one means the
+                # upstream process gets a broken pipe if this command exits early.
+                stdin.stdout.close()
+
+        if p is not None:
+            profiler = ProcessProfiler(p.pid)
+            profiler.start()
+            feeder = None
+            if stdin is not None and not piped:
+                feeder = threading.Thread(target=_pump, args=(stdin, p.stdin, True))
+                feeder.start()
+            if stdout is not None:
+                _pump(p.stdout, stdout, False)
+                p.stdout.close()
+            exit_code = profiler.wait(p)
+            self._add_profile(profiler.stop())
+            if feeder is not None:
+                feeder.join()
 
         if exit_code == 0:
             print("Successfully ran {}".format(self.step_name), file=sys.stdout)
@@ -58,5 +139,81 @@ class Step(object):
             print("========================================\nPipeline step {} returned a nonzero error code!\nCommand: {}\nExit code: {}\n\n".format(self.step_name, ' '.join(command), exit_code), file=sys.stderr)
         return (exit_code, ' '.join(command))
 
+    def start(self, *params, stderr_file=None):
+        """
+        params: the list of command line parameters to use for the command.
+        stderr_file: optional, path to a file to write the command's standard error to.
+
+        Starts the command with its standard output going to a pipe, and returns the process
+        without waiting for it to finish. This is for the first command of a pipe between steps -
+        pass the returned process as the stdin of the next step's run_streaming, then call finish
+        with it. Like run_streaming, the command is never run in a shell.
+
+        Returns None if the command couldn't be started.
+        """
+        command = [self.base_command] + list(params)
+        print("Running Pipeline Step: {}".format(self.step_name))
+        print("Running command: {}".format(command))
+        err_handle = open(stderr_file, "w") if stderr_file else None
+        try:
+            p = subprocess.Popen(command, cwd=self.scratch_dir, stdout=subprocess.PIPE, stderr=err_handle)
+        except OSError:
+            print("========================================\nPipeline step {} raised an OSError exception!\nIt's possible that the tool was not found, or should be run in a shell.")
+            return None
+        finally:
+            if err_handle is not None:
+                err_handle.close()
+        profiler = ProcessProfiler(p.pid)
+        profiler.start()
+        self._started[p.pid] = (profiler, ' '.join(command))
+        return p
+
+    def finish(self, process):
+        """
+        Waits for a process returned by start to finish, and returns the exit code and the
+        command string, the same as run.
+        """
+        (profiler, command) = self._started.pop(process.pid)
+        exit_code = profiler.wait(process)
+        self._add_profile(profiler.stop())
+        if exit_code == 0:
+            print("Successfully ran {}".format(self.step_name), file=sys.stdout)
+        else:
+            print("========================================\nPipeline step {} returned a nonzero error code!\nCommand: {}\nExit code: {}\n\n".format(self.step_name, command, exit_code), file=sys.stderr)
+        return (exit_code, command)
+
     def version_string(self):
         return "{} {}".format(self.version_name, self.version)
+
+    def resource_profile(self):
+        """
+        Returns the combined resource use of all the commands this step has run - wall_time and
+        cpu_time (seconds), peak_rss, read_bytes, and write_bytes (bytes), and the number of
+        processes. Returns None if nothing has been run.
+        """
+        return combine_profiles(self.profiles)
+
+    def _add_profile(self, profile):
+        print("Pipeline step {} resource use: {}".format(self.step_name, profile))
+        self.profiles.append(profile)
+
+
+def _pump(source, sink, close_sink):
+    """
+    Copies everything from source to sink in big chunks. If the reader on the other end goes
+    away early, this just stops - the exit code of that process tells the real story.
+    """
+    try:
+        while True:
+            chunk = source.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        if close_sink:
+            try:
+                sink.close()
+            except BrokenPipeError:
+                pass
@@ -0,0 +1,288 @@
+"""
+A content-addressed cache of pipeline step results, shared between jobs.
+
+Some steps (BFC, Seqtk, fungalrelease.sh, stats.sh, read length stats) always produce the same
+output from the same input files, parameters, and tool version. The cache stores those outputs
+under a key made from all three, so if the same data gets run through the pipeline again - say,
+a user re-runs an app with a different output name - those steps get their results from the
+cache instead of running again.
+
+Input files are keyed by a digest of their contents. Files that came out of a cached step get a
+digest derived from that step's key instead, so a chain of cached steps only has to read the
+first input file - the same chain of steps on the same input always gets the same keys. Files
+whose contents are fixed by where they came from (the downloaded reads, or the output of a step
+that isn't cached, like RQCFilter) can be given a digest of that instead (see set_source), so
+they never have to be read at all.
+
+Output files are hard-linked into and out of the cache when it's on the same filesystem as the
+scratch space (copied otherwise), so a cache hit is nearly free. The cached files are made
+read-only, and before a step gets run again in an output directory, any of its old output files
+that are still linked to the cache have to be unlinked (see unshare_files), so writing the new
+output can't change a cache entry. The cache has a maximum size, and the least recently used
+entries get removed when it's over that.
+
+A cache hit doesn't use any resources, so the resource_profile of each command in a cached
+output is replaced with CACHE_HIT_PROFILE.
+
+The cache directory is meant to be shared, so changes to it happen under an exclusive lock on
+a lock file in that directory.
+"""
+from __future__ import print_function
+import os
+import json
+import errno
+import fcntl
+import shutil
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from jgi_mg_assembly.utils.util import mkdir
+from jgi_mg_assembly.runner.manifest import output_files
+
+ENTRY_FILE = "entry.json"
+ENTRIES_DIR = "entries"
+TMP_DIR = "tmp"
+LOCK_FILE = ".lock"
+OUTPUT_DIR_MARKER = "$OUTPUT_DIR"
+DIGEST_CHUNK_SIZE = 16 * 1024 * 1024
+READ_ONLY = 0o444
+CACHE_HIT_PROFILE = {"cache_hit": True}
+
+# Step parameters that only change how fast a tool runs, not what it makes, so they're left out
+# of the cache key. Otherwise a job that lands on a node with a different number of cores
+# would never see a cache hit.
+IGNORED_PARAMS = ["threads", "compress_threads", "max_memory_gb"]
+
+
+def _replace_strings(value, old, new):
+    """
+    Returns a copy of value (nested dicts, lists, and strings) with old replaced by new in all
+    strings.
+    """
+    if isinstance(value, dict):
+        return {k: _replace_strings(v, old, new) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_strings(v, old, new) for v in value]
+    if isinstance(value, str):
+        return value.replace(old, new)
+    return value
+
+
+def _mark_cache_hits(value):
+    """
+    Returns a copy of a cached output dict with every resource_profile replaced by
+    CACHE_HIT_PROFILE.
+    """
+    if isinstance(value, dict):
+        return {k: dict(CACHE_HIT_PROFILE) if k == "resource_profile" else _mark_cache_hits(v)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mark_cache_hits(v) for v in value]
+    return value
+
+
+def _link_or_copy(src, dest):
+    """
+    Hard links src to dest, or copies it if they're on different filesystems. Anything
+    already at dest gets replaced. A copy gets the default permissions, not src's.
+    """
+    mkdir(os.path.dirname(dest))
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(src, dest)
+
+
+def unshare_files(paths):
+    """
+    Removes any of paths that are hard linked to another file (like a cache entry), or are
+    read-only, so a step that's about to write them again makes new files instead of writing
+    into the cached ones.
+    """
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        if os.stat(path).st_nlink > 1 or not os.access(path, os.W_OK):
+            os.remove(path)
+
+
+class ResultCache(object):
+    def __init__(self, cache_dir, max_size_gb):
+        """
+        cache_dir: the directory to keep the cache in. This gets created if it doesn't exist.
+        max_size_gb: the maximum total size of the cached files, in GB.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_gb * 1024 ** 3)
+        self._digests = dict()
+        self._digests_lock = threading.Lock()
+        mkdir(os.path.join(cache_dir, ENTRIES_DIR))
+        mkdir(os.path.join(cache_dir, TMP_DIR))
+
+    def key(self, step_name, version, input_files, params):
+        """
+        Builds the cache key for a step run.
+        step_name: the pipeline step name.
+        version: the tool version string (Step.version_string()).
+        input_files: the list of files the step reads.
+        params: a dict of any other parameters that affect the output. These need to be
+                JSON-serializable, and shouldn't contain paths that change from run to run.
+        Any input_files that are None (an optional input that isn't there) are keyed as missing.
+        """
+        params = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+        key_source = json.dumps({
+            "step": step_name,
+            "version": version,
+            "inputs": [None if f is None else self.digest(f) for f in input_files],
+            "params": params
+        }, sort_keys=True)
+        return hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+
+    def digest(self, path):
+        """
+        Returns the content digest of the file at path. These are remembered as long as the file
+        doesn't change, so each file only gets read once.
+        """
+        file_id = self._file_id(path)
+        with self._digests_lock:
+            if file_id in self._digests:
+                return self._digests[file_id]
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(DIGEST_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._digests_lock:
+            self._digests[file_id] = digest
+        return digest
+
+    @staticmethod
+    def _file_id(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+    def set_source(self, path, source):
+        """
+        Keys the file at path by where it came from, instead of by its contents, so it never has
+        to be read. source is anything JSON-serializable that fully determines what's in the file
+        - say, the workspace reference of the reads it was downloaded from, or the cache key (see
+        key) of the step that made it, even if that step's results aren't cached.
+        """
+        source = json.dumps(source, sort_keys=True)
+        digest = hashlib.sha1("source:{}".format(source).encode("utf-8")).hexdigest()
+        with self._digests_lock:
+            self._digests[self._file_id(path)] = digest
+
+    def _set_derived_digests(self, key, files, output_dir):
+        """
+        Gives each output file of a cached step a digest derived from the step's key and the
+        file's place in the output directory.
+        """
+        for path in files:
+            rel_path = os.path.relpath(path, output_dir)
+            digest = hashlib.sha1("{}:{}".format(key, rel_path).encode("utf-8")).hexdigest()
+            with self._digests_lock:
+                self._digests[self._file_id(path)] = digest
+
+    def fetch(self, key, output_dir):
+        """
+        Looks up a cached step result. If it's there, its files get linked into output_dir and
+        its output dict is returned, with paths pointing into output_dir, and each
+        resource_profile replaced by CACHE_HIT_PROFILE. Returns None if the key isn't in the
+        cache.
+        """
+        entry_dir = os.path.join(self.cache_dir, ENTRIES_DIR, key)
+        with self._lock():
+            entry_file = os.path.join(entry_dir, ENTRY_FILE)
+            if not os.path.exists(entry_file):
+                return None
+            with open(entry_file, "r") as f:
+                entry = json.load(f)
+            restored = list()
+            for rel_path in entry["files"]:
+                dest = os.path.join(output_dir, rel_path)
+                _link_or_copy(os.path.join(entry_dir, "files", rel_path), dest)
+                restored.append(dest)
+            # mark it as recently used
+            os.utime(entry_file, None)
+        self._set_derived_digests(key, restored, output_dir)
+        return _mark_cache_hits(_replace_strings(entry["output"], OUTPUT_DIR_MARKER, output_dir))
+
+    def store(self, key, output, output_dir):
+        """
+        Adds a step's output dict to the cache under key. All the files in the output that are
+        inside output_dir get stored with it, and made read-only. Afterward, the least recently
+        used entries are removed until the cache fits in its maximum size.
+        """
+        files = list()
+        for path in output_files(output):
+            if path not in files and not os.path.relpath(path, output_dir).startswith(".."):
+                files.append(path)
+        tmp_dir = os.path.join(self.cache_dir, TMP_DIR, "{}.{}.{}".format(key, os.getpid(), threading.get_ident()))
+        mkdir(tmp_dir)
+        size = 0
+        rel_paths = list()
+        for path in files:
+            rel_path = os.path.relpath(path, output_dir)
+            cached_path = os.path.join(tmp_dir, "files", rel_path)
+            _link_or_copy(path, cached_path)
+            os.chmod(cached_path, READ_ONLY)
+            size += os.path.getsize(path)
+            rel_paths.append(rel_path)
+        with open(os.path.join(tmp_dir, ENTRY_FILE), "w") as f:
+            json.dump({
+                "output": _replace_strings(output, output_dir, OUTPUT_DIR_MARKER),
+                "files": rel_paths,
+                "size": size,
+                "created": time.time()
+            }, f)
+        entry_dir = os.path.join(self.cache_dir, ENTRIES_DIR, key)
+        with self._lock():
+            if os.path.exists(entry_dir):
+                # another job stored the same thing first.
+                shutil.rmtree(tmp_dir)
+            else:
+                os.rename(tmp_dir, entry_dir)
+            self._evict()
+        self._set_derived_digests(key, files, output_dir)
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache is under its maximum size.
+        Expects to be called with the lock held.
+        """
+        entries_dir = os.path.join(self.cache_dir, ENTRIES_DIR)
+        entries = list()
+        total = 0
+        for key in os.listdir(entries_dir):
+            entry_file = os.path.join(entries_dir, key, ENTRY_FILE)
+            try:
+                with open(entry_file, "r") as f:
+                    size = json.load(f)["size"]
+                entries.append((os.path.getmtime(entry_file), size, key))
+                total += size
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+        for (last_used, size, key) in sorted(entries):
+            if total <= self.max_size:
+                break
+            print("Removing result cache entry {} ({} bytes)".format(key, size))
+            shutil.rmtree(os.path.join(entries_dir, key), ignore_errors=True)
+            total -= size
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,93 @@
+"""
+Runs a set of pipeline steps as a dependency graph.
+
+Each step is registered with the names of the steps whose outputs it needs. Once all of a step's
+dependencies have finished it gets handed to a thread pool, so independent branches of the
+pipeline (say, assembly stats and read mapping) run at the same time. The steps themselves mostly
+wait on external programs, so threads are enough here.
+"""
+from __future__ import print_function
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED
+)
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class StepGraph(object):
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        max_workers: the maximum number of steps that can be run at once.
+        """
+        self.max_workers = max_workers
+        self.steps = dict()
+        self.dependencies = dict()
+
+    def add_step(self, name, step_fn, depends_on=None):
+        """
+        Adds a step to the graph.
+        name: the name of the step, used as the key to its output in the results.
+        step_fn: a function that takes a single parameter - a dict of the outputs of all completed
+                 steps, keyed by step name - and returns the output of this step.
+        depends_on: a list of names of steps that must complete before this one can start.
+        """
+        if name in self.steps:
+            raise ValueError("A step named '{}' was already added".format(name))
+        self.steps[name] = step_fn
+        self.dependencies[name] = list(depends_on or [])
+
+    def run(self):
+        """
+        Runs all steps in the graph, starting each one as soon as its dependencies are done.
+        Returns a dict of step name -> step output.
+
+        If a step raises an exception, no new steps are started. Steps that are already running
+        are allowed to finish, then the first exception gets raised.
+        """
+        self._validate()
+        results = dict()
+        pending = set(self.steps.keys())
+        running = dict()
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [name for name in sorted(pending)
+                             if all(dep in results for dep in self.dependencies[name])]
+                    for name in ready:
+                        pending.remove(name)
+                        running[executor.submit(self.steps[name], dict(results))] = name
+                if not running:
+                    break
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print("Pipeline step {} failed, waiting for running steps to finish.".format(name))
+                        if error is None:
+                            error = e
+        if error is not None:
+            raise error
+        return results
+
+    def _validate(self):
+        """
+        Makes sure that every dependency is a known step, and that there are no cycles.
+        Raises a ValueError otherwise.
+        """
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                if dep not in self.steps:
+                    raise ValueError("Step '{}' depends on unknown step '{}'".format(name, dep))
+        resolved = set()
+        remaining = set(self.steps.keys())
+        while remaining:
+            ready = [name for name in remaining if all(dep in resolved for dep in self.dependencies[name])]
+            if not ready:
+                raise ValueError("Steps {} have circular dependencies".format(", ".join(sorted(remaining))))
+            resolved.update(ready)
+            remaining.difference_update(ready)
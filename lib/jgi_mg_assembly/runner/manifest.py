@@ -0,0 +1,164 @@
+"""
+A persistent record of the pipeline steps that have been run for a single set of inputs.
+
+The manifest lives as a JSON file in the pipeline's output directory. For each step it keeps
+the step's output dict, fingerprints of the files the step read, fingerprints of the files it
+wrote, and whether it finished. When a job gets retried with the same reads and parameters, the
+pipeline can use this to skip every step that already completed and pick up at the first step
+that didn't.
+"""
+from __future__ import print_function
+import os
+import json
+import hashlib
+import time
+import threading
+
+MANIFEST_FILE = "pipeline_manifest.json"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETE = "complete"
+STATUS_FAILED = "failed"
+
+
+def run_key(reads_upa, options):
+    """
+    Builds a short, stable key out of the input reads UPA (or list of UPAs) and the options that change what the
+    pipeline computes. Two runs with the same key are expected to produce the same step outputs.
+    """
+    key_source = json.dumps({
+        "reads_upa": reads_upa,
+        "options": options
+    }, sort_keys=True)
+    return hashlib.sha1(key_source.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_file(path):
+    """
+    Returns a cheap fingerprint of a file - its path, size, and modification time - or None if
+    the file doesn't exist. Hashing the contents of a multi-hundred GB reads file would cost more
+    than some of the steps, so this is what's used to tell if a file has changed.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime
+    }
+
+
+def output_files(output):
+    """
+    Finds all the existing file paths in a step output dict, including nested dicts and lists.
+    """
+    files = list()
+    if isinstance(output, dict):
+        for value in output.values():
+            files.extend(output_files(value))
+    elif isinstance(output, (list, tuple)):
+        for value in output:
+            files.extend(output_files(value))
+    elif isinstance(output, str) and os.path.isabs(output) and os.path.isfile(output):
+        files.append(output)
+    return files
+
+
+class StepManifest(object):
+    def __init__(self, output_dir, key):
+        """
+        output_dir: the pipeline output directory, where the manifest file is kept.
+        key: the run key (see run_key) for this run. If an existing manifest was made under a
+             different key, it's ignored and overwritten.
+        """
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.key = key
+        self.steps = dict()
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as manifest_file:
+                    manifest = json.load(manifest_file)
+                if manifest.get("run_key") == key:
+                    self.steps = manifest.get("steps", dict())
+                    print("Found a pipeline manifest from a previous run with {} recorded steps.".format(len(self.steps)))
+            except ValueError:
+                print("Unable to read the existing pipeline manifest at {}, starting over.".format(self.path))
+
+    def completed_output(self, step_name, input_files):
+        """
+        Returns the recorded output dict of step_name if it finished in a previous run, its
+        input files are unchanged, and all of the files it wrote are still there unchanged.
+        Returns None otherwise, meaning the step needs to be run.
+        """
+        entry = self.steps.get(step_name)
+        if entry is None or entry.get("status") != STATUS_COMPLETE:
+            return None
+        if entry.get("inputs") != [fingerprint_file(f) for f in input_files]:
+            return None
+        for fingerprint in entry.get("outputs", []):
+            if fingerprint_file(fingerprint["path"]) != fingerprint:
+                return None
+        return entry["output"]
+
+    def recorded_output(self, step_name):
+        """
+        Returns the output dict recorded for step_name by a previous run (whether or not its
+        inputs have changed since), or None if there isn't one.
+        """
+        entry = self.steps.get(step_name)
+        if entry is None:
+            return None
+        return entry.get("output")
+
+    def start(self, step_name, input_files):
+        """
+        Records that step_name has started on the given input files.
+        """
+        inputs = [fingerprint_file(f) for f in input_files]
+        with self._lock:
+            self.steps[step_name] = {
+                "status": STATUS_RUNNING,
+                "inputs": inputs,
+                "started": time.time()
+            }
+            self._save()
+
+    def complete(self, step_name, output):
+        """
+        Records that step_name finished with the given output dict. Any files referenced in the
+        output get fingerprinted so they can be checked on the next run.
+        """
+        outputs = [fingerprint_file(f) for f in output_files(output)]
+        with self._lock:
+            self.steps[step_name].update({
+                "status": STATUS_COMPLETE,
+                "output": output,
+                "outputs": outputs,
+                "finished": time.time()
+            })
+            self._save()
+
+    def fail(self, step_name, error):
+        """
+        Records that step_name failed with the given error message.
+        """
+        with self._lock:
+            self.steps[step_name].update({
+                "status": STATUS_FAILED,
+                "error": error,
+                "finished": time.time()
+            })
+            self._save()
+
+    def _save(self):
+        """
+        Writes the manifest to a temp file, then moves it into place, so a job that gets killed
+        mid-write doesn't leave a truncated manifest behind. Expects to be called with the lock
+        held, since steps can finish concurrently.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump({"run_key": self.key, "steps": self.steps}, manifest_file, indent=4)
+        os.replace(tmp_path, self.path)
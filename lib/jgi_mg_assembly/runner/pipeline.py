@@ -1,41 +1,115 @@
 import time
 import os
-import subprocess
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from jgi_mg_assembly.utils.report import ReportUtil
+from jgi_mg_assembly.utils.report_archive import (
+    ReportArchive,
+    DEFAULT_COMPRESSLEVEL
+)
 from jgi_mg_assembly.utils.util import mkdir
 from jgi_mg_assembly.utils.file import FileUtil
+from jgi_mg_assembly.utils.resources import ResourcePlan
+from jgi_mg_assembly.utils.preflight import size_reads
+from jgi_mg_assembly.utils.kmers import (
+    count_kmers,
+    assembly_memory_gb
+)
 from jgi_mg_assembly.pipeline_steps.readlength import ReadLengthRunner
 from jgi_mg_assembly.pipeline_steps.rqcfilter import RQCFilterRunner
 from jgi_mg_assembly.pipeline_steps.bfc import BFCRunner
 from jgi_mg_assembly.pipeline_steps.seqtk import SeqtkRunner
-from jgi_mg_assembly.pipeline_steps.spades import SpadesRunner
+from jgi_mg_assembly.pipeline_steps.dropse import DropseRunner
+from jgi_mg_assembly.pipeline_steps.spades import (
+    SpadesRunner,
+    SPADES_KMERS
+)
 from jgi_mg_assembly.pipeline_steps.agp import AgpRunner
 from jgi_mg_assembly.pipeline_steps.assemblystats import StatsRunner
 from jgi_mg_assembly.pipeline_steps.bbmap import BBMapRunner
-from installed_clients.BBToolsClient import BBTools
+from jgi_mg_assembly.runner.graph import StepGraph
+from jgi_mg_assembly.runner.manifest import (
+    StepManifest,
+    output_files,
+    run_key
+)
+from jgi_mg_assembly.runner.cache import (
+    ResultCache,
+    unshare_files
+)
 
-PIGZ = "pigz"
 MAX_MEMORY = 1500        # GB memory
 MAX_READS_SIZE = 200     # GB disk
+DISK_HEADROOM = 1.1      # extra space to leave when decompressing reads for upload
+FASTQ_RECORD_OVERHEAD = 100   # bytes per read for the header, + line, and newlines
+GZIP_FASTQ_RATIO = 4     # rough compression ratio of FASTQ, when there's nothing better to go on
+DEFAULT_CACHE_MAX_GB = 500
+# what drops the unpaired reads after BFC - the seqtk binary, or the in-process filter
+DROPSE_RUNNERS = {
+    "seqtk": SeqtkRunner,
+    "python": DropseRunner
+}
+# where RQCFilter runs - through the BBTools module, or with the BBTools in this image
+RQCFILTER_MODES = ["remote", "local"]
+
+
+def _estimate_fastq_size(reads_file, reads_info):
+    """
+    Estimates the uncompressed size in bytes of a gzipped FASTQ file. If reads_info (as made by
+    ReadLengthRunner) is available, this uses the read and base counts (each base is in the
+    sequence and quality lines), otherwise it guesses from the compressed size.
+    """
+    if reads_info and "bases" in reads_info and "count" in reads_info:
+        return 2 * reads_info["bases"] + FASTQ_RECORD_OVERHEAD * reads_info["count"]
+    return os.path.getsize(reads_file) * GZIP_FASTQ_RATIO
+
 
 class Pipeline(object):
-    def __init__(self, callback_url, scratch_dir):
+    def __init__(self, callback_url, scratch_dir, cache_dir=None, cache_max_gb=None, dropse="seqtk",
+                 report_compresslevel=DEFAULT_COMPRESSLEVEL, rqcfilter="remote", rqcfilter_data=None):
         """
         Initialize a few things. Starting points, paths, etc.
+        If cache_dir is given, the results of deterministic steps are cached there (see
+        runner/cache.py), with the cache limited to cache_max_gb GB.
+        dropse picks what drops the unpaired reads after BFC - "seqtk" (seqtk dropse) or
+        "python" (the in-process DropseRunner).
+        report_compresslevel is the zlib compression level (0-9) for the files in the report zip.
+        rqcfilter picks where RQCFilter runs - "remote" (the BBTools module) or "local"
+        (rqcfilter2.sh in this image, with its reference data at rqcfilter_data).
         """
+        if dropse not in DROPSE_RUNNERS:
+            raise ValueError("Unknown dropse option '{}', expected one of: {}".format(
+                dropse, ", ".join(sorted(DROPSE_RUNNERS))))
+        if rqcfilter not in RQCFILTER_MODES:
+            raise ValueError("Unknown rqcfilter option '{}', expected one of: {}".format(
+                rqcfilter, ", ".join(RQCFILTER_MODES)))
+        self.dropse_runner = DROPSE_RUNNERS[dropse]
+        self.rqcfilter_local = rqcfilter == "local"
+        self.rqcfilter_data = rqcfilter_data
         self.callback_url = callback_url
         self.scratch_dir = scratch_dir
         self.timestamp = int(time.time() * 1000)
         self.output_dir = os.path.join(self.scratch_dir, "jgi_mga_output_{}".format(self.timestamp))
-        mkdir(self.output_dir)
         self.file_util = FileUtil(callback_url)
+        self.manifest = None
+        self.report_compresslevel = report_compresslevel
+        self.report_archive = None
+        self.cache = None
+        if cache_dir:
+            self.cache = ResultCache(cache_dir, cache_max_gb or DEFAULT_CACHE_MAX_GB)
 
     def run(self, params):
         """
         Run the pipeline!
         1. Validate parameters and param combinations.
-        2. Run RQC filtering (might be external app or local method - see kbaseapps/BBTools repo)
-        3. Run the Pipeline script as provided by JGI.
+           Reads can be given as reads_upa, reads_upas (a list of libraries to co-assemble), or
+           both.
+        2. Set up the output directory and step manifest. If a previous run with the same reads
+           and options left a manifest behind, its completed steps get reused.
+        3. Run RQC filtering (might be external app or local method - see kbaseapps/BBTools repo)
+        4. Run the Pipeline script as provided by JGI.
+        5. Upload the results and build the report (at the same time), then save the report.
         """
         self._validate_params(params)
         options = {
@@ -43,29 +117,44 @@ class Pipeline(object):
             "debug": bool(params.get("debug"))
         }
 
-        # Fetch reads files
-        files = self.file_util.fetch_reads_files([params["reads_upa"]])
-        reads_files = list(files.values())
+        reads_upas = self._get_reads_upas(params)
+
+        key = run_key(reads_upas, options)
+        self.output_dir = os.path.join(self.scratch_dir, "jgi_mga_output_{}".format(key))
+        mkdir(self.output_dir)
+        self.manifest = StepManifest(self.output_dir, key)
+
+        # Fetch reads files, and combine them if there's more than one library.
+        reads = self._run_step("fetch_reads", [], self._fetch_reads, reads_upas)
+        if self.cache is not None:
+            # the fetched reads are keyed by where they came from, which saves hashing them all.
+            self.cache.set_source(reads["reads_file"], {"reads_upas": reads_upas})
 
         # run the pipeline.
-        pipeline_output = self._run_assembly_pipeline(reads_files[0], options)
+        pipeline_output = self._run_assembly_pipeline(reads["reads_file"], options)
 
         upload_kwargs = {
             "cleaned_reads_name": params.get("cleaned_reads_name"),
             "filtered_reads_name": params.get("filtered_reads_name"),
             "skip_rqcfilter": params.get("skip_rqcfilter"),
-            "input_reads": params.get("reads_upa")
+            "input_reads": reads_upas[0]
         }
 
-        stored_objects = self._upload_pipeline_result(
-            pipeline_output,
-            params["workspace_name"],
-            params["output_assembly_name"],
-            **upload_kwargs
-        )
-        print("upload complete")
-        print(stored_objects)
-        report_info = self._build_and_upload_report(pipeline_output,
+        # The uploads and the report files don't depend on each other, so they're done at the
+        # same time. Only the final report object needs the uploaded object references.
+        report_util = ReportUtil(self.callback_url, self.output_dir, compresslevel=self.report_compresslevel)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            upload = executor.submit(self._upload_pipeline_result,
+                                     pipeline_output,
+                                     params["workspace_name"],
+                                     params["output_assembly_name"],
+                                     **upload_kwargs)
+            report = executor.submit(report_util.prepare_report, pipeline_output, archive=self.report_archive)
+            stored_objects = upload.result()
+            print("upload complete")
+            print(stored_objects)
+            prepared_report = report.result()
+        report_info = self._build_and_upload_report(prepared_report,
                                                     stored_objects,
                                                     params["workspace_name"])
         return_objects = {
@@ -75,22 +164,173 @@ class Pipeline(object):
         return_objects.update(stored_objects)
         return return_objects
 
-    def _check_memory_use(self, reads_file):
-        bbtools = BBTools(self.callback_url, service_ver="beta")
-        mem_estimate = bbtools.run_mem_estimator({
-            "reads_file": reads_file
-        })
+    def _get_reads_upas(self, params):
+        """
+        Returns the list of reads UPAs to assemble. That's reads_upa (if given) followed by
+        everything in reads_upas, in order, without duplicates. Empty entries are skipped (the
+        app's default for reads_upas is [""]).
+        """
+        reads_upas = list()
+        candidates = [params.get("reads_upa")] + list(params.get("reads_upas") or [])
+        for upa in candidates:
+            if upa and upa not in reads_upas:
+                reads_upas.append(upa)
+        return reads_upas
+
+    def _fetch_reads(self, reads_upas):
+        """
+        Downloads all the reads libraries (concurrently), then concatenates them into a single
+        interleaved file for co-assembly. The combined file is built by appending onto the first
+        downloaded file, so there's never an extra full copy of the reads.
+        Returns a dict with key reads_file - the path to the combined reads file.
+        """
+        files = self.file_util.fetch_reads_files(reads_upas)
+        reads_files = [files[upa] for upa in reads_upas]
+        if len(reads_files) > 1:
+            print("Combining {} reads libraries for co-assembly.".format(len(reads_files)))
+        return {
+            "reads_file": self.file_util.concatenate_reads_files(reads_files)
+        }
+
+    def _run_step(self, step_name, input_files, step_fn, *args, **kwargs):
+        """
+        Runs a single pipeline step by calling step_fn(*args, **kwargs) and returns its output.
+        step_name - the name to record the step under in the manifest
+        input_files - list of file paths the step reads. If any of these change between runs,
+                      the step gets run again.
+
+        If the step manifest shows this step already completed on the same input files, and its
+        output files are still around, the recorded output is returned without running anything.
+        """
+        if self.manifest is None:
+            return step_fn(*args, **kwargs)
+        output = self.manifest.completed_output(step_name, input_files)
+        if output is not None:
+            print("Pipeline step {} completed in a previous run, reusing its results.".format(step_name))
+            return output
+        self.manifest.start(step_name, input_files)
+        try:
+            output = step_fn(*args, **kwargs)
+        except Exception as e:
+            self.manifest.fail(step_name, str(e))
+            raise
+        self.manifest.complete(step_name, output)
+        return output
+
+    def _run_cached_step(self, step_name, version, input_files, step_fn, *args, **kwargs):
+        """
+        Runs a deterministic pipeline step through _run_step, using the result cache if there is
+        one. If the cache has a result for the same tool version, input file contents, and
+        parameters, it gets used instead of running step_fn. Otherwise, step_fn runs and its
+        result gets stored in the cache.
+        version - the tool version string, from the step's runner.
+        Other arguments are the same as _run_step. Any of args that are input files are keyed by
+        their contents, not their paths. An input file can be None, if it's optional and missing.
+
+        Before the step gets run again, the output files recorded for it by a previous run in this
+        output directory are unlinked from the cache (see runner/cache.unshare_files), so the
+        step can't write into a cache entry.
+        """
+        if self.cache is None:
+            return self._run_step(step_name, input_files, step_fn, *args, **kwargs)
+        previous_output = None
+        if self.manifest is not None:
+            previous_output = self.manifest.recorded_output(step_name)
+
+        def cached_step_fn(*args, **kwargs):
+            params = dict(kwargs)
+            params["args"] = ["input_file_{}".format(input_files.index(arg)) if arg is not None and arg in input_files
+                              else arg.replace(self.output_dir, "") if isinstance(arg, str)
+                              else arg
+                              for arg in args]
+            key = self.cache.key(step_name, version, input_files, params)
+            output = self.cache.fetch(key, self.output_dir)
+            if output is not None:
+                print("Found the result of pipeline step {} in the result cache.".format(step_name))
+                return output
+            unshare_files([f for f in output_files(previous_output)
+                           if not os.path.relpath(f, self.output_dir).startswith("..")])
+            output = step_fn(*args, **kwargs)
+            self.cache.store(key, output, self.output_dir)
+            return output
+
+        return self._run_step(step_name, input_files, cached_step_fn, *args, **kwargs)
+
+    def _correct_reads(self, filtered_reads, debug=False, threads=10, genome_size="10g", compress_threads=4):
+        """
+        Runs BFC on the filtered reads and streams its output through seqtk dropse (or the
+        in-process DropseRunner) into the compressed, cleaned reads file:
+            bfc ... filtered_reads | seqtk dropse - | pigz > input.corr.fastq.gz
+        so the uncompressed corrected reads never get written to disk.
+        Returns a dict with the BFCRunner.finish_streaming result under "bfc" and the
+        SeqtkRunner.run (or DropseRunner.run) result under "seqtk".
+        """
+        bfc = BFCRunner(self.scratch_dir, self.output_dir)
+        seqtk = self.dropse_runner(self.scratch_dir, self.output_dir)
+        bfc_process = bfc.start_streaming(filtered_reads, debug=debug, threads=threads, genome_size=genome_size)
+        try:
+            seqtk_result = seqtk.run(bfc_process, compress_threads=compress_threads)
+        except Exception:
+            bfc_process.kill()
+            bfc.finish(bfc_process)
+            raise
+        # if BFC died partway, seqtk would have just seen the end of its input, so BFC's exit code
+        # is what says whether the cleaned reads are complete.
+        bfc_result = bfc.finish_streaming(bfc_process)
+        return {
+            "bfc": bfc_result,
+            "seqtk": seqtk_result
+        }
+
+    def _preflight(self, reads_file):
+        """
+        Sizes up the input reads from a sample at the start of the file (see utils/preflight.py),
+        so reads that are too big get turned away before any of the real work, and the estimated
+        number of bases can go into the resource plan.
+        The sampled memory estimate is only recorded, not checked - the memory check after
+        filtering and error correction is what decides whether the reads can be assembled.
+        Raises a RuntimeError if the reads file is over MAX_READS_SIZE. Otherwise, returns the
+        size_reads result, plus the file size in GB (size).
+        """
+        sizing = size_reads(reads_file)
+        sizing["size"] = float(sizing["file_size"]) / 1024 ** 3
+        print("Pre-flight sizing of the input reads: {}".format(sizing))
+        if sizing["size"] > MAX_READS_SIZE:
+            raise RuntimeError("Unable to run the Metagenome Assembly Pipeline on your reads: "
+                "This size of your reads is approximately {} GB, which exceeds the "
+                "maximum of {} GB.".format(round(sizing["size"], 2), MAX_READS_SIZE))
+        return sizing
+
+    def _check_memory_use(self, reads_file, max_memory=MAX_MEMORY, threads=None):
+        """
+        Counts the distinct k-mers in all the reads for each k SPAdes will use (see
+        utils/kmers.count_kmers), to make sure that the reads can be assembled with the memory
+        and disk we have. max_memory is the memory (in GB) that the assembly can use, and threads
+        is the number of threads to count with.
+        Raises a RuntimeError if not, otherwise returns the estimate as a dict with keys:
+        estimate - the estimated memory needed, in GB, from the k with the most distinct k-mers
+        size - the size of the reads file, in GB
+        kmer_counts - dict of k (as a string) -> the number of distinct k-mers
+        """
+        kmer_counts = count_kmers(reads_file, ks=SPADES_KMERS, threads=threads)
+        mem_estimate = {
+            "estimate": assembly_memory_gb(max(kmer_counts.values())),
+            "size": float(os.path.getsize(reads_file)) / 1024 ** 3,
+            "kmer_counts": {str(k): count for (k, count) in kmer_counts.items()}
+        }
+        print("Memory estimate for assembling the reads: {}".format(mem_estimate))
         errors = list()
-        if mem_estimate["estimate"] > MAX_MEMORY:
+        if mem_estimate["estimate"] > max_memory:
             errors.append("Your reads are estimated to require {} GB "
                 "of memory to assemble, which is over the limit of {} "
-                "GB available.".format(round(mem_estimate["estimate"], 2), MAX_MEMORY))
+                "GB available.".format(round(mem_estimate["estimate"], 2), max_memory))
         if mem_estimate["size"] > MAX_READS_SIZE:
             errors.append("This size of your reads is approximately {} GB, which exceeds the "
                 "maximum of {} GB.".format(round(mem_estimate["size"], 2), MAX_READS_SIZE))
         if len(errors) > 0:
             raise RuntimeError("Unable to run the Metagenome Assembly "
                 "Pipeline on your reads: {}".format("\n".join(errors)))
+        return mem_estimate
 
     def _validate_params(self, params):
         """
@@ -100,7 +340,9 @@ class Pipeline(object):
         If not, just returns happily.
         """
         errors = []
-        if params.get("reads_upa") is None:
+        if params.get("reads_upas") is not None and not isinstance(params["reads_upas"], list):
+            errors.append("reads_upas must be a list of Reads objects!")
+        elif not self._get_reads_upas(params):
             errors.append("Missing a Reads object!")
         if params.get("output_assembly_name") is None:
             errors.append("Missing the output assembly name!")
@@ -115,52 +357,115 @@ class Pipeline(object):
 
     def _run_assembly_pipeline(self, files, options):
         """
-        :param files: (currently) a single paired-end file for input to the pipeline.
+        :param files: a single interleaved paired-end file for input to the pipeline. If there were
+            multiple input libraries, they've already been combined into this one.
         :param options: a dict, with possible keys:
             debug - boolean, generally set to True when tests are running.
             skip_rqcfilter - boolean, if True, will not run RQCFilter.
 
         Runs the complete JGI assembly pipeline and returns all the outputs from each step.
-        1. Get initial reads info.
-        2. RQCFilter.
-        3. Get filtered reads info.
-        4. BFC
-        5. SeqTK
-        6. Get corrected reads info.
-        7. SPAdes
-        8. AGP file / etc. with fungalrelease.sh
-        9. Assembly stats.
-        10. BBMap.
-        11. Return structure with resulting files and objects.
+        1. Pre-flight sizing of the reads.
+        2. Get initial reads info.
+        3. RQCFilter.
+        4. Get filtered reads info, while BFC runs.
+        5. BFC, piped into SeqTK, getting the corrected reads info as they're compressed.
+        6. SPAdes
+        7. AGP file / etc. with fungalrelease.sh
+        8. Assembly stats.
+        9. BBMap.
+        10. Return structure with resulting files and objects.
+
+        Each step is run through _run_step, so steps recorded as complete in the manifest from a
+        previous run are skipped. Steps are run as a dependency graph (see runner/graph.py), so any
+        steps that don't depend on each other get run concurrently.
+
+        Before anything else, the reads get a quick pre-flight sizing (see _preflight), which
+        stops the pipeline right away if the reads file is too big.
+
+        Threads and memory for each tool come from a ResourcePlan (see utils/resources.py) made
+        from the cores and memory available on this node. The pre-flight estimate of the input
+        bases gets added to the plan (it caps BFC's genome size), and once the memory estimate is
+        known, that gets added to the plan so SPAdes isn't started on reads that won't fit.
+
+        The files that go in the report zip get added to self.report_archive as each step
+        finishes (see utils/report_archive.py), so the report only has to add its own files and
+        close it.
         """
-        readlength = ReadLengthRunner(self.scratch_dir, self.output_dir)
+        mkdir(self.output_dir)
+        resources = ResourcePlan.for_host(max_memory_gb=MAX_MEMORY)
+        print("Pipeline resource plan: {}".format(resources.to_dict()))
+        archive = ReportArchive(os.path.join(self.output_dir, "assembly_report.zip"), self.report_compresslevel)
+        self.report_archive = archive
+
+        # size up the reads from a sample, and stop now if the file's too big.
+        # keys: see _preflight
+        def preflight(results):
+            return self._run_step("preflight", [files], self._preflight, files)
+
         # get reads info on the base input.
-        reads_info_initial = readlength.run(files, "pre_filter_readlen.txt")
+        def reads_info_prefiltered(results):
+            readlength = ReadLengthRunner(self.scratch_dir, self.output_dir)
+            output = self._run_cached_step("reads_info_prefiltered", readlength.version_string(), [files],
+                                           readlength.run, files, "pre_filter_readlen.txt")
+            archive.add_step_output("reads_info_prefiltered", output)
+            return output
 
         # run RQCFilter
         # keys: output_directory, filtered_fastq_file, run_log
-        rqcfilter = RQCFilterRunner(self.callback_url, self.scratch_dir, self.output_dir, options)
-        rqc_output = rqcfilter.run(files)
+        def rqcfilter(results):
+            rqcfilter = RQCFilterRunner(self.callback_url, self.scratch_dir, self.output_dir, options,
+                                        local=self.rqcfilter_local, rqcfilter_data=self.rqcfilter_data,
+                                        threads=resources.rqcfilter_threads,
+                                        max_memory_gb=resources.rqcfilter_memory_gb)
+            output = self._run_step("rqcfilter", [files], rqcfilter.run, files)
+            if self.cache is not None:
+                # key the (large) filtered reads on what made them, rather than hashing them all.
+                key = self.cache.key("rqcfilter", output.get("version_string"), [files],
+                                     {"options": options, "parameters": rqcfilter.get_parameters()})
+                self.cache.set_source(output["filtered_fastq_file"], {"step": "rqcfilter", "key": key})
+            archive.add_step_output("rqcfilter", output)
+            return output
 
-        # get info on the filtered reads
-        reads_info_filtered = readlength.run(rqc_output["filtered_fastq_file"], "filtered_readlen.txt")
+        # get info on the filtered reads. This still needs its own pass over them - there's
+        # nowhere to tap them as they stream. RQCFilter usually runs in the BBTools container and
+        # writes the file there, and when it runs here, rqcfilter2.sh writes the gzipped file
+        # itself. Its own stats files don't have the length histogram the report needs, either.
+        # Tapping BFC's or BBMap's input instead would hold those tools to the speed of the
+        # Python reader. So this runs alongside BFC (which takes much longer), where it's off the
+        # critical path, and done well before the assembly.
+        def reads_info_filtered(results):
+            filtered_reads = results["rqcfilter"]["filtered_fastq_file"]
+            readlength = ReadLengthRunner(self.scratch_dir, self.output_dir)
+            output = self._run_cached_step("reads_info_filtered", readlength.version_string(), [filtered_reads],
+                                           readlength.run, filtered_reads, "filtered_readlen.txt")
+            archive.add_step_output("reads_info_filtered", output)
+            return output
 
-        # run BFC on the filtered reads
-        # keys: corrected_reads, command
-        bfc = BFCRunner(self.scratch_dir, self.output_dir)
-        bfc_output = bfc.run(rqc_output["filtered_fastq_file"], debug=options.get("debug"))
-
-        # run SeqTK on the corrected reads to remove the stray single ended ones
-        # keys: cleaned_reads (note that they're zipped!), command
-        seqtk = SeqtkRunner(self.scratch_dir, self.output_dir)
-        seqtk_output = seqtk.run(bfc_output["corrected_reads"])
+        # run BFC on the filtered reads, and pipe the corrected reads through SeqTK to remove
+        # the stray single ended ones, then compress them. This also gets the info on the
+        # corrected reads as they get compressed.
+        # keys: bfc (command, parameters), seqtk (cleaned_reads - note that they're zipped! -,
+        # reads_info, command)
+        def correct_reads(results):
+            filtered_reads = results["rqcfilter"]["filtered_fastq_file"]
+            plan = resources.with_input_bases(results["preflight"]["bases"])
+            bfc = BFCRunner(self.scratch_dir, self.output_dir)
+            seqtk = self.dropse_runner(self.scratch_dir, self.output_dir)
+            version = "{}, {}".format(bfc.version_string(), seqtk.version_string())
+            output = self._run_cached_step("correct_reads", version, [filtered_reads], self._correct_reads,
+                                           filtered_reads, debug=options.get("debug"),
+                                           threads=plan.bfc_threads, genome_size=plan.bfc_genome_size,
+                                           compress_threads=plan.compress_threads)
+            archive.add_step_output("reads_info_corrected", output["seqtk"]["reads_info"])
+            return output
 
         # Check that RAM requirements for metaSpades.py won't be exceded.
-        # We need to count unique kmers of filtered reads
-        self._check_memory_use(seqtk_output["cleaned_reads"])
-
-        # get info on the filtered/corrected reads
-        reads_info_corrected = readlength.run(seqtk_output["cleaned_reads"], "corrected_readlen.txt")
+        # We need to count unique kmers of filtered reads, for each k SPAdes uses
+        # keys: estimate, size, kmer_counts
+        def memory_check(results):
+            cleaned_reads = results["correct_reads"]["seqtk"]["cleaned_reads"]
+            return self._run_step("memory_check", [cleaned_reads], self._check_memory_use, cleaned_reads,
+                                  max_memory=resources.usable_memory_gb, threads=resources.kmer_count_threads)
 
         # assemble the filtered/corrected reads with spades
         # keys:
@@ -171,39 +476,86 @@ class Pipeline(object):
         # * warnings_log -- if exists
         # * scaffolds_file -- if exists
         # * contigs_file -- if exists
-        spades = SpadesRunner(self.scratch_dir, self.output_dir)
-        spades_output = spades.run(
-            seqtk_output["cleaned_reads"],
-            reads_info_corrected,
-            {"max_memory": MAX_MEMORY}
-        )
+        def spades(results):
+            cleaned_reads = results["correct_reads"]["seqtk"]["cleaned_reads"]
+            plan = resources.with_input_bases(results["preflight"]["bases"]).with_estimate(
+                results["memory_check"]["estimate"])
+            print("SPAdes resource plan: {}".format(plan.to_dict()))
+            # the memory check might have come from an earlier run, on a bigger node
+            plan.check_estimate()
+            spades_options = {
+                "max_memory": plan.spades_memory_gb,
+                "threads": plan.spades_threads
+            }
+            spades = SpadesRunner(self.scratch_dir, self.output_dir)
+            output = self._run_step("spades", [cleaned_reads], spades.run,
+                                    cleaned_reads, results["correct_reads"]["seqtk"]["reads_info"], spades_options)
+            archive.add_step_output("spades", output)
+            return output
 
         # Polish the scaffolds and get an agp file (and legend)
         # keys: scaffolds, contigs, agp, legend (all file paths)
-        agp = AgpRunner(self.scratch_dir, self.output_dir)
-        agp_output = agp.run(spades_output.get("scaffolds_file"), spades_output.get("contigs_file"))
+        def agp(results):
+            spades_files = [results["spades"].get("scaffolds_file"), results["spades"].get("contigs_file")]
+            agp = AgpRunner(self.scratch_dir, self.output_dir)
+            return self._run_cached_step("agp", agp.version_string(), spades_files, agp.run, *spades_files,
+                                         max_memory_gb=resources.agp_memory_gb)
 
-        # Use BBMap to build up the assembly stats
+        # Build up the assembly stats (the same reports as BBTools stats.sh)
         # keys: stats_tsv, stats_txt, stats_err
-        stats_runner = StatsRunner(self.scratch_dir, self.output_dir)
-        stats_output = stats_runner.run(agp_output["scaffolds_file"])
+        def stats(results):
+            scaffolds_file = results["agp"]["scaffolds_file"]
+            stats_runner = StatsRunner(self.scratch_dir, self.output_dir)
+            output = self._run_cached_step("stats", stats_runner.version_string(), [scaffolds_file],
+                                           stats_runner.run, scaffolds_file)
+            archive.add_step_output("stats", output)
+            return output
 
         # Map the filtered (not corrected / cleaned) reads to the assembled contigs with BBMap
         # keys: map_file, coverage_file, stats_file
-        bbmap_runner = BBMapRunner(self.scratch_dir, self.output_dir)
-        bbmap_output = bbmap_runner.run(rqc_output["filtered_fastq_file"], spades_output["contigs_file"])
+        def bbmap(results):
+            bbmap_inputs = [results["rqcfilter"]["filtered_fastq_file"], results["spades"]["contigs_file"]]
+            bbmap_runner = BBMapRunner(self.scratch_dir, self.output_dir)
+            output = self._run_step("bbmap", bbmap_inputs, bbmap_runner.run, *bbmap_inputs,
+                                    max_memory_gb=resources.bbmap_memory_gb, threads=resources.bbmap_threads)
+            archive.add_step_output("bbmap", output)
+            return output
+
+        # Each step starts as soon as the steps it depends on are done, so the independent
+        # branches (e.g. initial reads info vs. RQCFilter, or assembly stats vs. BBMap) run at
+        # the same time.
+        graph = StepGraph()
+        graph.add_step("preflight", preflight)
+        graph.add_step("reads_info_prefiltered", reads_info_prefiltered, depends_on=["preflight"])
+        graph.add_step("rqcfilter", rqcfilter, depends_on=["preflight"])
+        graph.add_step("reads_info_filtered", reads_info_filtered, depends_on=["rqcfilter"])
+        graph.add_step("correct_reads", correct_reads, depends_on=["rqcfilter"])
+        graph.add_step("memory_check", memory_check, depends_on=["correct_reads"])
+        graph.add_step("spades", spades, depends_on=["memory_check", "correct_reads"])
+        graph.add_step("agp", agp, depends_on=["spades"])
+        graph.add_step("stats", stats, depends_on=["agp"])
+        graph.add_step("bbmap", bbmap, depends_on=["rqcfilter", "spades"])
+        try:
+            results = graph.run()
+        except Exception:
+            # there won't be a report to put it in
+            archive.close()
+            raise
 
         return_dict = {
-            "reads_info_prefiltered": reads_info_initial,
-            "reads_info_filtered": reads_info_filtered,
-            "reads_info_corrected": reads_info_corrected,
-            "rqcfilter": rqc_output,
-            "bfc": bfc_output,
-            "seqtk": seqtk_output,
-            "spades": spades_output,
-            "agp": agp_output,
-            "stats": stats_output,
-            "bbmap": bbmap_output
+            "preflight": results["preflight"],
+            "reads_info_prefiltered": results["reads_info_prefiltered"],
+            "reads_info_filtered": results["reads_info_filtered"],
+            "reads_info_corrected": results["correct_reads"]["seqtk"]["reads_info"],
+            "rqcfilter": results["rqcfilter"],
+            "bfc": results["correct_reads"]["bfc"],
+            "seqtk": results["correct_reads"]["seqtk"],
+            "spades": results["spades"],
+            "agp": results["agp"],
+            "stats": results["stats"],
+            "bbmap": results["bbmap"],
+            "resources": resources.with_input_bases(results["preflight"]["bases"]).with_estimate(
+                results["memory_check"]["estimate"]).to_dict()
         }
         return return_dict
 
@@ -220,63 +572,69 @@ class Pipeline(object):
             - optional, if cleaned_reads_name isn't None
         3. Filtered reads - passed RQCFilter
             - optional, if filtered_reads_name isn't None AND skip_rqcfilter is False
+        These all get uploaded concurrently.
         returns a dict of UPAs with the following keys:
         - assembly_upa - the assembly (always)
         - filtered_reads_upa - the RQCFiltered reads (optionally)
         - cleaned_reads_upa - the RQCFiltered -> BFC -> SeqTK cleaned reads (optional)
         """
 
-        # upload the assembly
-        uploaded_assy_upa = self.file_util.upload_assembly(
-            pipeline_result["spades"]["contigs_file"], workspace_name, assembly_name
-        )
-        upload_result = {
-            "assembly_upa": uploaded_assy_upa
-        }
+        # Decompressed copies of the reads need to be made for ReadsUtils. Those get made and
+        # uploaded at the same time as each other (and the assembly) if there's room on the
+        # scratch disk for both copies at once, otherwise they take turns.
+        reads_uploads = dict()
         # upload filtered reads if we didn't skip RQCFilter (otherwise it's just a copy)
         if filtered_reads_name and not skip_rqcfilter:
-            # unzip the cleaned reads because ReadsUtils won't do it for us.
-            decompressed_reads = os.path.join(self.output_dir, "filtered_reads.fastq")
-            pigz_command = "{} -d -c {} > {}".format(PIGZ, pipeline_result["rqcfilter"]["filtered_fastq_file"], decompressed_reads)
-            p = subprocess.Popen(pigz_command, cwd=self.scratch_dir, shell=True)
-            exit_code = p.wait()
-            if exit_code != 0:
-                raise RuntimeError("Unable to decompress filtered reads for validation! Can't upload them, either!")
-            filtered_reads_upa = self.file_util.upload_reads(
-                decompressed_reads, workspace_name, filtered_reads_name, input_reads
+            reads_uploads["filtered_reads_upa"] = (
+                pipeline_result["rqcfilter"]["filtered_fastq_file"],
+                os.path.join(self.output_dir, "filtered_reads.fastq"),
+                filtered_reads_name,
+                pipeline_result.get("reads_info_filtered")
             )
-            upload_result["filtered_reads_upa"] = filtered_reads_upa
         # upload the cleaned reads
         if cleaned_reads_name:
-            # unzip the cleaned reads because ReadsUtils won't do it for us.
-            decompressed_reads = os.path.join(self.output_dir, "cleaned_reads.fastq")
-            pigz_command = "{} -d -c {} > {}".format(PIGZ, pipeline_result["seqtk"]["cleaned_reads"], decompressed_reads)
-            p = subprocess.Popen(pigz_command, cwd=self.scratch_dir, shell=True)
-            exit_code = p.wait()
-            if exit_code != 0:
-                raise RuntimeError("Unable to decompress cleaned reads for validation! Can't upload them, either!")
-            cleaned_reads_upa = self.file_util.upload_reads(
-                decompressed_reads, workspace_name, cleaned_reads_name, input_reads
+            reads_uploads["cleaned_reads_upa"] = (
+                pipeline_result["seqtk"]["cleaned_reads"],
+                os.path.join(self.output_dir, "cleaned_reads.fastq"),
+                cleaned_reads_name,
+                pipeline_result.get("reads_info_corrected")
             )
-            upload_result["cleaned_reads_upa"] = cleaned_reads_upa
+
+        space_needed = sum(_estimate_fastq_size(u[0], u[3]) for u in reads_uploads.values())
+        space_free = shutil.disk_usage(self.output_dir).free
+        if space_needed * DISK_HEADROOM > space_free:
+            print("Not enough scratch space to decompress all reads at once ({} GB needed, {} GB free), "
+                  "uploading them one at a time.".format(round(space_needed / 1024.0 ** 3, 2),
+                                                          round(space_free / 1024.0 ** 3, 2)))
+            reads_slots = threading.Semaphore(1)
+        else:
+            reads_slots = threading.Semaphore(max(len(reads_uploads), 1))
+
+        def upload_reads(compressed_file, decompressed_file, reads_name):
+            with reads_slots:
+                return self.file_util.upload_compressed_reads(
+                    compressed_file, decompressed_file, workspace_name, reads_name, input_reads
+                )
+
+        with ThreadPoolExecutor(max_workers=len(reads_uploads) + 1) as executor:
+            uploads = {
+                "assembly_upa": executor.submit(self.file_util.upload_assembly,
+                                                pipeline_result["spades"]["contigs_file"],
+                                                workspace_name, assembly_name)
+            }
+            for key, upload in reads_uploads.items():
+                uploads[key] = executor.submit(upload_reads, *upload[:3])
+            upload_result = dict()
+            for key, upload in uploads.items():
+                upload_result[key] = upload.result()
         return upload_result
 
-    def _build_and_upload_report(self, pipeline_output, output_objects, workspace_name):
+    def _build_and_upload_report(self, prepared_report, output_objects, workspace_name):
         """
-        Builds and uploads a report. This contains both an HTML report for display as well
-        as a list of report files with various outputs from the pipeline.
-
-        pipeline_output - dict, expects the following keys, from each of the different steps
-        * reads_info_prefiltered
-        * reads_info_filtered
-        * reads_info_corrected
-        * rqcfilter
-        * bfc
-        * seqtk
-        * spades
-        * agp
-        * stats
-        * bbmap
+        Uploads the report, linked to the uploaded objects. This contains both an HTML report for
+        display as well as a list of report files with various outputs from the pipeline.
+
+        prepared_report - dict, the report files as made by ReportUtil.prepare_report
 
         output_objects - dict, expects to see
         * assembly_upa - the UPA for the new assembly object
@@ -300,4 +658,4 @@ class Pipeline(object):
                 "description": "Reads filtered by RQCFilter, and used to align against the assembled contigs."
             })
 
-        return report_util.make_report(pipeline_output, workspace_name, stored_objects)
+        return report_util.upload_report(prepared_report, workspace_name, stored_objects)
@@ -0,0 +1,300 @@
+"""
+In-process assembly statistics.
+
+AssemblyStats builds the same two reports as BBTools stats.sh - the tab-delimited summary
+(stats.sh format=6) and the human-readable text report (the default format) - from a single pass
+over a FASTA file, without starting a JVM. stats.sh has to be run once for each format, so this
+reads the assembly once instead of twice.
+
+Scaffolds are split into contigs at runs of 10 or more Ns (the stats.sh default). The GC
+standard deviation is taken over the scaffolds, weighted by length, with each scaffold's GC
+content binned to 1/1000 like stats.sh does.
+"""
+from __future__ import print_function
+import re
+from array import array
+from bisect import bisect_right
+import numpy as np
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# These match the stats.sh defaults.
+CONTIG_BREAK_NS = 10
+GC_BINS = 1000
+LONG_SCAFFOLD = 50000
+
+# The minimum scaffold lengths for the rows of the text report's length table.
+TABLE_LIMITS = [
+    50, 100, 250, 500,
+    1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000,
+    1000000, 2500000, 5000000, 10000000, 25000000, 50000000, 100000000, 250000000, 500000000,
+    1000000000
+]
+
+TSV_HEADER = [
+    "n_scaffolds", "n_contigs", "scaf_bp", "contig_bp", "gap_pct",
+    "scaf_N50", "scaf_L50", "ctg_N50", "ctg_L50", "scaf_N90", "scaf_L90", "ctg_N90", "ctg_L90",
+    "scaf_max", "ctg_max", "scaf_n_gt50K", "scaf_pct_gt50K", "gc_avg", "gc_std"
+]
+
+TABLE_HEADER = (
+    "Minimum \tNumber        \tNumber        \tTotal         \tTotal         \tScaffold\n"
+    "Scaffold\tof            \tof            \tScaffold      \tContig        \tContig  \n"
+    "Length  \tScaffolds     \tContigs       \tLength        \tLength        \tCoverage\n"
+    "--------\t--------------\t--------------\t--------------\t--------------\t--------\n"
+)
+
+IUPAC = b"RYSWKMBDHV"
+_WHITESPACE = b" \t\r\n"
+
+
+def _format_length(length):
+    """
+    Formats a length the way the stats.sh text report does, e.g. 364, 1.025 KB, 2.310 MB.
+    """
+    for (size, unit) in [(1000000000, "GB"), (1000000, "MB"), (1000, "KB")]:
+        if length >= size:
+            return "{:.3f} {}".format(length / float(size), unit)
+    return str(length)
+
+
+def _format_limit(limit):
+    """
+    Formats a table row's minimum length, e.g. 250, 1 KB, 2.5 KB.
+    """
+    for (size, unit) in [(1000000000, "GB"), (1000000, "MB"), (1000, "KB")]:
+        if limit >= size:
+            return "{:g} {}".format(limit / float(size), unit)
+    return str(limit)
+
+
+def _percent(x, y):
+    if y == 0:
+        return 0.0
+    return x * 100.0 / y
+
+
+def _n_l(sorted_lengths, cumulative, fraction):
+    """
+    Returns the N and L values (e.g. for N50/L50, fraction=0.5) from lengths sorted longest first
+    and their cumulative sum - N is the number of sequences it takes to cover at least fraction
+    of the total length, and L is the length of the shortest of those.
+    """
+    if len(sorted_lengths) == 0:
+        return 0, 0
+    index = int(np.searchsorted(cumulative, cumulative[-1] * fraction, side="left"))
+    return index + 1, int(sorted_lengths[index])
+
+
+def fasta_sequences(fasta_file):
+    """
+    Yields the sequence of each record in a FASTA file as upper case bytes, with line breaks
+    removed. The file is read in large chunks and split on record boundaries, rather than line
+    by line.
+    """
+    with open(fasta_file, "rb") as f:
+        pending = b""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b"\n>")
+            pending = records.pop()
+            for record in records:
+                yield _record_sequence(record)
+        if pending.strip():
+            yield _record_sequence(pending)
+
+
+def _record_sequence(record):
+    parts = record.split(b"\n", 1)
+    if len(parts) == 1:
+        return b""
+    return parts[1].translate(None, _WHITESPACE).upper()
+
+
+class AssemblyStats(object):
+    """
+    Usage:
+        stats = AssemblyStats()
+        for sequence in fasta_sequences(fasta_file):
+            stats.add_scaffold(sequence)
+        stats.write_tsv(tsv_file)
+        stats.write_text(txt_file)
+    """
+    def __init__(self, contig_break=CONTIG_BREAK_NS):
+        self.contig_break = contig_break
+        self._gap = re.compile(b"N{" + str(contig_break).encode("ascii") + b",}")
+        self.scaffold_lengths = array("q")
+        self.scaffold_contigs = array("q")
+        self.scaffold_contig_bp = array("q")
+        self.contig_lengths = array("q")
+        self.base_counts = {"A": 0, "C": 0, "G": 0, "T": 0, "N": 0, "IUPAC": 0, "Other": 0}
+        # scaffold lengths, binned by GC content
+        self.gc_hist = np.zeros(GC_BINS + 1, dtype=np.int64)
+
+    def add_scaffold(self, sequence):
+        """
+        Adds a scaffold, given as upper case bytes.
+        """
+        length = len(sequence)
+        if length == 0:
+            return
+        counts = [sequence.count(base) for base in (b"A", b"C", b"G", b"T", b"N")]
+        for (key, count) in zip(("A", "C", "G", "T", "N"), counts):
+            self.base_counts[key] += count
+        other = length - sum(counts)
+        if other:
+            leftover = sequence.translate(None, b"ACGTN")
+            iupac = len(leftover) - len(leftover.translate(None, IUPAC))
+            self.base_counts["IUPAC"] += iupac
+            self.base_counts["Other"] += other - iupac
+        acgt = sum(counts[:4])
+        if acgt:
+            self.gc_hist[(counts[1] + counts[2]) * GC_BINS // acgt] += length
+
+        if counts[4] < self.contig_break:
+            contigs = [length]
+        else:
+            contigs = [len(piece) for piece in self._gap.split(sequence) if piece]
+        self.scaffold_lengths.append(length)
+        self.scaffold_contigs.append(len(contigs))
+        self.scaffold_contig_bp.append(sum(contigs))
+        self.contig_lengths.extend(contigs)
+
+    def summary(self):
+        """
+        Returns a dict of the stats, with the same keys as the stats.sh format=6 columns (see
+        TSV_HEADER). Base composition is under base_fractions, and the GC content under
+        gc_avg and gc_std.
+        """
+        scaffolds = np.sort(np.frombuffer(self.scaffold_lengths, dtype=np.int64))[::-1]
+        contigs = np.sort(np.frombuffer(self.contig_lengths, dtype=np.int64))[::-1]
+        scaffolds_cum = np.cumsum(scaffolds)
+        contigs_cum = np.cumsum(contigs)
+        scaf_bp = int(scaffolds_cum[-1]) if len(scaffolds) else 0
+        contig_bp = int(contigs_cum[-1]) if len(contigs) else 0
+        long_scaffolds = scaffolds[scaffolds >= LONG_SCAFFOLD]
+
+        total_bases = sum(self.base_counts.values())
+        acgt = sum(self.base_counts[base] for base in "ACGT")
+        base_fractions = {key: float(count) / total_bases if total_bases else 0.0
+                          for (key, count) in self.base_counts.items()}
+        gc_avg = float(self.base_counts["C"] + self.base_counts["G"]) / acgt if acgt else 0.0
+        gc_std = 0.0
+        weight = self.gc_hist.sum()
+        if weight:
+            gc_values = np.arange(GC_BINS + 1) / float(GC_BINS)
+            gc_mean = (gc_values * self.gc_hist).sum() / weight
+            gc_std = float(np.sqrt((self.gc_hist * (gc_values - gc_mean) ** 2).sum() / weight))
+
+        summary = {
+            "n_scaffolds": len(scaffolds),
+            "n_contigs": len(contigs),
+            "scaf_bp": scaf_bp,
+            "contig_bp": contig_bp,
+            "gap_pct": _percent(scaf_bp - contig_bp, scaf_bp),
+            "scaf_max": int(scaffolds[0]) if len(scaffolds) else 0,
+            "ctg_max": int(contigs[0]) if len(contigs) else 0,
+            "scaf_n_gt50K": len(long_scaffolds),
+            "scaf_pct_gt50K": _percent(int(long_scaffolds.sum()), scaf_bp),
+            "gc_avg": gc_avg,
+            "gc_std": gc_std,
+            "base_fractions": base_fractions
+        }
+        summary["scaf_N50"], summary["scaf_L50"] = _n_l(scaffolds, scaffolds_cum, 0.5)
+        summary["scaf_N90"], summary["scaf_L90"] = _n_l(scaffolds, scaffolds_cum, 0.9)
+        summary["ctg_N50"], summary["ctg_L50"] = _n_l(contigs, contigs_cum, 0.5)
+        summary["ctg_N90"], summary["ctg_L90"] = _n_l(contigs, contigs_cum, 0.9)
+        return summary
+
+    def _length_table(self):
+        """
+        Returns the rows of the text report's length table - for each minimum scaffold length
+        from the shortest scaffold's up to the longest's, the number of scaffolds and contigs,
+        and their total lengths, in scaffolds at least that long.
+        """
+        order = np.argsort(np.frombuffer(self.scaffold_lengths, dtype=np.int64), kind="mergesort")[::-1]
+        lengths = np.frombuffer(self.scaffold_lengths, dtype=np.int64)[order]
+        contigs_cum = np.cumsum(np.frombuffer(self.scaffold_contigs, dtype=np.int64)[order])
+        contig_bp_cum = np.cumsum(np.frombuffer(self.scaffold_contig_bp, dtype=np.int64)[order])
+        lengths_cum = np.cumsum(lengths)
+
+        def row(label, num):
+            if num == 0:
+                return (label, 0, 0, 0, 0)
+            return (label, num, int(contigs_cum[num - 1]), int(lengths_cum[num - 1]), int(contig_bp_cum[num - 1]))
+
+        rows = [row("All", len(lengths))]
+        if len(lengths) == 0:
+            return rows
+        first = max(0, bisect_right(TABLE_LIMITS, int(lengths[-1])) - 1)
+        last = bisect_right(TABLE_LIMITS, int(lengths[0])) - 1
+        # lengths are sorted longest first, so the scaffolds at least limit long are a prefix
+        ascending = lengths[::-1]
+        for limit in TABLE_LIMITS[first:last + 1]:
+            num = len(ascending) - int(np.searchsorted(ascending, limit, side="left"))
+            rows.append(row(_format_limit(limit), num))
+        return rows
+
+    def tsv(self):
+        """
+        Returns the stats.sh format=6 report.
+        """
+        s = self.summary()
+        values = [str(s[key]) for key in TSV_HEADER]
+        for (key, fmt) in [("gap_pct", "{:.3f}"), ("scaf_pct_gt50K", "{:.3f}"), ("gc_avg", "{:.5f}"), ("gc_std", "{:.5f}")]:
+            values[TSV_HEADER.index(key)] = fmt.format(s[key])
+        return "#{}\n{}\n".format("\t".join(TSV_HEADER), "\t".join(values))
+
+    def text(self):
+        """
+        Returns the stats.sh text report.
+        """
+        s = self.summary()
+        fractions = s["base_fractions"]
+        lines = [
+            "A\tC\tG\tT\tN\tIUPAC\tOther\tGC\tGC_stdev",
+            "\t".join("{:.4f}".format(v) for v in [fractions[b] for b in ["A", "C", "G", "T", "N", "IUPAC", "Other"]] + [s["gc_avg"], s["gc_std"]]),
+            "",
+            "Main genome scaffold total:         \t{}".format(s["n_scaffolds"]),
+            "Main genome contig total:           \t{}".format(s["n_contigs"]),
+            "Main genome scaffold sequence total:\t{:.3f} MB".format(s["scaf_bp"] / 1000000.0),
+            "Main genome contig sequence total:  \t{:.3f} MB  \t{:.3f}% gap".format(s["contig_bp"] / 1000000.0, s["gap_pct"]),
+            "Main genome scaffold N/L50:         \t{}/{}".format(s["scaf_N50"], _format_length(s["scaf_L50"])),
+            "Main genome contig N/L50:           \t{}/{}".format(s["ctg_N50"], _format_length(s["ctg_L50"])),
+            "Main genome scaffold N/L90:         \t{}/{}".format(s["scaf_N90"], _format_length(s["scaf_L90"])),
+            "Main genome contig N/L90:           \t{}/{}".format(s["ctg_N90"], _format_length(s["ctg_L90"])),
+            "Max scaffold length:                \t{}".format(_format_length(s["scaf_max"])),
+            "Max contig length:                  \t{}".format(_format_length(s["ctg_max"])),
+            "Number of scaffolds > 50 KB:        \t{}".format(s["scaf_n_gt50K"]),
+            "% main genome in scaffolds > 50 KB: \t{:.2f}%".format(s["scaf_pct_gt50K"]),
+            "",
+            ""
+        ]
+        table = list()
+        for (label, num_scaffolds, num_contigs, scaffold_bp, contig_bp) in self._length_table():
+            table.append("{:>7} \t{:>14,}\t{:>14,}\t{:>14,}\t{:>14,}\t{:>7.2f}%\n".format(
+                label, num_scaffolds, num_contigs, scaffold_bp, contig_bp, _percent(contig_bp, scaffold_bp)))
+        return "\n".join(lines) + "\n" + TABLE_HEADER + "".join(table) + "\n"
+
+    def write_tsv(self, path):
+        with open(path, "w") as f:
+            f.write(self.tsv())
+
+    def write_text(self, path):
+        with open(path, "w") as f:
+            f.write(self.text())
+
+
+def assembly_stats(fasta_file, tsv_file, txt_file):
+    """
+    Reads fasta_file once, and writes both the stats.sh format=6 report to tsv_file and the text
+    report to txt_file. Returns the summary dict (see AssemblyStats.summary).
+    """
+    stats = AssemblyStats()
+    for sequence in fasta_sequences(fasta_file):
+        stats.add_scaffold(sequence)
+    stats.write_tsv(tsv_file)
+    stats.write_text(txt_file)
+    return stats.summary()
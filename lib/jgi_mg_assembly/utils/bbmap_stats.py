@@ -0,0 +1,198 @@
+"""
+Parsers for the BBMap output used in the report.
+
+This reads the stats that BBMap writes to stderr (bbmap_stats.txt) and its per-contig
+coverage stats (covstats.txt). Each file gets read once. The covstats columns are stored as
+NumPy arrays instead of lists of strings, so the alignment summary (m50/m90 and the cumulative
+reads curve) is computed with array operations, even with hundreds of thousands of contigs.
+"""
+from __future__ import print_function
+import numpy as np
+
+NA = "NA"
+
+# covstats.txt columns, and the types they get loaded as. The ID column is kept as strings.
+COVSTATS_COLUMNS = {
+    "Avg_fold": np.float64,
+    "Length": np.int64,
+    "Ref_GC": np.float64,
+    "Covered_percent": np.float64,
+    "Covered_bases": np.int64,
+    "Plus_reads": np.int64,
+    "Minus_reads": np.int64,
+    "Read_GC": np.float64,
+    "Median_fold": np.float64,
+    "Std_Dev": np.float64
+}
+
+# The only covstats columns alignment_summary needs (see CoverageStats.m50_m90).
+SUMMARY_COLUMNS = ["Length", "Plus_reads", "Minus_reads"]
+
+# How much of a covstats file gets split into fields at a time when only loading some columns.
+COVSTATS_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _percent(x, y):
+    """
+    The integer percent of x in y, or 0 if y is 0. Matches ReportUtil._percent_reads.
+    """
+    if y == 0:
+        return 0
+    return int(float(x) / float(y) * 100)
+
+
+def read_bbmap_stats(stats_file):
+    """
+    Adapted from jgi_mga_create_metadata_dot_json.metagenome_alignment_metadata
+
+    Reads the stats BBMap writes to stderr, and returns a dict with the number of reads used as
+    input to BBMap and the number that were aligned. Keys:
+    * aligned - number of aligned reads (the sum of the two "mapped:" lines, one per read in
+      each pair)
+    * input_reads - number of input reads sent to BBMap (from the "Reads Used:" line)
+    * aligned_percent - percent of reads aligned to the assembly
+    * error - string, only present if one of the counts couldn't be found.
+    """
+    mapped = list()
+    reads_used = list()
+    with open(stats_file, "r") as f:
+        for line in f:
+            if line.startswith("mapped:"):
+                mapped.append(line.split("\t")[2].strip())
+            elif line.startswith("Reads Used:"):
+                reads_used.append(line.split("\t")[1].strip())
+
+    counts = dict()
+    errors = list()
+    if len(mapped) != 2 or not all(m.isdigit() for m in mapped):
+        errors.append("Can't calculate number of mapped reads!")
+        counts["aligned"] = 0
+    else:
+        counts["aligned"] = int(mapped[0]) + int(mapped[1])
+    if len(reads_used) != 1 or not reads_used[0].isdigit():
+        errors.append("Can't calculate number of input reads!")
+        counts["input_reads"] = 0
+    else:
+        counts["input_reads"] = int(reads_used[0])
+    if errors:
+        counts["error"] = "".join(errors)
+    counts["aligned_percent"] = _percent(counts["aligned"], counts["input_reads"])
+    return counts
+
+
+class CoverageStats(object):
+    """
+    The contents of a BBMap covstats.txt file, one NumPy array per column.
+    Columns are available through the columns dict, keyed by header name (e.g.
+    stats.columns["Length"]), and the contig IDs are in ids (None if only some of the columns
+    were loaded).
+    """
+    def __init__(self, ids, columns):
+        self.ids = ids
+        self.columns = columns
+
+    def __len__(self):
+        if self.ids is None:
+            return len(next(iter(self.columns.values()), []))
+        return len(self.ids)
+
+    @property
+    def reads(self):
+        """
+        The number of reads mapped to each contig.
+        """
+        return self.columns["Plus_reads"] + self.columns["Minus_reads"]
+
+    def cumulative_reads(self, input_reads):
+        """
+        Returns the cumulative reads curve as two arrays - contig lengths, sorted longest first,
+        and the fraction of all input_reads that mapped to contigs of at least that length.
+        """
+        order = np.argsort(-self.columns["Length"], kind="mergesort")
+        lengths = self.columns["Length"][order]
+        if input_reads == 0:
+            return lengths, np.zeros(len(lengths), dtype=np.float64)
+        return lengths, np.cumsum(self.reads[order]) / float(input_reads)
+
+    def m50_m90(self, input_reads):
+        """
+        Returns the m50 and m90 values - the contig length where over 50% (or 90%) of the
+        input_reads align to contigs of this length or longer. Either is "NA" if not enough of
+        the reads aligned.
+        """
+        lengths, fraction = self.cumulative_reads(input_reads)
+        values = list()
+        for cutoff in [0.5, 0.9]:
+            over = np.flatnonzero(fraction > cutoff)
+            values.append(int(lengths[over[0]]) if len(over) else NA)
+        return values[0], values[1]
+
+
+def read_covstats(covstats_file, columns=None):
+    """
+    Loads a BBMap covstats.txt file into a CoverageStats. The whole file gets split into fields
+    at once, then each column is converted to a typed array.
+
+    If columns is a list of column names, only those get loaded, and ids is None. See
+    _read_covstats_columns. A ValueError gets raised if any of them aren't in the file.
+    """
+    with open(covstats_file, "r") as f:
+        header = f.readline().rstrip("\n").lstrip("#").split("\t")
+        if columns is not None:
+            return _read_covstats_columns(f, covstats_file, header, columns)
+        data = f.read()
+    num_cols = len(header)
+    fields = data.replace("\n", "\t").split("\t")
+    if fields and fields[-1] == "":
+        fields.pop()
+    if len(fields) % num_cols != 0:
+        raise ValueError("Malformed covstats file {}: expected {} columns on each line".format(covstats_file, num_cols))
+    ids = fields[0::num_cols]
+    columns = dict()
+    for i, name in enumerate(header[1:], start=1):
+        columns[name] = np.array(fields[i::num_cols], dtype=COVSTATS_COLUMNS.get(name, np.float64))
+    return CoverageStats(ids, columns)
+
+
+def _read_covstats_columns(f, covstats_file, header, columns):
+    """
+    Loads just the named columns from the rest of an open covstats file. This reads
+    COVSTATS_CHUNK_SIZE bytes of lines at a time, and only keeps the typed arrays for the
+    requested columns from each batch, so the strings for the whole file are never in memory
+    at once.
+    """
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError("Malformed covstats file {}: missing column(s) {}".format(covstats_file, ", ".join(missing)))
+    num_cols = len(header)
+    indices = [header.index(name) for name in columns]
+    dtypes = [COVSTATS_COLUMNS.get(name, np.float64) for name in columns]
+    chunks = [list() for name in columns]
+    while True:
+        lines = f.readlines(COVSTATS_CHUNK_SIZE)
+        if not lines:
+            break
+        fields = "".join(lines).replace("\n", "\t").split("\t")
+        if fields[-1] == "":
+            fields.pop()
+        if len(fields) % num_cols != 0:
+            raise ValueError("Malformed covstats file {}: expected {} columns on each line".format(covstats_file, num_cols))
+        for (i, dtype, chunk) in zip(indices, dtypes, chunks):
+            chunk.append(np.array(fields[i::num_cols], dtype=dtype))
+    loaded = dict()
+    for (name, dtype, chunk) in zip(columns, dtypes, chunks):
+        loaded[name] = np.concatenate(chunk) if chunk else np.array([], dtype=dtype)
+    return CoverageStats(None, loaded)
+
+
+def alignment_summary(stats_file, covstats_file):
+    """
+    Reads the BBMap stats and covstats files, and returns the results from read_bbmap_stats,
+    along with these keys:
+    * m50, m90 - see CoverageStats.m50_m90
+    Only the covstats columns those need get loaded.
+    """
+    summary = read_bbmap_stats(stats_file)
+    coverage = read_covstats(covstats_file, columns=SUMMARY_COLUMNS)
+    summary["m50"], summary["m90"] = coverage.m50_m90(summary["input_reads"])
+    return summary
@@ -0,0 +1,375 @@
+"""
+In-process FASTQ utilities.
+
+The main piece here is FastqStats, a read length statistics accumulator that works on raw chunks
+of FASTQ data using NumPy, rather than parsing the file line by line. It calculates the same
+numbers and writes the same histogram file as BBTools readlength.sh, without starting a JVM.
+Because it takes arbitrary chunks of bytes, it can be fed from a file (see read_length_stats), or
+from data that's passing through on its way somewhere else (see FastqStatsTap).
+
+This expects standard 4-line FASTQ records (the only kind written by the tools in this
+pipeline), with each read's sequence on a single line.
+"""
+from __future__ import print_function
+import gzip
+import shutil
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+
+PIGZ = "pigz"
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# These match the readlength.sh defaults.
+HIST_BIN_SIZE = 10
+HIST_MAX_LENGTH = 80000
+
+_NEWLINE = ord("\n")
+_CARRIAGE_RETURN = ord("\r")
+_SPACE = ord(" ")
+_TAB = ord("\t")
+_SLASH = ord("/")
+_ZERO = ord("0")
+_NINE = ord("9")
+
+
+def is_gzipped(path):
+    """
+    Returns True if the file at path is gzip compressed, by checking its first two bytes.
+    """
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+@contextmanager
+def open_reads(path):
+    """
+    Opens a reads file for binary reading, decompressing it on the fly if it's gzipped.
+    If pigz is available, it's used to do the decompression in a separate process, otherwise
+    this falls back to the gzip module.
+    """
+    if not is_gzipped(path):
+        with open(path, "rb") as f:
+            yield f
+    elif shutil.which(PIGZ) is None:
+        with gzip.open(path, "rb") as f:
+            yield f
+    else:
+        p = subprocess.Popen([PIGZ, "-d", "-c", path], stdout=subprocess.PIPE, bufsize=CHUNK_SIZE)
+        try:
+            yield p.stdout
+        finally:
+            p.stdout.close()
+            exit_code = p.wait()
+        if exit_code != 0:
+            raise RuntimeError("Unable to decompress reads file {}, pigz exit code {}".format(path, exit_code))
+
+
+@contextmanager
+def gzip_writer(path, threads=4, level=2):
+    """
+    Opens a binary stream that gets gzip compressed into the file at path. If pigz is available,
+    it does the compression with the given number of threads, otherwise this falls back to the
+    gzip module.
+    """
+    if shutil.which(PIGZ) is None:
+        with gzip.open(path, "wb", compresslevel=level) as f:
+            yield f
+        return
+    with open(path, "wb") as out_file:
+        p = subprocess.Popen([PIGZ, "-c", "-", "-p", str(threads), "-{}".format(level)],
+                             stdin=subprocess.PIPE, stdout=out_file)
+        try:
+            yield p.stdin
+        finally:
+            p.stdin.close()
+            exit_code = p.wait()
+    if exit_code != 0:
+        raise RuntimeError("Unable to compress reads into {}, pigz exit code {}".format(path, exit_code))
+
+
+class FastqStats(object):
+    """
+    Accumulates read length statistics from chunks of FASTQ data.
+    Usage:
+        stats = FastqStats()
+        for chunk in chunks:
+            stats.update(chunk)
+        stats.finish()
+        stats.summary()    # -> dict of count, bases, min, max, etc.
+    """
+    def __init__(self):
+        self._hist = np.zeros(0, dtype=np.int64)
+        self._partial = b""
+        self._line_num = 0
+        self._finished = False
+
+    def update(self, data):
+        """
+        Adds a chunk of FASTQ data. Chunks don't need to line up with records or lines.
+        """
+        if not data:
+            return
+        buf = self._partial + data if self._partial else data
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        newlines = np.flatnonzero(arr == _NEWLINE)
+        if len(newlines) == 0:
+            self._partial = bytes(buf)
+            return
+        # sequence lines are the 2nd of each 4 lines, so find where the first one is in this chunk
+        first_seq = (1 - self._line_num) % 4
+        line_starts = np.empty(len(newlines), dtype=np.int64)
+        line_starts[0] = 0
+        line_starts[1:] = newlines[:-1] + 1
+        seq_ends = newlines[first_seq::4]
+        if len(seq_ends):
+            lengths = seq_ends - line_starts[first_seq::4]
+            # don't count the \r from Windows-style line endings
+            lengths -= (arr[np.maximum(seq_ends - 1, 0)] == _CARRIAGE_RETURN) & (lengths > 0)
+            self._add_lengths(lengths)
+        self._line_num = (self._line_num + len(newlines)) % 4
+        self._partial = bytes(buf[newlines[-1] + 1:])
+
+    def finish(self):
+        """
+        Finishes up the last record, if the data didn't end with a newline.
+        """
+        if not self._finished and self._partial:
+            if self._line_num == 1:
+                self._add_lengths(np.array([len(self._partial.rstrip(b"\r"))], dtype=np.int64))
+            self._partial = b""
+        self._finished = True
+
+    def _add_lengths(self, lengths):
+        counts = np.bincount(lengths)
+        if len(counts) > len(self._hist):
+            self._hist = np.concatenate([self._hist, np.zeros(len(counts) - len(self._hist), dtype=np.int64)])
+        self._hist[:len(counts)] += counts
+
+    def summary(self):
+        """
+        Returns a dict with the following keys, calculated the same way as readlength.sh:
+        count - the number of reads
+        bases - the total number of bases
+        max - the length of the longest read
+        min - the length of the shortest read
+        avg - the average read length
+        median - the median read length
+        mode - the most common read length
+        std_dev - the standard deviation of read lengths
+        avg and std_dev are rounded to one decimal place, as they are in the readlength.sh output.
+        """
+        hist = self._hist
+        lengths = np.arange(len(hist), dtype=np.int64)
+        count = int(hist.sum())
+        if count == 0:
+            return {"count": 0, "bases": 0, "max": 0, "min": 0, "avg": 0.0,
+                    "median": 0, "mode": 0, "std_dev": 0.0}
+        nonzero = np.flatnonzero(hist)
+        bases = int((hist * lengths).sum())
+        avg = float(bases) / count
+        variance = float((hist * (lengths - avg) ** 2).sum()) / count
+        return {
+            "count": count,
+            "bases": bases,
+            "max": int(nonzero[-1]),
+            "min": int(nonzero[0]),
+            "avg": round(avg, 1),
+            "median": int(np.searchsorted(np.cumsum(hist), max(count // 2, 1))),
+            "mode": int(np.argmax(hist)),
+            "std_dev": round(variance ** 0.5, 1)
+        }
+
+    def write_histogram(self, output_file):
+        """
+        Writes a readlength.sh style report - the summary values, followed by a binned histogram
+        of reads and bases by read length - to output_file.
+        """
+        summary = self.summary()
+        lengths = np.arange(len(self._hist), dtype=np.int64)
+        # reads longer than the max all go in the last bin, like readlength.sh
+        bins = np.minimum(lengths, HIST_MAX_LENGTH) // HIST_BIN_SIZE
+        binned_reads = np.bincount(bins, weights=self._hist).astype(np.int64)
+        binned_bases = np.bincount(bins, weights=self._hist * lengths).astype(np.int64)
+        total_reads = max(summary["count"], 1)
+        total_bases = max(summary["bases"], 1)
+        # cumulative counts are of reads at least as long as the bin
+        cum_reads = binned_reads[::-1].cumsum()[::-1]
+        cum_bases = binned_bases[::-1].cumsum()[::-1]
+
+        with open(output_file, "w") as out:
+            out.write("#Reads:\t{}\n".format(summary["count"]))
+            out.write("#Bases:\t{}\n".format(summary["bases"]))
+            out.write("#Max:\t{}\n".format(summary["max"]))
+            out.write("#Min:\t{}\n".format(summary["min"]))
+            out.write("#Avg:\t{:.1f}\n".format(summary["avg"]))
+            out.write("#Median:\t{}\n".format(summary["median"]))
+            out.write("#Mode:\t{}\n".format(summary["mode"]))
+            out.write("#Std_Dev:\t{:.1f}\n".format(summary["std_dev"]))
+            out.write("#Read Length Histogram:\n")
+            out.write("#Length\treads\tpct_reads\tcum_reads\tcum_pct_reads\tbases\tpct_bases\tcum_bases\tcum_pct_bases\n")
+            for i in np.flatnonzero(binned_reads):
+                out.write("{}\t{}\t{:.3f}%\t{}\t{:.3f}%\t{}\t{:.3f}%\t{}\t{:.3f}%\n".format(
+                    i * HIST_BIN_SIZE,
+                    binned_reads[i], 100.0 * binned_reads[i] / total_reads,
+                    cum_reads[i], 100.0 * cum_reads[i] / total_reads,
+                    binned_bases[i], 100.0 * binned_bases[i] / total_bases,
+                    cum_bases[i], 100.0 * cum_bases[i] / total_bases
+                ))
+
+
+class FastqStatsTap(object):
+    """
+    A tee for FASTQ data. Wraps a binary stream so that everything written to it, or read from it,
+    goes into a FastqStats on the way through. Use this to get read length stats while some step
+    is writing (or reading) its reads anyway, instead of reading the whole file again afterward.
+    Usage:
+        tap = FastqStatsTap(some_output_stream)
+        tap.write(chunk)
+        ...
+        tap.close()
+        tap.stats.summary()
+    """
+    def __init__(self, stream, stats=None):
+        self.stream = stream
+        self.stats = stats if stats is not None else FastqStats()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.stats.update(data)
+        return data
+
+    def write(self, data):
+        self.stats.update(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stats.finish()
+        self.stream.close()
+
+
+class PairedReadsFilter(object):
+    """
+    Drops the unpaired reads from interleaved FASTQ data, the same way as seqtk dropse - each
+    read is kept only if it has the same name as the read right before or right after it (and
+    that read wasn't already paired with another one). Names are compared up to the first
+    whitespace, and a /1 or /2 suffix on both names is ignored.
+
+    Like FastqStats, this works on raw chunks of data with NumPy instead of parsing records one
+    at a time, and expects 4-line FASTQ records. Kept records are passed through unchanged.
+    Usage:
+        paired = PairedReadsFilter()
+        for chunk in chunks:
+            out.write(paired.update(chunk))
+        out.write(paired.finish())
+    """
+    def __init__(self):
+        # unprocessed data - a partial record, and the last record if it's still waiting for a mate
+        self._pending = b""
+        self.reads_in = 0
+        self.reads_out = 0
+
+    def update(self, data):
+        """
+        Adds a chunk of FASTQ data, and returns the paired records that are ready to go out.
+        Chunks don't need to line up with records or lines.
+        """
+        buf = self._pending + data if self._pending else data
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        newlines = np.flatnonzero(arr == _NEWLINE)
+        num_records = len(newlines) // 4
+        if num_records == 0:
+            self._pending = bytes(buf)
+            return b""
+        record_ends = newlines[3::4][:num_records] + 1
+        record_starts = np.empty(num_records, dtype=np.int64)
+        record_starts[0] = 0
+        record_starts[1:] = record_ends[:-1]
+        kept = self._find_pairs(arr, record_starts, newlines[0::4][:num_records])
+
+        # the last record might pair up with the first one in the next chunk
+        if kept[-1]:
+            self._pending = bytes(buf[record_ends[-1]:])
+            self.reads_in += num_records
+        else:
+            self._pending = bytes(buf[record_starts[-1]:])
+            self.reads_in += num_records - 1
+        self.reads_out += int(kept.sum())
+
+        # kept records mostly come in long runs, so copy out whole runs at once
+        edges = np.diff(np.concatenate(([0], kept.astype(np.int8), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        return b"".join(buf[record_starts[start]:record_ends[end - 1]] for (start, end) in zip(run_starts, run_ends))
+
+    def finish(self):
+        """
+        Finishes up the last record, if the data didn't end with a newline, and returns any
+        paired records that were left. Whatever's left after that is unpaired.
+        """
+        out = b""
+        if self._pending and not self._pending.endswith(b"\n"):
+            out = self.update(b"\n")
+        if self._pending.count(b"\n") >= 4:
+            self.reads_in += 1
+        self._pending = b""
+        return out
+
+    @staticmethod
+    def _find_pairs(arr, record_starts, header_ends):
+        """
+        Returns a boolean array, True for each record that has a mate.
+        """
+        num_records = len(record_starts)
+        kept = np.zeros(num_records, dtype=bool)
+        if num_records < 2:
+            return kept
+        # names run from after the @ to the first whitespace
+        name_starts = record_starts + 1
+        whitespace = np.flatnonzero((arr == _SPACE) | (arr == _TAB) | (arr == _CARRIAGE_RETURN))
+        first_whitespace = np.append(whitespace, len(arr))[np.searchsorted(whitespace, name_starts)]
+        name_lengths = np.minimum(first_whitespace, header_ends) - name_starts
+        width = max(int(name_lengths.max()), 1)
+        columns = np.arange(width)
+        names = arr[np.minimum(name_starts[:, None] + columns, len(arr) - 1)]
+        names[columns >= name_lengths[:, None]] = 0
+
+        last = name_starts + name_lengths - 1
+        suffixed = (name_lengths >= 2) & (arr[np.maximum(last - 1, 0)] == _SLASH) & \
+            (arr[np.maximum(last, 0)] >= _ZERO) & (arr[np.maximum(last, 0)] <= _NINE)
+        same_length = name_lengths[:-1] == name_lengths[1:]
+        ignored = (suffixed[:-1] & suffixed[1:])[:, None] & (columns >= name_lengths[:-1, None] - 2)
+        same = same_length & ~((names[:-1] != names[1:]) & ~ignored).any(axis=1)
+
+        # a record pairs with the next one if their names match and it wasn't already paired
+        # with the one before. In a run of matching names, that's every other record.
+        index = np.arange(num_records - 1)
+        run_starts = same & ~np.concatenate(([False], same[:-1]))
+        run_start_index = np.maximum.accumulate(np.where(run_starts, index, 0))
+        first_of_pair = same & ((index - run_start_index) % 2 == 0)
+        kept[:-1] |= first_of_pair
+        kept[1:] |= first_of_pair
+        return kept
+
+
+def read_length_stats(reads_file, histogram_file=None):
+    """
+    Reads through a plain or gzipped FASTQ file in large chunks and returns the summary dict from
+    FastqStats.summary. If histogram_file is given, the readlength.sh style report is written
+    there, too.
+    """
+    stats = FastqStats()
+    with open_reads(reads_file) as reads:
+        while True:
+            chunk = reads.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            stats.update(chunk)
+    stats.finish()
+    if histogram_file is not None:
+        stats.write_histogram(histogram_file)
+    return stats.summary()
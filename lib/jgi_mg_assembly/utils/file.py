@@ -1,15 +1,41 @@
 """
 Some utility functions for mangling, er, managing files.
 Specifically:
-    - reads file pulling
+    - reads file pulling (in parallel, for multiple libraries)
+    - reads file concatenation
+    - reads file pushing, decompressing on the way
     - assembly file pushing
     - KBaseReport assembly and uploading
 """
 import os
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from installed_clients.ReadsUtilsClient import ReadsUtils
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.ReadsAlignmentUtilsClient import ReadsAlignmentUtils
+from jgi_mg_assembly.utils.fastq import (
+    is_gzipped,
+    open_reads,
+    CHUNK_SIZE
+)
+
+
+MAX_DOWNLOAD_THREADS = 4
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+
+
+def _last_byte(path):
+    """
+    Returns the last byte of the file at path, or None if it's empty.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return None
+        f.seek(-1, os.SEEK_END)
+        return f.read(1)
 
 
 class FileUtil(object):
@@ -19,15 +45,29 @@ class FileUtil(object):
     def fetch_reads_files(self, reads_upas):
         """
         From a list of reads UPAs, uses ReadsUtils to fetch the reads as files.
-        Returns them as a dictionary from reads_upa -> filename
+        Each library is downloaded with its own ReadsUtils call, and up to MAX_DOWNLOAD_THREADS of
+        those run at once.
+        Returns them as a dictionary from reads_upa -> filename, in the same order as reads_upas.
         """
         if reads_upas is None:
             raise ValueError("reads_upas must be a list of UPAs")
         if len(reads_upas) == 0:
             raise ValueError("reads_upas must contain at least one UPA")
+        with ThreadPoolExecutor(max_workers=min(len(reads_upas), MAX_DOWNLOAD_THREADS)) as executor:
+            downloads = [executor.submit(self._download_reads, upa) for upa in reads_upas]
+            file_set = OrderedDict()
+            for download in downloads:
+                file_set.update(download.result())
+        return file_set
+
+    def _download_reads(self, reads_upa):
+        """
+        Downloads a single reads library as an interleaved file.
+        Returns a dict of reads_upa -> filename
+        """
         ru = ReadsUtils(self.callback_url)
         reads_info = ru.download_reads(({
-            'read_libraries': reads_upas,
+            'read_libraries': [reads_upa],
             'interleaved': 'true',
             'gzipped': None
         }))['files']
@@ -36,6 +76,35 @@ class FileUtil(object):
             file_set[reads] = reads_info[reads]['files']['fwd']
         return file_set
 
+    def concatenate_reads_files(self, reads_files):
+        """
+        Combines a list of interleaved reads files into one, for co-assembly.
+        Rather than writing a new file, this appends each of the other files onto the end of the
+        first one, deleting each after it's been appended. So no more than one extra library's
+        worth of space gets used along the way, and there's never a second full copy of the data.
+        The files are expected to all be uncompressed, as ReadsUtils downloads them, or all
+        gzipped (gzip files can be concatenated as-is). If an uncompressed file doesn't end with
+        a newline, one gets added before the next file, so its last record stays separate.
+        Returns the path to the combined file, which is the first one in the list.
+        """
+        if not reads_files:
+            raise ValueError("reads_files must contain at least one file")
+        combined = reads_files[0]
+        if len(reads_files) == 1:
+            return combined
+        gzipped = is_gzipped(combined)
+        last_byte = _last_byte(combined)
+        with open(combined, "ab") as out_file:
+            for reads_file in reads_files[1:]:
+                if not gzipped and last_byte not in (None, b"\n"):
+                    out_file.write(b"\n")
+                    last_byte = b"\n"
+                with open(reads_file, "rb") as in_file:
+                    shutil.copyfileobj(in_file, out_file, COPY_BUFFER_SIZE)
+                last_byte = _last_byte(reads_file) or last_byte
+                os.remove(reads_file)
+        return combined
+
     def upload_assembly(self, file_path, workspace_name, assembly_name):
         """
         From a list of file paths, uploads them to KBase, generates Assembly objects,
@@ -83,6 +152,25 @@ class FileUtil(object):
         })["obj_ref"]
         return reads_upa
 
+    def upload_compressed_reads(self, compressed_file, decompressed_file, workspace_name, reads_name,
+                                source_reads_upa):
+        """
+        Uploads a gzipped interleaved reads file as a PE reads object.
+        ReadsUtils needs an uncompressed local file, which it reads through twice (once to
+        validate, once to store), so this streams the decompressed reads into decompressed_file
+        in large chunks, uploads that, and removes it as soon as the upload finishes (or fails),
+        so the uncompressed copy only takes up scratch space while it's needed.
+        """
+        if not compressed_file or not os.path.exists(compressed_file):
+            raise ValueError("The given reads file '{}' does not exist".format(compressed_file))
+        try:
+            with open_reads(compressed_file) as reads, open(decompressed_file, "wb") as out_file:
+                shutil.copyfileobj(reads, out_file, CHUNK_SIZE)
+            return self.upload_reads(decompressed_file, workspace_name, reads_name, source_reads_upa)
+        finally:
+            if os.path.exists(decompressed_file):
+                os.remove(decompressed_file)
+
     def upload_alignment(self, file_path, reads_upa, assembly_upa, workspace_name, alignment_name):
         if not file_path:
             raise ValueError("file_path must be defined")
@@ -1,55 +1,139 @@
 import matplotlib
 matplotlib.use('Agg')
 from matplotlib import pyplot as plt
+from matplotlib.artist import setp
+from matplotlib.colors import LogNorm
 from matplotlib.ticker import ScalarFormatter
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
 import os
+from .bbmap_stats import read_covstats
 
-def generate_graphics(cov_file, output_dir):
-    df = pd.read_table(cov_file)
-    fold_vs_len_file = _generate_fold_vs_length(df, output_dir, "png")
-    fold_vs_gc_file = _generate_fold_vs_gc(df, output_dir, "png")
-    gc_hist_file = _generate_gc_histogram(df, output_dir, "png")
-    return {
-        "avg_fold_vs_len": fold_vs_len_file,
-        "gc_vs_avg_fold": fold_vs_gc_file,
-        "gc_hist": gc_hist_file
-    }
+# The only covstats columns the plots use.
+GRAPHICS_COLUMNS = ["Length", "Avg_fold", "Ref_GC"]
 
-def _generate_fold_vs_length(df, output_dir, suffix):
+# Above this many contigs, the scatter plots are drawn as binned densities instead of one
+# marker per contig, so they take time proportional to DENSITY_BINS**2 instead of the number
+# of contigs.
+DENSITY_THRESHOLD = 100000
+DENSITY_BINS = 200
+
+def generate_graphics(cov_file, output_dir, density_threshold=DENSITY_THRESHOLD, workers=None):
     """
-    df = dataframe, expected to have Avg_fold and Length columns
-    Makes a file called "avg_fold_vs_len.{suffix}" and returns the full path to it.
+    Makes the coverage plots from a BBMap covstats file. If there are more than
+    density_threshold contigs, the two scatter plots are drawn as 2D histograms (see _density).
+    The covstats file gets read once, then each plot is rendered in its own worker process
+    (up to workers of them at once, default one per plot, but no more than there are CPUs), so
+    adding a plot doesn't add to the time this takes. The workers are started from a fork server,
+    not forked from this process, since it has other threads running (forking those can leave
+    locks held in the child). With workers=1, they're all rendered in this process instead.
+    Returns a dict of plot name -> file.
+    """
+    cov = read_covstats(cov_file, columns=GRAPHICS_COLUMNS).columns
+    density = len(cov["Length"]) > density_threshold
+    jobs = list()
+    for (name, plot, columns) in PLOTS:
+        jobs.append((name, plot, ({c: cov[c] for c in columns}, output_dir, "png", density)))
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        return {name: plot(*args) for (name, plot, args) in jobs}
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context("forkserver")) as executor:
+        futures = {name: executor.submit(plot, *args) for (name, plot, args) in jobs}
+        return {name: future.result() for (name, future) in futures.items()}
+
+def _new_figure():
+    """
+    Returns a new 6x6 inch figure and its axes, with the y axis tick labels turned on their side.
     """
     fig, ax = plt.subplots(figsize=(6,6))
-    plt.yticks(rotation=90, va='center')
-    plt.plot(df.Length, df.Avg_fold, '+')
+    setp(ax.get_yticklabels(), rotation=90, va='center')
+    return fig, ax
+
+def _save_figure(fig, output_dir, name, suffix):
+    """
+    Saves fig as {name}.{suffix} in output_dir, then closes it, and returns the full path to the file.
+    """
+    outfile = os.path.join(output_dir, "{}.{}".format(name, suffix))
+    try:
+        fig.savefig(outfile, dpi=100)
+    finally:
+        plt.close(fig)
+    return outfile
+
+def _density(ax, x, y, x_log=False, y_log=False):
+    """
+    Draws the points (x, y) on ax as a 2D histogram - the points get counted into
+    DENSITY_BINS x DENSITY_BINS bins (log-spaced along any log scale axis), and each bin is
+    colored by its count, on a log scale. Points that can't go on a log axis (<= 0) are
+    dropped, the same as they would be from a scatter plot.
+    """
+    keep = np.ones(len(x), dtype=bool)
+    if x_log:
+        keep &= x > 0
+    if y_log:
+        keep &= y > 0
+    x = x[keep]
+    y = y[keep]
+    if len(x) == 0:
+        return
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=[_bin_edges(x, x_log), _bin_edges(y, y_log)])
+    mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap="viridis")
+    ax.figure.colorbar(mesh, ax=ax, label="# of contigs")
+
+def _bin_edges(values, log):
+    low = float(values.min())
+    high = float(values.max())
+    if log:
+        low, high = np.log10(low), np.log10(high)
+    if high <= low:
+        high = low + 1
+    if log:
+        return np.logspace(low, high, DENSITY_BINS + 1)
+    return np.linspace(low, high, DENSITY_BINS + 1)
+
+def _generate_fold_vs_length(cov, output_dir, suffix, density=False):
+    """
+    cov = dict of covstats columns (NumPy arrays), expected to have Avg_fold and Length
+    density = if True, draw a binned density instead of one marker per contig
+    Makes a file called "avg_fold_vs_len.{suffix}" and returns the full path to it.
+    """
+    fig, ax = _new_figure()
+    if density:
+        _density(ax, cov["Length"], cov["Avg_fold"], y_log=True)
+    else:
+        ax.plot(cov["Length"], cov["Avg_fold"], '+')
     ax.set_yscale('log')
     ax.yaxis.set_major_formatter(ScalarFormatter())
     ax.set(xlabel="Contigs Length (bp)", ylabel="Average coverage fold (x)", title="Contigs average fold coverage vs. Contigs length")
+    return _save_figure(fig, output_dir, "avg_fold_vs_len", suffix)
 
-    outfile = os.path.join(output_dir, "avg_fold_vs_len.{}".format(suffix))
-    fig.savefig(outfile, dpi=100)
-    return outfile
-
-def _generate_fold_vs_gc(df, output_dir, suffix):
-    fig, ax = plt.subplots(figsize=(6,6))
-    plt.yticks(rotation=90, va='center')
-    plt.plot(df.Avg_fold, df.Ref_GC, '+')
+def _generate_fold_vs_gc(cov, output_dir, suffix, density=False):
+    fig, ax = _new_figure()
+    if density:
+        _density(ax, cov["Avg_fold"], cov["Ref_GC"], x_log=True)
+    else:
+        ax.plot(cov["Avg_fold"], cov["Ref_GC"], '+')
     ax.set_xscale('log')
-    ax.xaxis.set_major_formatter(matplotlib.ticker.ScalarFormatter())
+    ax.xaxis.set_major_formatter(ScalarFormatter())
     ax.set(xlabel="Average coverage fold (x)", ylabel="GC (%)", title="Contigs average fold coverage vs. GC")
+    return _save_figure(fig, output_dir, "gc_vs_avg_fold", suffix)
 
-    outfile = os.path.join(output_dir, "gc_vs_avg_fold.{}".format(suffix))
-    fig.savefig(outfile, dpi=100)
-    return outfile
-
-def _generate_gc_histogram(df, output_dir, suffix):
-    fig, ax = plt.subplots(figsize=(6,6))
-    plt.yticks(rotation=90, va='center')
-    plt.hist(df[df['Length'].gt(0)].Ref_GC*100, [v/10.0 for v in range(0, 1020, 15)], lw=1, fill=False, fc=(0, 0, 0))
+def _generate_gc_histogram(cov, output_dir, suffix, density=False):
+    """
+    density is ignored - a histogram is already binned.
+    """
+    fig, ax = _new_figure()
+    ax.hist(cov["Ref_GC"][cov["Length"] > 0]*100, [v/10.0 for v in range(0, 1020, 15)], lw=1, fill=False, fc=(0, 0, 0))
     ax.set(ylabel="# of contigs", xlabel="GC (%)", title="GC Histogram for contigs")
+    return _save_figure(fig, output_dir, "gc_hist", suffix)
 
-    outfile = os.path.join(output_dir, "gc_hist.{}".format(suffix))
-    fig.savefig(outfile, dpi=100)
-    return outfile
+# The plots generate_graphics makes - the name for each in its results, the function that
+# draws it, and the covstats columns that function needs.
+PLOTS = [
+    ("avg_fold_vs_len", _generate_fold_vs_length, ["Length", "Avg_fold"]),
+    ("gc_vs_avg_fold", _generate_fold_vs_gc, ["Avg_fold", "Ref_GC"]),
+    ("gc_hist", _generate_gc_histogram, ["Ref_GC", "Length"])
+]
@@ -0,0 +1,327 @@
+"""
+K-mer counting utilities.
+
+HyperLogLog estimates the number of distinct k-mers in a set of reads, in a fixed amount of
+memory (2 ** precision one-byte registers, 16 KB by default), to within a percent or two. The
+k-mers are canonical (a k-mer and its reverse complement count as the same one, as in SPAdes and
+BBTools), and any k-mer with a base other than A, C, G, or T in it is skipped.
+
+add_to_all adds the same reads to a HyperLogLog for each of a list of k values (say, the ones
+SPAdes will use). count_kmers streams a whole reads file through those, with the chunks of reads
+spread over a pool of threads. This is what the pipeline's memory check before assembly uses. The
+pre-flight sizing only looks at a sample of the reads (see utils/preflight.py).
+
+The bases are packed 2 bits each into 64-bit words, 32 bases to a word. A k-mer of up to 32
+bases is hashed from its word. A longer one is hashed by folding together the words for each 32
+bases of it, and the words for each k are made from the same packed words, so counting several
+k values at once doesn't cost much more than counting the longest one. All the work is done with
+NumPy on whole batches of reads at a time, which also lets the threads run in parallel.
+"""
+from __future__ import print_function
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from jgi_mg_assembly.utils.fastq import (
+    open_reads,
+    CHUNK_SIZE
+)
+
+DEFAULT_K = 31
+DEFAULT_PRECISION = 14
+# at least 11 bits of precision keeps what's left of the hash under 2 ** 53 (see add_hashes)
+MIN_PRECISION = 11
+MAX_PRECISION = 18
+BATCH_BASES = 256 * 1024
+# roughly what metaSPAdes needs per distinct k-mer in its de Bruijn graph (the k-mer, its coverage,
+# and its edges), to turn a k-mer count into GB of memory. This is a rule of thumb, not a fit to
+# measured runs - it hasn't been checked against BBTools.run_mem_estimator, which the memory check
+# used before. So the estimate is only used to fail early on reads that won't fit, and SPAdes
+# always gets all the usable memory (see utils/resources.py).
+ASSEMBLY_BYTES_PER_KMER = 20
+
+_WORD_BASES = 32
+# an odd 64-bit constant (from the golden ratio), for folding the words of long k-mers together
+_FOLD_MULTIPLIER = np.uint64(0x9e3779b97f4a7c15)
+_INVALID = 4
+# maps each byte to its 2 bit code (A=0, C=1, G=2, T=3, either case), or _INVALID
+_CODES = np.full(256, _INVALID, dtype=np.uint8)
+for (_i, _base) in enumerate(b"ACGT"):
+    _CODES[_base] = _i
+    _CODES[ord(chr(_base).lower())] = _i
+
+
+def _mix64(values):
+    """
+    The splitmix64 finalizer, to spread the packed k-mers evenly over all 64 bits.
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def assembly_memory_gb(distinct_kmers):
+    """
+    Roughly how much memory (in GB) assembling reads with this many distinct k-mers takes.
+    """
+    return float(distinct_kmers) * ASSEMBLY_BYTES_PER_KMER / 1024 ** 3
+
+
+class _PackedReads(object):
+    """
+    A batch of reads, encoded 2 bits per base, with the packed words of each length (up to 32
+    bases) starting at every position, so they can be shared between k values.
+    """
+    def __init__(self, sequences):
+        # join the reads with an invalid base in between, so no k-mer spans two reads
+        codes = _CODES[np.frombuffer(b"N".join(sequences), dtype=np.uint8)]
+        self.size = len(codes)
+        self._invalid = np.concatenate(([0], np.cumsum(codes == _INVALID)))
+        # pad the end, so there's a full 32 base word starting at every position. The invalid
+        # bases are packed as As (k-mers with them are dropped anyway), so they don't spill into
+        # the bits of the bases next to them.
+        codes = np.concatenate((codes, np.full(_WORD_BASES - 1, _INVALID, dtype=np.uint8)))
+        self._codes = (codes & 3).astype(np.uint64)
+        self._words = dict()
+
+    def words(self, length):
+        """
+        Returns (forward, reverse) - the packed forward and reverse complement words of length
+        bases, starting at each position. Only the 32 base words get packed - the shorter ones
+        are the first bases of those.
+        """
+        if length not in self._words:
+            if length == _WORD_BASES:
+                self._words[length] = self._pack()
+            else:
+                (forward, reverse) = self.words(_WORD_BASES)
+                # the first bases are the high bits of the forward word, and the low bits of the
+                # reverse complement one
+                self._words[length] = (forward >> np.uint64(2 * (_WORD_BASES - length)),
+                                       reverse & np.uint64((1 << (2 * length)) - 1))
+        return self._words[length]
+
+    def _pack(self):
+        forward = np.zeros(self.size, dtype=np.uint64)
+        reverse = np.zeros(self.size, dtype=np.uint64)
+        complement = np.empty(self.size, dtype=np.uint64)
+        for i in range(_WORD_BASES):
+            window = self._codes[i:i + self.size]
+            forward <<= np.uint64(2)
+            forward |= window
+            # complementing a 2 bit code is 3 - code, which is code ^ 3 for valid bases
+            np.bitwise_xor(window, np.uint64(3), out=complement)
+            complement <<= np.uint64(2 * i)
+            reverse |= complement
+        return (forward, reverse)
+
+    def hashes(self, k):
+        """
+        Returns the hashes of all the canonical k-mers in the batch (see kmer_hashes).
+        """
+        n = self.size - k + 1
+        if n < 1:
+            return np.zeros(0, dtype=np.uint64)
+        valid = (self._invalid[k:] - self._invalid[:n]) == 0
+        if k <= _WORD_BASES:
+            (forward, reverse) = self.words(k)
+            return _mix64(np.minimum(forward[:n], reverse[:n])[valid])
+
+        # the forward strand is the 32 base words at k-mer offsets 0, 32, 64..., then the rest.
+        # The reverse complement strand starts with the reverse complement of the last 32 bases,
+        # then the 32 before that, and so on, and ends with the reverse complement of the first
+        # few bases. Each strand's words are folded together with a multiply and add, and only
+        # the canonical one gets mixed into the final hash.
+        (full_words, tail) = divmod(k, _WORD_BASES)
+        (words_forward, words_reverse) = self.words(_WORD_BASES)
+        forward = words_forward[:n].copy()
+        reverse = words_reverse[k - _WORD_BASES:k - _WORD_BASES + n].copy()
+        for i in range(1, full_words):
+            forward *= _FOLD_MULTIPLIER
+            forward += words_forward[i * _WORD_BASES:i * _WORD_BASES + n]
+            offset = k - (i + 1) * _WORD_BASES
+            reverse *= _FOLD_MULTIPLIER
+            reverse += words_reverse[offset:offset + n]
+        if tail:
+            (tail_forward, tail_reverse) = self.words(tail)
+            offset = full_words * _WORD_BASES
+            forward *= _FOLD_MULTIPLIER
+            forward += tail_forward[offset:offset + n]
+            reverse *= _FOLD_MULTIPLIER
+            reverse += tail_reverse[:n]
+        # either strand would do, as long as both strands pick the same one
+        np.minimum(forward, reverse, out=forward)
+        return _mix64(forward[valid])
+
+
+def kmer_hashes(sequences, k=DEFAULT_K):
+    """
+    Returns a uint64 array with the hash of every canonical k-mer in sequences (a list of bytes,
+    one per read). K-mers that include anything but A, C, G, or T are left out.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1, not {}".format(k))
+    return _PackedReads(sequences).hashes(k)
+
+
+def _batches(sequences, batch_bases=BATCH_BASES):
+    """
+    Splits sequences into lists of about batch_bases bases each. Hashing a batch at a time keeps
+    the working arrays small enough to stay in the CPU cache.
+    """
+    batch = list()
+    size = 0
+    for sequence in sequences:
+        batch.append(sequence)
+        size += len(sequence)
+        if size >= batch_bases:
+            yield batch
+            batch = list()
+            size = 0
+    if batch:
+        yield batch
+
+
+def add_to_all(hlls, sequences):
+    """
+    Adds the k-mers in sequences to each of a list of HyperLogLogs (with different k values),
+    sharing the packed words between them.
+    """
+    for batch in _batches(sequences):
+        packed = _PackedReads(batch)
+        for hll in hlls:
+            hll.add_hashes(packed.hashes(hll.k))
+
+
+class HyperLogLog(object):
+    """
+    Usage:
+        hll = HyperLogLog()
+        hll.add_sequences([b"ACGT...", ...])    # as many times as needed
+        hll.estimate()    # the number of distinct k-mers added
+    """
+    def __init__(self, k=DEFAULT_K, precision=DEFAULT_PRECISION):
+        if k < 1:
+            raise ValueError("k must be at least 1, not {}".format(k))
+        if precision < MIN_PRECISION or precision > MAX_PRECISION:
+            raise ValueError("precision must be between {} and {}, not {}".format(
+                MIN_PRECISION, MAX_PRECISION, precision))
+        self.k = k
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.kmers = 0
+
+    def add_sequences(self, sequences):
+        """
+        Adds all the canonical k-mers in sequences (a list of bytes, one per read).
+        """
+        add_to_all([self], sequences)
+
+    def add_hashes(self, hashes):
+        """
+        Adds 64-bit hashes (as made by kmer_hashes).
+        """
+        if len(hashes) == 0:
+            return
+        self.kmers += len(hashes)
+        remainder_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remainder_bits)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << remainder_bits) - 1)
+        # the rank is the position of the first 1 bit in the remainder. frexp gives the bit length
+        # exactly, since the remainder is less than 2 ** 53.
+        (_, bit_length) = np.frexp(remainder.astype(np.float64))
+        rank = (remainder_bits + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Adds everything in another HyperLogLog (with the same k and precision) to this one.
+        """
+        if other.k != self.k or other.precision != self.precision:
+            raise ValueError("Can only merge HyperLogLogs with the same k and precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self.kmers += other.kmers
+
+    def copy(self):
+        hll = HyperLogLog(self.k, self.precision)
+        hll.registers[:] = self.registers
+        hll.kmers = self.kmers
+        return hll
+
+    def estimate(self):
+        """
+        Returns the estimated number of distinct k-mers added so far.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty > 0:
+            # small range correction - linear counting is more accurate here
+            estimate = m * np.log(float(m) / empty)
+        return int(round(estimate))
+
+
+def _fastq_sequences(chunks):
+    """
+    Yields the list of read sequences in each chunk of FASTQ data (see count_kmers), carrying
+    any partial record over to the next chunk.
+    """
+    partial = b""
+    for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        num_records = (len(lines) - 1) // 4
+        yield [line.rstrip(b"\r") for line in lines[1:num_records * 4:4]]
+        partial = b"\n".join(lines[num_records * 4:])
+    # the last record, if the file didn't end with a newline
+    lines = partial.split(b"\n")
+    if len(lines) >= 2:
+        yield [lines[1].rstrip(b"\r")]
+
+
+def count_kmers(reads_file, ks=(DEFAULT_K,), threads=None, precision=DEFAULT_PRECISION):
+    """
+    Estimates the number of distinct canonical k-mers in a FASTQ file (gzipped or not), for each
+    k in ks, in one pass through the file. The file is read in CHUNK_SIZE chunks, each of which
+    is counted by one of threads threads (the number of cores, by default) into its own
+    HyperLogLogs, which get merged at the end.
+    Returns a dict of k -> the estimated number of distinct k-mers.
+    """
+    if threads is None:
+        threads = os.cpu_count() or 1
+    threads = max(1, threads)
+    local = threading.local()
+    thread_hlls = list()
+    lock = threading.Lock()
+
+    def count(sequences):
+        if not hasattr(local, "hlls"):
+            local.hlls = [HyperLogLog(k, precision) for k in ks]
+            with lock:
+                thread_hlls.append(local.hlls)
+        add_to_all(local.hlls, sequences)
+
+    def read_chunks(reads):
+        while True:
+            chunk = reads.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    with open_reads(reads_file) as reads, ThreadPoolExecutor(max_workers=threads) as executor:
+        # only keep a couple of chunks per thread in memory at a time
+        pending = list()
+        for sequences in _fastq_sequences(read_chunks(reads)):
+            pending.append(executor.submit(count, sequences))
+            if len(pending) >= 2 * threads:
+                pending.pop(0).result()
+        for counted in pending:
+            counted.result()
+
+    totals = [HyperLogLog(k, precision) for k in ks]
+    for hlls in thread_hlls:
+        for (total, hll) in zip(totals, hlls):
+            total.merge(hll)
+    return {total.k: total.estimate() for total in totals}
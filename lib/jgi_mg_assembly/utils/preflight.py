@@ -0,0 +1,134 @@
+"""
+Quick sizing of the input reads, before any of the real work starts.
+
+size_reads only reads the first SAMPLE_BYTES of (uncompressed) FASTQ from the reads file. From
+that sample, it works out the compression ratio, the average read length and record size, and the
+number of distinct k-mers for each of a list of k values (with a HyperLogLog for each, see
+utils/kmers.py). It then scales those up to the whole file.
+
+Distinct k-mers don't grow linearly with the number of reads, since most k-mers in the later
+reads have been seen already. So the sample's k-mers are counted at its halfway point and at its
+end, and the growth between the two is fitted to a power law (Heaps' law) to extrapolate the
+total. At the low coverage of a small sample of a metagenome that's close to linear, so the
+k-mer count (and the memory estimate from it) leans high.
+"""
+from __future__ import print_function
+import gzip
+import math
+import os
+from jgi_mg_assembly.utils.fastq import is_gzipped
+from jgi_mg_assembly.utils.kmers import (
+    HyperLogLog,
+    add_to_all,
+    assembly_memory_gb,
+    DEFAULT_K
+)
+
+SAMPLE_BYTES = 64 * 1024 * 1024
+
+
+def _read_sample(reads_file, sample_bytes):
+    """
+    Reads up to sample_bytes of uncompressed FASTQ from the start of reads_file, trimmed to whole
+    records. Returns (sequences, sample_size, compressed_size, complete) - the read sequences,
+    the size of the records they came from, the number of bytes of the file that took, and
+    whether that was the whole file.
+    """
+    with open(reads_file, "rb") as raw:
+        if is_gzipped(reads_file):
+            with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+                data = f.read(sample_bytes + 1)
+                complete = len(data) <= sample_bytes
+                # what's been read from the file so far (the gzip reader buffers a little ahead)
+                compressed_size = raw.tell()
+        else:
+            data = raw.read(sample_bytes + 1)
+            complete = len(data) <= sample_bytes
+            compressed_size = min(len(data), sample_bytes)
+    data = data[:sample_bytes]
+    lines = data.split(b"\n")
+    # the last line is either empty, cut off, or (at the end of the file) missing its newline
+    full_lines = len(lines) if complete and lines[-1] else len(lines) - 1
+    num_records = full_lines // 4
+    sequences = [line.rstrip(b"\r") for line in lines[1:num_records * 4:4]]
+    sample_size = sum(len(line) + 1 for line in lines[:num_records * 4])
+    if complete:
+        sample_size = len(data)
+        compressed_size = os.path.getsize(reads_file)
+    return sequences, sample_size, compressed_size, complete
+
+
+def _extrapolate_kmers(half_kmers, sample_kmers, half_bases, sample_bases, scale):
+    """
+    Scales the number of distinct k-mers in a sample up by scale (the size of the whole file over
+    the size of the sample), with Heaps' law. Returns (kmers, growth), where growth is the
+    fitted exponent.
+    """
+    growth = 1.0
+    if half_kmers > 0 and sample_kmers > half_kmers and sample_bases > half_bases > 0:
+        growth = math.log(float(sample_kmers) / half_kmers) / math.log(float(sample_bases) / half_bases)
+        growth = min(1.0, max(0.0, growth))
+    return int(sample_kmers * scale ** growth), growth
+
+
+def size_reads(reads_file, sample_bytes=SAMPLE_BYTES, ks=(DEFAULT_K,)):
+    """
+    Estimates the size of a FASTQ file (gzipped or not) from a sample at its start, with the
+    distinct k-mers counted for each k in ks.
+    Returns a dict with keys:
+    file_size - the size of the file on disk, in bytes
+    compression_ratio - uncompressed / compressed size of the sample (1 if it's not gzipped)
+    uncompressed_size - the estimated uncompressed size, in bytes
+    reads, bases - the estimated number of reads and bases
+    sampled_reads, sampled_bases - the number of reads and bases in the sample
+    kmer_counts - dict of k (as a string) -> the estimated number of distinct k-mers in the
+                  whole file
+    k - the k with the most distinct k-mers, which the rest of these are for
+    sampled_kmers - the number of distinct k-mers in the sample
+    kmers - the estimated number of distinct k-mers in the whole file
+    kmer_growth - the Heaps' law exponent used to extrapolate kmers (1 would be linear)
+    memory_estimate_gb - the estimated memory to assemble the reads, from kmers
+    exact - True if the sample was the whole file, so the counts are exact (except for kmers,
+            which is still a HyperLogLog estimate)
+    """
+    file_size = os.path.getsize(reads_file)
+    sequences, sample_size, compressed_size, complete = _read_sample(reads_file, sample_bytes)
+    num_reads = len(sequences)
+    half = num_reads // 2
+    half_bases = sum(len(s) for s in sequences[:half])
+    sample_bases = half_bases + sum(len(s) for s in sequences[half:])
+
+    hlls = [HyperLogLog(k=k) for k in ks]
+    add_to_all(hlls, sequences[:half])
+    half_kmers = [hll.estimate() for hll in hlls]
+    add_to_all(hlls, sequences[half:])
+    sample_kmers = [hll.estimate() for hll in hlls]
+
+    compression_ratio = float(sample_size) / compressed_size if compressed_size else 1.0
+    if complete or sample_size == 0:
+        scale = 1.0
+        uncompressed_size = sample_size
+    else:
+        uncompressed_size = int(file_size * compression_ratio)
+        scale = float(uncompressed_size) / sample_size
+    extrapolated = [_extrapolate_kmers(half, sample, half_bases, sample_bases, scale)
+                    for (half, sample) in zip(half_kmers, sample_kmers)]
+    # the k with the most k-mers sets the memory estimate
+    most = max(range(len(ks)), key=lambda i: extrapolated[i][0])
+    (kmers, growth) = extrapolated[most]
+    return {
+        "file_size": file_size,
+        "compression_ratio": round(compression_ratio, 3),
+        "uncompressed_size": uncompressed_size,
+        "reads": int(num_reads * scale),
+        "bases": int(sample_bases * scale),
+        "sampled_reads": num_reads,
+        "sampled_bases": sample_bases,
+        "kmer_counts": {str(k): count for (k, (count, _)) in zip(ks, extrapolated)},
+        "k": ks[most],
+        "sampled_kmers": sample_kmers[most],
+        "kmers": kmers,
+        "kmer_growth": round(growth, 3),
+        "memory_estimate_gb": round(assembly_memory_gb(kmers), 2),
+        "exact": complete
+    }
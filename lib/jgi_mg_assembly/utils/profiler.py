@@ -0,0 +1,157 @@
+"""
+Profiles the resource use of a running process, and everything it starts.
+
+The CPU time and the bytes read from and written to disk are totals from the kernel: the
+profiler reaps the process itself with os.wait4, which reports what it and all the descendants
+it waited for used, including ones that were too short-lived to ever be seen running.
+
+Peak memory can't be had that way (the kernel only keeps the peak of each single process), so
+while the command runs, a background thread looks at the process tree with psutil every so often,
+and keeps the largest RSS summed over the tree. That's sampled, so a spike between two samples can
+be missed.
+"""
+from __future__ import print_function
+import os
+import threading
+import time
+import psutil
+
+SAMPLE_INTERVAL = 1.0   # seconds
+
+
+class ProcessProfiler(object):
+    """
+    Usage:
+        profiler = ProcessProfiler(pid)
+        profiler.start()
+        exit_code = profiler.wait(process)    # instead of process.wait()
+        profile = profiler.stop()    # -> dict, see summary()
+    """
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self._start_time = None
+        self._end_time = None
+        self._peak_rss = 0
+        self._root = None
+        # (pid, create time) of each process seen in the tree
+        self._processes = set()
+        # from os.wait4, once the process has been reaped by wait
+        self._rusage = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._start_time = time.time()
+        try:
+            self._root = psutil.Process(self.pid)
+        except psutil.NoSuchProcess:
+            self._root = None
+        self._sample()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wait(self, process):
+        """
+        Waits for process (the subprocess.Popen for pid) to finish, and returns its exit code,
+        the same as process.wait() would. Reaping it here gets the kernel's totals of the CPU and
+        I/O used by it and its descendants.
+        """
+        if process.returncode is not None:
+            return process.returncode
+        try:
+            (_, status, rusage) = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # something else reaped it already, so there's no usage to get
+            return process.wait()
+        self._rusage = rusage
+        if os.WIFSIGNALED(status):
+            process.returncode = -os.WTERMSIG(status)
+        else:
+            process.returncode = os.WEXITSTATUS(status)
+        return process.returncode
+
+    def stop(self):
+        """
+        Stops sampling and returns the summary. Call this once the process has finished (see
+        wait).
+        """
+        self._end_time = time.time()
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.summary()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        if self._root is None:
+            return
+        try:
+            processes = [self._root] + self._root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        rss = 0
+        for proc in processes:
+            try:
+                with proc.oneshot():
+                    # keyed by pid and create time, so a reused pid isn't mistaken for the old process
+                    key = (proc.pid, proc.create_time())
+                    rss += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+            with self._lock:
+                self._processes.add(key)
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+
+    def summary(self):
+        """
+        Returns a dict with these keys:
+        * wall_time - seconds from start to stop
+        * cpu_time - total user + system CPU seconds for all processes in the tree
+        * peak_rss - the largest total resident memory of the process tree seen, in bytes
+        * read_bytes - total bytes read from storage
+        * write_bytes - total bytes written to storage
+        * processes - the number of processes seen in the tree
+        The CPU and I/O totals are 0 if the process wasn't reaped by wait.
+        """
+        end_time = self._end_time if self._end_time is not None else time.time()
+        with self._lock:
+            processes = len(self._processes)
+            peak_rss = self._peak_rss
+        cpu_time = read_bytes = write_bytes = 0
+        if self._rusage is not None:
+            cpu_time = self._rusage.ru_utime + self._rusage.ru_stime
+            # these count 512 byte blocks, whatever the filesystem's block size
+            read_bytes = self._rusage.ru_inblock * 512
+            write_bytes = self._rusage.ru_oublock * 512
+        return {
+            "wall_time": round(end_time - self._start_time, 3) if self._start_time else 0,
+            "cpu_time": round(cpu_time, 3),
+            "peak_rss": peak_rss,
+            "read_bytes": read_bytes,
+            "write_bytes": write_bytes,
+            "processes": processes
+        }
+
+
+def combine_profiles(profiles):
+    """
+    Combines the profiles of several commands run one after the other into one - times, I/O
+    and process counts are added up, and the peak memory is the largest of the peaks.
+    Returns None if there are no profiles.
+    """
+    if not profiles:
+        return None
+    combined = dict()
+    for key in ["wall_time", "cpu_time", "read_bytes", "write_bytes", "processes"]:
+        combined[key] = sum(p[key] for p in profiles)
+    combined["wall_time"] = round(combined["wall_time"], 3)
+    combined["cpu_time"] = round(combined["cpu_time"], 3)
+    combined["peak_rss"] = max(p["peak_rss"] for p in profiles)
+    return combined
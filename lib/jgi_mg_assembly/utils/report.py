@@ -4,20 +4,29 @@ Used for making and uploading a KBaseReport for the MG assembly pipeline results
 import os
 import uuid
 import shutil
-import zipfile
-import subprocess
-import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 from installed_clients.DataFileUtilClient import DataFileUtil
 from installed_clients.KBaseReportClient import KBaseReport
 from .util import mkdir
 from .graphics import generate_graphics
+from .bbmap_stats import alignment_summary
+from .report_archive import (
+    ReportArchive,
+    REPORT_FILES,
+    DEFAULT_COMPRESSLEVEL
+)
 
 class ReportUtil(object):
-    def __init__(self, callback_url, output_dir):
+    def __init__(self, callback_url, output_dir, compresslevel=DEFAULT_COMPRESSLEVEL):
+        """
+        compresslevel is the zlib compression level (0-9) for the files in the report zip, if
+        prepare_report has to make it.
+        """
         self.callback_url = callback_url
         self.output_dir = output_dir
+        self.compresslevel = compresslevel
 
     def make_report(self, pipeline_output, workspace_name, saved_objects):
         """
@@ -48,12 +57,13 @@ class ReportUtil(object):
         },
         "bfc": {
             "command": string,
-            "corrected_reads": file
+            "parameters": string,
             "version_string": string
         },
         "seqtk": {
             "command": string,
             "cleaned_reads": file,
+            "reads_info": same as reads_info_corrected,
             "version_string": string
         },
         "spades": {
@@ -89,6 +99,10 @@ class ReportUtil(object):
             "version_string": string
         }
 
+        The steps that run local commands (bfc, seqtk, spades, agp, bbmap) can also have a
+        resource_profile dict, with the resources used by those commands (see
+        Step.resource_profile). Those get added to pipeline_info.json.
+
         saved_objects should be in the correct format for KBaseReports. So, a list of dicts:
         {
             "ref": upa,
@@ -97,16 +111,33 @@ class ReportUtil(object):
 
         After assembling the report, it uses the KBaseReports module to upload, and returns a dict
         with "report_ref" and "report_name" keys.
+
+        This is the same as calling prepare_report, then upload_report. Those can be called
+        separately so the report can be built before the saved objects are known.
         """
         # We're gonna assume that all files exist. The only ones that are maybes are from spades.
-        assert pipeline_output, "Pipeline output not found!"
+        self._check_pipeline_output(pipeline_output)
         assert workspace_name, "A workspace name is required!"
+        prepared_report = self.prepare_report(pipeline_output)
+        return self.upload_report(prepared_report, workspace_name, saved_objects)
 
-        required_counts = ["reads_info_prefiltered", "reads_info_filtered", "reads_info_corrected"]
-        for req in required_counts:
-            assert req in pipeline_output, "Required reads info '{}' is not present!".format(req)
-        if not saved_objects:
-            saved_objects = list()
+    def prepare_report(self, pipeline_output, archive=None):
+        """
+        Does everything for the report that doesn't need the saved objects - makes the graphics,
+        writes the HTML report and the zip file of outputs, and stores them both in Shock.
+        Expects pipeline_output to be in the format described in make_report.
+
+        archive is an optional ReportArchive that the pipeline has been adding step outputs to
+        as they finished. If given, only the files it doesn't have yet get added before it's
+        closed. Otherwise, a new one gets made with all of the files.
+
+        Returns a dict to pass to upload_report, with these keys:
+        * html_links - the html_links for KBaseReport
+        * file_links - the file_links for KBaseReport
+        """
+        self._check_pipeline_output(pipeline_output)
+        # this gets run alongside other things that use pipeline_output, so don't change it.
+        pipeline_output = dict(pipeline_output)
 
         pipeline_output["report_graphics"] = generate_graphics(pipeline_output["bbmap"]["coverage_file"], self.output_dir)
 
@@ -120,43 +151,87 @@ class ReportUtil(object):
         pipeline_info_file = os.path.join(html_report_dir, "pipeline_info.json")
         self._write_pipeline_info_file(pipeline_output, pipeline_info_file)
 
-        result_file = os.path.join(self.output_dir, "assembly_report.zip")
-        report_files = {
-            "reads_info_prefiltered": ["output_file"],
-            "reads_info_filtered": ["output_file"],
-            "reads_info_corrected": ["output_file"],
-            "rqcfilter": ["run_log"],
-            "spades": ["run_log", "params_log", "warnings_log"],
-            "stats": ["stats_tsv", "stats_txt", "stats_err"],
-            "bbmap": ["coverage_file", "stats_file"],
-            "report_graphics": pipeline_output["report_graphics"].keys()
+        if archive is None:
+            archive = ReportArchive(os.path.join(self.output_dir, "assembly_report.zip"), self.compresslevel)
+        for step in REPORT_FILES:
+            archive.add_step_output(step, pipeline_output.get(step))
+        archive.add_step_output("report_graphics", pipeline_output["report_graphics"],
+                                keys=pipeline_output["report_graphics"].keys())
+        archive.add_file(pipeline_info_file, "pipeline_info.json")
+        archive.add_file(html_file_name, "report.html")
+        result_file = archive.close()
+
+        # store the html report and the zip file at the same time.
+        dfu = DataFileUtil(self.callback_url)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            html_upload = executor.submit(dfu.file_to_shock, {
+                'file_path': html_report_dir,
+                'pack': 'zip'
+            })
+            zip_upload = executor.submit(dfu.file_to_shock, {
+                'file_path': result_file
+            })
+            html_shock_id = html_upload.result()['shock_id']
+            zip_shock_id = zip_upload.result()['shock_id']
+
+        return {
+            'html_links': [{
+                'shock_id': html_shock_id,
+                'name': 'index.html',
+                'description': 'assembly report'
+            }],
+            'file_links': [{
+                'shock_id': zip_shock_id,
+                'name': os.path.basename(result_file),
+                'label': 'assembly_report',
+                'description': 'JGI Metagenome Assembly Report'
+            }]
+        }
+
+    def upload_report(self, prepared_report, workspace_name, saved_objects):
+        """
+        Makes the KBaseReport object from the result of prepare_report, linked to the
+        saved_objects (see make_report). Returns a dict with "report_ref" and "report_name" keys.
+        """
+        assert workspace_name, "A workspace name is required!"
+        if not saved_objects:
+            saved_objects = list()
+
+        report_params = {
+            'message': 'JGI metagenome assembly report',
+            'direct_html_link_index': 0,
+            'html_links': prepared_report['html_links'],
+            'file_links': prepared_report['file_links'],
+            'report_object_name': 'JGI_assembly_pipeline.' + str(uuid.uuid4()),
+            'workspace_name': workspace_name,
+            'objects_created': saved_objects
         }
-        with zipfile.ZipFile(result_file, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as report_zip:
-            # add reads info report
-            for step, file_list in report_files.items():
-                for f in file_list:
-                    if f in pipeline_output[step] and os.path.exists(pipeline_output[step][f]):
-                        zip_path = os.path.join(step, os.path.basename(pipeline_output[step][f]))
-                        report_zip.write(pipeline_output[step][f], zip_path)
-            report_zip.write(pipeline_info_file, "pipeline_info.json")
-            report_zip.write(html_file_name, "report.html")
-
-        file_links = [{
-            'path': result_file,
-            'name': os.path.basename(result_file),
-            'label': 'assembly_report',
-            'description': 'JGI Metagenome Assembly Report'
-        }]
-        return self._upload_report(html_report_dir, file_links, workspace_name, saved_objects)
+
+        report_client = KBaseReport(self.callback_url)
+        report = report_client.create_extended_report(report_params)
+        return {
+            'report_ref': report['ref'],
+            'report_name': report['name']
+        }
+
+    def _check_pipeline_output(self, pipeline_output):
+        assert pipeline_output, "Pipeline output not found!"
+        required_counts = ["reads_info_prefiltered", "reads_info_filtered", "reads_info_corrected"]
+        for req in required_counts:
+            assert req in pipeline_output, "Required reads info '{}' is not present!".format(req)
 
     def _write_pipeline_info_file(self, pipeline_output, info_file):
         pipeline_steps = []
         for step in ["reads_info_prefiltered", "rqcfilter", "reads_info_filtered", "bfc", "seqtk", "reads_info_corrected", "spades", "agp", "stats", "bbmap"]:
-            pipeline_steps.append({
+            step_info = {
                 "step": step,
                 "command": pipeline_output[step]["command"],
                 "version": pipeline_output[step]["version_string"]
-            })
+            }
+            # resource use of the step's commands, if they were run locally
+            if pipeline_output[step].get("resource_profile"):
+                step_info["resource_profile"] = pipeline_output[step]["resource_profile"]
+            pipeline_steps.append(step_info)
         with open(info_file, "w") as f:
             f.write(json.dumps(pipeline_steps, indent=4))
 
@@ -186,8 +261,7 @@ class ReportUtil(object):
             assembly_stats_file = "".join(stats.readlines())
         assembly_stats = "Assembly stats:\n{}".format(assembly_stats_file)
 
-        counts = self._calc_alignment_counts(pipeline_output["bbmap"]["stats_file"])
-        m50, m90 = self._calc_m50_m90(pipeline_output["bbmap"]["coverage_file"], counts["input_reads"])
+        counts = alignment_summary(pipeline_output["bbmap"]["stats_file"], pipeline_output["bbmap"]["coverage_file"])
         alignment_stats = "Alignment of reads to final assembly:\n"
         if "error" in counts:
             alignment_stats = alignment_stats + "An error occurred! Unable to calculate alignment stats: {}".format(counts["error"])
@@ -197,7 +271,7 @@ class ReportUtil(object):
                 "The number of aligned reads is: {} ({})\n"
                 "m50/m90 (length where 50% or 90% of reads align to "
                 "contigs of this length or larger) is: {}/{}\n\n"
-            ).format(counts["input_reads"], counts["aligned"], counts["aligned_percent"], m50, m90)
+            ).format(counts["input_reads"], counts["aligned"], counts["aligned_percent"], counts["m50"], counts["m90"])
 
         protocol = self._protocol_text(pipeline_output)
 
@@ -224,10 +298,8 @@ class ReportUtil(object):
             rqcfilter_version = None
 
         bfc_version = pipeline_output["bfc"]["version_string"]
-        # the full bfc command str looks like this:
-        # /kb/module/bin/bfc -1 -k 21 -t 10 input_file_path > output_file_path
-        # trim down the first token, and the last 3 (infile > outfile)
-        bfc_command = " ".join(pipeline_output["bfc"]["command"].split(" ")[1:-3])
+        # the bfc options, without the input file, e.g.: -1 -k 21 -t 10 -s 10g
+        bfc_command = pipeline_output["bfc"]["parameters"]
 
         # for spades, we see the following: want the following cmd string:
         # /opt/SPAdes-3.12.0-Linux/bin/spades.py --only-assembler -k 33,55,77 --meta -t 32 -m 2000 -o output_directory --12 input_reads_file"
@@ -280,96 +352,3 @@ version 1.0.0 (5). It is based on the JGI pipeline: jgi_mg_meta_rqc.py (version
         if y == 0:
             return 0  # special case here - if y = 0, and x > 0, something's funky. ignore.
         return int(float(x) / float(y) * 100)
-
-    def _calc_alignment_counts(self, bbmapfile):
-        """
-        Adapted from jgi_mga_create_metadata_dot_json.metagenome_alignment_metadata
-
-        This calculates the number of reads used as input to the BBMap alignment tool and the
-        number of reads aligned by reading and interpreting the output to stderr from BBMap.
-
-        Returns a dict with the following keys:
-        * error - string, returned if there's an error while reading files.
-        * aligned - number of aligned reads
-        * input_reads - number of input reads sent to BBMap
-        * aligned_percent - percent of reads aligned to the assembly
-        """
-        # fetch the number of mapped reads
-        counts = dict()
-        # bbmapfile = pipeline_output["bbmap"]["stats_file"]
-        cmd = "grep \"^mapped:\" " + bbmapfile + r' |  cut -f 3 |  sed "s/\s//g"'
-        lines = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE).stdout.readlines()
-        if len(lines) != 2:
-            counts["error"] = "Can't calculate number of mapped reads!"
-            counts["aligned"] = 0
-        else:
-            num_aligned_reads = int(lines[0]) + int(lines[1])
-            counts["aligned"] = int(num_aligned_reads)
-
-        # fetch the number of input reads
-        num_input_reads = ""
-        cmd = "grep \"^Reads Used:\" " + bbmapfile + " | cut -f 2"
-        lines = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE).stdout.readlines()
-        if len(lines) != 1:
-            if not counts["error"]:
-                counts["error"] = ""
-            counts["error"] = counts["error"] + "Can't calculate number of input reads!"
-            counts["input_reads"] = 0
-        else:
-            result = re.search(r'^(\d+).*$', lines[0].decode('utf-8'))
-            if hasattr(result, 'group'):
-                if result.group(1):
-                    num_input_reads = result.group(1)
-            counts["input_reads"] = int(num_input_reads)
-        counts["aligned_percent"] = self._percent_reads(counts["aligned"], counts["input_reads"])
-        return counts
-
-    def _calc_m50_m90(self, covstats_file, input_reads_count):
-        """
-        Calculates the m50 and m90 values from the covstats.txt file generated from BBMap (in
-        stats_files["covstats"]). So it needs a file in that format, and doesn't do too much
-        format checking. It also requires the number of reads used to generate the mapping.
-        """
-        m50 = "NA"
-        m90 = "NA"
-        total = 0
-        with open(covstats_file, "r") as f:
-            for line in f:
-                vals = line.split()
-                if not vals[6].isdigit():
-                    continue
-                total = total + int(vals[6]) + int(vals[7])
-                if total / input_reads_count > 0.5 and m50 == "NA":
-                    m50 = vals[2]
-                if total / input_reads_count > 0.9 and m90 == "NA":
-                    m90 = vals[2]
-        return m50, m90
-
-    def _upload_report(self, report_dir, file_links, workspace_name, saved_objects):
-        dfu = DataFileUtil(self.callback_url)
-        upload_info = dfu.file_to_shock({
-            'file_path': report_dir,
-            'pack': 'zip'
-        })
-        shock_id = upload_info['shock_id']
-
-        report_params = {
-            'message': 'JGI metagenome assembly report',
-            'direct_html_link_index': 0,
-            'html_links': [{
-                'shock_id': shock_id,
-                'name': 'index.html',
-                'description': 'assembly report'
-            }],
-            'file_links': file_links,
-            'report_object_name': 'JGI_assembly_pipeline.' + str(uuid.uuid4()),
-            'workspace_name': workspace_name,
-            'objects_created': saved_objects
-        }
-
-        report_client = KBaseReport(self.callback_url)
-        report = report_client.create_extended_report(report_params)
-        return {
-            'report_ref': report['ref'],
-            'report_name': report['name']
-        }
@@ -0,0 +1,105 @@
+"""
+The zip file of pipeline outputs that gets attached to the report (assembly_report.zip).
+
+Rather than zipping everything up at the end of the job, a ReportArchive is opened when the
+pipeline starts, and each step's files are added as soon as that step finishes (see
+add_step_output). The writing happens on a single background thread, so steps don't wait on it,
+and by the time the report gets made, only the report's own files (graphics, HTML, and
+pipeline_info.json) are left to add.
+
+Files that are already compressed (gzip, BAM, PNG, etc.) are stored as-is instead of being
+deflated again, and everything else is deflated at the given compression level.
+"""
+from __future__ import print_function
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_COMPRESSLEVEL = 6
+
+# The files from each step's output that go in the report zip, under a directory named for the
+# step. Any that are missing from the output (or on disk) are skipped.
+REPORT_FILES = {
+    "reads_info_prefiltered": ["output_file"],
+    "reads_info_filtered": ["output_file"],
+    "reads_info_corrected": ["output_file"],
+    "rqcfilter": ["run_log"],
+    "spades": ["run_log", "params_log", "warnings_log"],
+    "stats": ["stats_tsv", "stats_txt", "stats_err"],
+    "bbmap": ["coverage_file", "stats_file"]
+}
+
+# Extensions of files that don't get any smaller by deflating them again.
+COMPRESSED_EXTENSIONS = (".gz", ".bgz", ".bz2", ".xz", ".zip", ".bam", ".png", ".jpg", ".jpeg")
+
+
+class ReportArchive(object):
+    """
+    Usage:
+        archive = ReportArchive(zip_file)
+        archive.add_step_output("spades", spades_output)    # returns right away
+        ...
+        archive.add_file(html_file, "report.html")
+        archive.close()    # waits for all the files to be written
+    """
+    def __init__(self, zip_file, compresslevel=DEFAULT_COMPRESSLEVEL):
+        self.zip_file = zip_file
+        self.compresslevel = compresslevel
+        self._zip = zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+        # one thread, so the zip file only gets written to by one thing at a time
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._added = set()
+        self._writes = list()
+        self._closed = False
+
+    def add_step_output(self, step, output, keys=None):
+        """
+        Queues up the files from a step's output dict to be added to the zip, in a directory
+        named for the step. keys are the keys of the files to add - by default, the ones in
+        REPORT_FILES for that step.
+        """
+        if keys is None:
+            keys = REPORT_FILES.get(step, [])
+        for key in keys:
+            if output and output.get(key):
+                self.add_file(output[key], os.path.join(step, os.path.basename(output[key])))
+
+    def add_file(self, path, zip_path):
+        """
+        Queues up the file at path to be added to the zip as zip_path. If something's already been
+        added as zip_path, this does nothing, so adding the same step's output again (say, when
+        making the report for a pipeline run that's already added it) is harmless.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("The report archive {} is already closed".format(self.zip_file))
+            if zip_path in self._added:
+                return
+            self._added.add(zip_path)
+            self._writes.append(self._executor.submit(self._write, path, zip_path))
+
+    def _write(self, path, zip_path):
+        if not os.path.exists(path):
+            return
+        if path.lower().endswith(COMPRESSED_EXTENSIONS):
+            self._zip.write(path, zip_path, compress_type=zipfile.ZIP_STORED)
+        else:
+            self._zip.write(path, zip_path, compress_type=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+
+    def close(self):
+        """
+        Waits for all the queued files to be written, then closes the zip file. If any of the
+        writes failed, the first error gets raised (after the zip is closed). Returns the path to
+        the zip file.
+        """
+        with self._lock:
+            if self._closed:
+                return self.zip_file
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        self._zip.close()
+        for write in self._writes:
+            write.result()
+        return self.zip_file
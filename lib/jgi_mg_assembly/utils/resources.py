@@ -0,0 +1,265 @@
+"""
+Figures out how many cores and how much memory the pipeline can use on the node it's running
+on, and how to split those among the pipeline steps.
+
+The available resources are the smaller of what the host has and what the container is allowed
+to use (via cgroup limits, v1 or v2). A ResourcePlan turns those into the thread and memory
+parameters for each tool, so SPAdes, BFC, BBMap, and fungalrelease.sh all get sized from the
+same numbers instead of each having its own hard-coded values.
+"""
+from __future__ import print_function
+import math
+import os
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+MEMINFO = "/proc/meminfo"
+
+# Don't hand everything to the tools - leave some room for the JVM/Python overhead, the page
+# cache, and whatever else is running in the container.
+MEMORY_HEADROOM = 0.9
+MIN_MEMORY_GB = 1
+
+# BBMap and fungalrelease.sh can run at the same time (see Pipeline._run_assembly_pipeline),
+# so they each get a share of the memory, capped at what the pipeline always used to give them.
+BBMAP_MEMORY_SHARE = 0.6
+BBMAP_MAX_MEMORY_GB = 100
+AGP_MEMORY_SHARE = 0.3
+AGP_MAX_MEMORY_GB = 40
+
+# BFC uses -s (the approximate genome size) to size its bloom filter. 10g is what the JGI
+# pipeline uses, but that's scaled down on smaller nodes, and for smaller inputs.
+BFC_MAX_GENOME_SIZE_GB = 10
+BFC_GENOME_SIZE_MEMORY_RATIO = 4
+
+# pigz compresses the cleaned reads as they stream out of BFC and seqtk, so it gets a share of
+# the cores BFC is using. It only needs to keep up with BFC, which is much slower.
+COMPRESS_CORES_SHARE = 0.25
+COMPRESS_MAX_THREADS = 8
+
+
+def _read_first_line(path):
+    """
+    Returns the stripped first line of a file, or None if it can't be read.
+    """
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except (IOError, OSError):
+        return None
+
+
+def cgroup_cpu_limit(cgroup_root=CGROUP_ROOT):
+    """
+    Returns the number of cores the cgroup CPU quota allows, or None if there's no quota.
+    This checks cgroup v2 (cpu.max) first, then v1 (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    cpu_max = _read_first_line(os.path.join(cgroup_root, "cpu.max"))
+    if cpu_max:
+        fields = cpu_max.split()
+        if fields[0] != "max" and len(fields) == 2:
+            return max(1, int(int(fields[0]) / int(fields[1])))
+        return None
+    quota = _read_first_line(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us"))
+    period = _read_first_line(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0 and int(period) > 0:
+        return max(1, int(int(quota) / int(period)))
+    return None
+
+
+def cgroup_memory_limit(cgroup_root=CGROUP_ROOT):
+    """
+    Returns the cgroup memory limit in bytes, or None if there's no limit.
+    This checks cgroup v2 (memory.max) first, then v1 (memory.limit_in_bytes). An unlimited v1
+    cgroup reports a huge number instead of "max", so anything over 2^60 counts as no limit.
+    """
+    for path in [os.path.join(cgroup_root, "memory.max"),
+                 os.path.join(cgroup_root, "memory", "memory.limit_in_bytes")]:
+        limit = _read_first_line(path)
+        if limit is None:
+            continue
+        if limit == "max" or int(limit) >= 2 ** 60:
+            return None
+        return int(limit)
+    return None
+
+
+def host_memory(meminfo=MEMINFO):
+    """
+    Returns the total memory of the host in bytes, from /proc/meminfo.
+    """
+    with open(meminfo, "r") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("Unable to find the total memory in {}".format(meminfo))
+
+
+def available_cores(cgroup_root=CGROUP_ROOT):
+    """
+    Returns the number of cores this process can use - the cores it's allowed to run on,
+    limited by any cgroup CPU quota.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    cpu_limit = cgroup_cpu_limit(cgroup_root)
+    if cpu_limit is not None:
+        cores = min(cores, cpu_limit)
+    return cores
+
+
+def available_memory_gb(cgroup_root=CGROUP_ROOT, meminfo=MEMINFO):
+    """
+    Returns the memory this process can use in GB (rounded down) - the host memory, limited by
+    any cgroup memory limit.
+    """
+    memory = host_memory(meminfo)
+    memory_limit = cgroup_memory_limit(cgroup_root)
+    if memory_limit is not None:
+        memory = min(memory, memory_limit)
+    return int(memory / 1024 ** 3)
+
+
+class ResourcePlan(object):
+    def __init__(self, cores, memory_gb, max_memory_gb=None, mem_estimate_gb=None, input_bases=None):
+        """
+        cores: the number of cores available.
+        memory_gb: the memory available, in GB.
+        max_memory_gb: an upper limit on the memory to use, in GB, regardless of what's available.
+        mem_estimate_gb: the estimated memory needed to assemble the reads, in GB, if it's known
+                         (see Pipeline._check_memory_use).
+        input_bases: the estimated number of bases in the input reads, if it's known (see
+                     Pipeline._preflight).
+        """
+        self.cores = max(1, int(cores))
+        self.memory_gb = max(MIN_MEMORY_GB, int(memory_gb))
+        self.max_memory_gb = max_memory_gb
+        self.mem_estimate_gb = mem_estimate_gb
+        self.input_bases = input_bases
+
+    @classmethod
+    def for_host(cls, max_memory_gb=None):
+        """
+        Builds a ResourcePlan from the cores and memory available on this node.
+        """
+        return cls(available_cores(), available_memory_gb(), max_memory_gb=max_memory_gb)
+
+    def with_estimate(self, mem_estimate_gb):
+        """
+        Returns a copy of this plan that also knows the estimated assembly memory.
+        """
+        return ResourcePlan(self.cores, self.memory_gb, max_memory_gb=self.max_memory_gb,
+                            mem_estimate_gb=mem_estimate_gb, input_bases=self.input_bases)
+
+    def with_input_bases(self, input_bases):
+        """
+        Returns a copy of this plan that also knows the estimated size of the input reads.
+        """
+        return ResourcePlan(self.cores, self.memory_gb, max_memory_gb=self.max_memory_gb,
+                            mem_estimate_gb=self.mem_estimate_gb, input_bases=input_bases)
+
+    @property
+    def usable_memory_gb(self):
+        """
+        The memory the tools can be given, in GB, leaving some headroom.
+        """
+        usable = max(MIN_MEMORY_GB, int(self.memory_gb * MEMORY_HEADROOM))
+        if self.max_memory_gb is not None:
+            usable = min(usable, self.max_memory_gb)
+        return usable
+
+    @property
+    def spades_threads(self):
+        return self.cores
+
+    @property
+    def spades_memory_gb(self):
+        """
+        SPAdes runs by itself, so it gets all the usable memory. Its -m is a hard limit, so the
+        memory estimate doesn't shrink it - that's only used to fail early (see check_estimate).
+        """
+        return self.usable_memory_gb
+
+    def check_estimate(self):
+        """
+        Raises a RuntimeError if the estimated assembly memory is more than the usable memory,
+        so the job fails before starting SPAdes instead of partway through it.
+        """
+        if self.mem_estimate_gb is not None and self.mem_estimate_gb > self.usable_memory_gb:
+            raise RuntimeError("Your reads are estimated to require {} GB of memory to assemble, "
+                "which is over the {} GB available on this node.".format(
+                    round(self.mem_estimate_gb, 2), self.usable_memory_gb))
+
+    @property
+    def rqcfilter_threads(self):
+        return self.cores
+
+    @property
+    def rqcfilter_memory_gb(self):
+        """
+        RQCFilter only shares the node with the read length stats on the input reads, so it gets
+        all the usable memory.
+        """
+        return self.usable_memory_gb
+
+    @property
+    def kmer_count_threads(self):
+        """
+        The k-mer count for the memory check runs by itself, so it gets all the cores.
+        """
+        return self.cores
+
+    @property
+    def bfc_threads(self):
+        return self.cores
+
+    @property
+    def bfc_genome_size(self):
+        """
+        The value for BFC's -s option, e.g. "10g". The genome can't be bigger than the reads, so
+        if the input size is known, it's no more than the number of input bases.
+        """
+        size = min(BFC_MAX_GENOME_SIZE_GB, self.usable_memory_gb // BFC_GENOME_SIZE_MEMORY_RATIO)
+        if self.input_bases is not None:
+            size = min(size, int(math.ceil(self.input_bases / 1e9)))
+        return "{}g".format(max(1, size))
+
+    @property
+    def compress_threads(self):
+        return max(1, min(COMPRESS_MAX_THREADS, int(self.cores * COMPRESS_CORES_SHARE)))
+
+    @property
+    def bbmap_threads(self):
+        return self.cores
+
+    @property
+    def bbmap_memory_gb(self):
+        return max(MIN_MEMORY_GB, min(BBMAP_MAX_MEMORY_GB, int(self.usable_memory_gb * BBMAP_MEMORY_SHARE)))
+
+    @property
+    def agp_memory_gb(self):
+        return max(MIN_MEMORY_GB, min(AGP_MAX_MEMORY_GB, int(self.usable_memory_gb * AGP_MEMORY_SHARE)))
+
+    def to_dict(self):
+        """
+        Returns the plan as a dict, for logging and for the pipeline output.
+        """
+        return {
+            "cores": self.cores,
+            "memory_gb": self.memory_gb,
+            "usable_memory_gb": self.usable_memory_gb,
+            "mem_estimate_gb": self.mem_estimate_gb,
+            "input_bases": self.input_bases,
+            "spades_threads": self.spades_threads,
+            "spades_memory_gb": self.spades_memory_gb,
+            "rqcfilter_threads": self.rqcfilter_threads,
+            "rqcfilter_memory_gb": self.rqcfilter_memory_gb,
+            "kmer_count_threads": self.kmer_count_threads,
+            "bfc_threads": self.bfc_threads,
+            "bfc_genome_size": self.bfc_genome_size,
+            "compress_threads": self.compress_threads,
+            "bbmap_threads": self.bbmap_threads,
+            "bbmap_memory_gb": self.bbmap_memory_gb,
+            "agp_memory_gb": self.agp_memory_gb
+        }
@@ -21,6 +21,21 @@ def mkdir(path):
         else:
             raise  # maybe permission error, maybe something else.
 
+def link_file(src, dest):
+    """
+    Makes dest the same file as src, without copying it - a hard link, or a symbolic link to the
+    absolute path of src if a hard link can't be made (e.g. they're on different filesystems).
+    Anything already at dest gets replaced.
+    """
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError as ex:
+        if ex.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        os.symlink(os.path.abspath(src), dest)
+
 def file_to_log(path):
     """
     Dumps a text file, line by line, to the app runtime log (stdout).
@@ -2,6 +2,7 @@
 package us.kbase.jgimgassembly;
 
 import java.util.HashMap;
+import java.util.List;
 import java.util.Map;
 import javax.annotation.Generated;
 import com.fasterxml.jackson.annotation.JsonAnyGetter;
@@ -17,6 +18,10 @@ import com.fasterxml.jackson.annotation.JsonPropertyOrder;
  * Inputs for the Assembly pipeline.
  * reads_upa:
  *     UPA for the input reads object. This should be a Paired-End Illumina reads file.
+ * reads_upas (optional):
+ *     A list of UPAs for more Paired-End Illumina reads objects. All the reads given here, and in
+ *     reads_upa, get combined and assembled together (co-assembly). At least one of reads_upa or
+ *     reads_upas is required.
  * workspace_name:
  *     name of the workspace to upload to at the end.
  * output_assembly_name:
@@ -41,6 +46,7 @@ import com.fasterxml.jackson.annotation.JsonPropertyOrder;
 @Generated("com.googlecode.jsonschema2pojo")
 @JsonPropertyOrder({
     "reads_upa",
+    "reads_upas",
     "workspace_name",
     "output_assembly_name",
     "cleaned_reads_name",
@@ -52,6 +58,8 @@ public class AssemblyPipelineParams {
 
     @JsonProperty("reads_upa")
     private String readsUpa;
+    @JsonProperty("reads_upas")
+    private List<String> readsUpas;
     @JsonProperty("workspace_name")
     private String workspaceName;
     @JsonProperty("output_assembly_name")
@@ -81,6 +89,21 @@ public class AssemblyPipelineParams {
         return this;
     }
 
+    @JsonProperty("reads_upas")
+    public List<String> getReadsUpas() {
+        return readsUpas;
+    }
+
+    @JsonProperty("reads_upas")
+    public void setReadsUpas(List<String> readsUpas) {
+        this.readsUpas = readsUpas;
+    }
+
+    public AssemblyPipelineParams withReadsUpas(List<String> readsUpas) {
+        this.readsUpas = readsUpas;
+        return this;
+    }
+
     @JsonProperty("workspace_name")
     public String getWorkspaceName() {
         return workspaceName;
@@ -183,7 +206,7 @@ public class AssemblyPipelineParams {
 
     @Override
     public String toString() {
-        return ((((((((((((((((("AssemblyPipelineParams"+" [readsUpa=")+ readsUpa)+", workspaceName=")+ workspaceName)+", outputAssemblyName=")+ outputAssemblyName)+", cleanedReadsName=")+ cleanedReadsName)+", filteredReadsName=")+ filteredReadsName)+", skipRqcfilter=")+ skipRqcfilter)+", debug=")+ debug)+", additionalProperties=")+ additionalProperties)+"]");
+        return ((((((((((((((((((("AssemblyPipelineParams"+" [readsUpa=")+ readsUpa)+", readsUpas=")+ readsUpas)+", workspaceName=")+ workspaceName)+", outputAssemblyName=")+ outputAssemblyName)+", cleanedReadsName=")+ cleanedReadsName)+", filteredReadsName=")+ filteredReadsName)+", skipRqcfilter=")+ skipRqcfilter)+", debug=")+ debug)+", additionalProperties=")+ additionalProperties)+"]");
     }
 
 }
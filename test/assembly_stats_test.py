@@ -0,0 +1,59 @@
+import os
+import unittest
+import util
+from jgi_mg_assembly.pipeline_steps.assemblystats import StatsRunner
+from jgi_mg_assembly.utils.assembly_stats import (
+    AssemblyStats,
+    fasta_sequences
+)
+
+
+def _stats(sequences):
+    stats = AssemblyStats()
+    for seq in sequences:
+        stats.add_scaffold(seq)
+    return stats
+
+
+class assembly_stats_test(unittest.TestCase):
+
+    def test_stats_runner_matches_stats_sh(self):
+        scaffolds = util.file_to_scratch(os.path.join("data", "small_assembly.fa"), overwrite=True)
+        output_dir = os.path.join(util.get_config()["scratch"], "assembly_stats_test")
+        stats = StatsRunner(util.get_config()["scratch"], output_dir).run(scaffolds)
+        for (key, expected_file) in [("stats_tsv", "assembly.scaffolds.fasta.stats.tsv"),
+                                     ("stats_txt", "assembly.scaffolds.fasta.stats.txt")]:
+            with open(stats[key], "r") as f, open(os.path.join("data", expected_file), "r") as expected:
+                self.assertEqual(f.read(), expected.read())
+        self.assertTrue(os.path.exists(stats["stats_err"]))
+        self.assertIn("stats.sh", stats["version_string"])
+
+    def test_fasta_sequences(self):
+        fasta_file = os.path.join(util.get_config()["scratch"], "assembly_stats_test.fa")
+        with open(fasta_file, "w") as f:
+            f.write(">a\nACGT\nacgt\n>b desc\r\nNNNN\r\n>empty\n>c\nA")
+        self.assertEqual(list(fasta_sequences(fasta_file)), [b"ACGTACGT", b"NNNN", b"", b"A"])
+
+    def test_contig_breaks(self):
+        # 9 Ns don't break a contig, 10 do, and the gap doesn't count as contig sequence.
+        s = _stats([b"A" * 100 + b"N" * 9 + b"C" * 100, b"G" * 100 + b"N" * 10 + b"T" * 50]).summary()
+        self.assertEqual(s["n_scaffolds"], 2)
+        self.assertEqual(s["n_contigs"], 3)
+        self.assertEqual(s["scaf_bp"], 369)
+        self.assertEqual(s["contig_bp"], 359)
+        self.assertEqual(s["ctg_max"], 209)
+        self.assertEqual(s["scaf_max"], 209)
+
+    def test_n_l_values(self):
+        s = _stats([b"A" * length for length in [100, 200, 300, 400]]).summary()
+        # 400 + 300 covers at least half of the 1000 bases, and 400 + 300 + 200 covers 90%
+        self.assertEqual((s["scaf_N50"], s["scaf_L50"]), (2, 300))
+        self.assertEqual((s["scaf_N90"], s["scaf_L90"]), (3, 200))
+
+    def test_length_table(self):
+        text = _stats([b"A" * 300, b"C" * 1200, b"G" * 60000]).text()
+        self.assertIn("Max scaffold length:                \t60.000 KB\n", text)
+        self.assertIn("Number of scaffolds > 50 KB:        \t1\n", text)
+        rows = [line.split("\t")[0] for line in text.split("--------\t")[-1].splitlines()[1:] if line]
+        self.assertEqual(rows, ["    All ", "    250 ", "    500 ", "   1 KB ", " 2.5 KB ", "   5 KB ",
+                                "  10 KB ", "  25 KB ", "  50 KB "])
@@ -0,0 +1,137 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import (
+    BaseHTTPRequestHandler,
+    HTTPServer
+)
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectionError
+from installed_clients import baseclient
+from installed_clients.baseclient import (
+    BaseClient,
+    ServerError,
+    set_job_check_max_time
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.connections.add(self.client_address)
+        response = json.dumps({"version": "1.1", "id": body["id"], "result": [self._result(body)]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def _result(self, body):
+        """
+        Stands in for the callback server's job methods - Service._method_submit starts a job
+        that finishes params[0] seconds later, and Service._check_job gets its state.
+        """
+        method = body["method"]
+        jobs = self.server.jobs
+        if method.endswith("_submit"):
+            job_id = str(len(jobs))
+            jobs[job_id] = {"done_at": time.time() + body["params"][0], "params": body["params"], "checks": 0}
+            return job_id
+        if method.endswith("._check_job"):
+            job = jobs[body["params"][0]]
+            job["checks"] += 1
+            if time.time() < job["done_at"]:
+                return {"finished": 0}
+            if job["params"][0] < 0:
+                return {"finished": 1, "error": {"name": "JSONRPCError", "code": -32000, "message": "job failed"}}
+            return {"finished": 1, "result": [job["params"][1]]}
+        return body["params"][0]
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(HTTPServer):
+    def process_request(self, request, client_address):
+        # a thread per connection, so each connection can stay open
+        threading.Thread(target=self._handle, args=(request, client_address), daemon=True).start()
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class baseclient_test(unittest.TestCase):
+    def setUp(self):
+        baseclient.configure_session()
+        self.server = _Server(("127.0.0.1", 0), _Handler)
+        self.server.connections = set()
+        self.server.jobs = dict()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connections(self):
+        clients = [BaseClient(self.url, token="token", ignore_authrc=True) for i in range(3)]
+        for i in range(10):
+            self.assertEqual(clients[i % 3].call_method("Service.method", [i]), i)
+        # all of those go over one kept-alive connection
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_concurrent_calls(self):
+        client = BaseClient(self.url, token="token", ignore_authrc=True)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: client.call_method("Service.method", [i]), range(40)))
+        self.assertEqual(results, list(range(40)))
+        self.assertLessEqual(len(self.server.connections), 4)
+
+    def test_run_job(self):
+        client = BaseClient(self.url, token="token", ignore_authrc=True, async_job_check_time_ms=10)
+        self.assertEqual(client.run_job("Service.method", [0.05, "done"]), "done")
+
+    def test_wait_for_jobs(self):
+        client = BaseClient(self.url, token="token", ignore_authrc=True, async_job_check_time_ms=10)
+        jobs = [("Service.slow", client.submit_job("Service.slow", [0.3, "slow"])),
+                ("Service.fast", client.submit_job("Service.fast", [0.0, "fast"]))]
+        self.assertEqual(client.wait_for_jobs(jobs), ["slow", "fast"])
+        # the fast one only needed the one check, the slow one is checked until it's done
+        self.assertEqual(self.server.jobs["1"]["checks"], 1)
+        self.assertGreater(self.server.jobs["0"]["checks"], 1)
+
+        failing = client.submit_job("Service.method", [-1, "failed"])
+        with self.assertRaises(ServerError):
+            client.wait_for_jobs([("Service.method", failing)])
+
+    def test_job_check_max_time(self):
+        # the time between checks goes 10ms, 100ms, 1s, ..., so without a cap, a job that's done
+        # in 0.2s wouldn't be seen until the 1.1s check.
+        client = BaseClient(self.url, token="token", ignore_authrc=True,
+                            async_job_check_time_ms=10, async_job_check_time_scale_percent=1000)
+        set_job_check_max_time(50, service_method="Service.capped")
+        try:
+            start = time.time()
+            self.assertEqual(client.run_job("Service.capped", [0.2, "done"]), "done")
+            self.assertLess(time.time() - start, 0.8)
+        finally:
+            baseclient._job_check_max_times.clear()
+
+    def test_retries_connect(self):
+        # nothing's listening here, so the connection is refused every time
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        session = baseclient.configure_session(max_retries=2, retry_backoff=0)
+        self.assertEqual(session.get_adapter("http://").max_retries.connect, 2)
+        client = BaseClient("http://127.0.0.1:{}".format(port), token="token", ignore_authrc=True)
+        with self.assertRaises(ConnectionError):
+            client.call_method("Service.method", [1])
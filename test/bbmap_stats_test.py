@@ -0,0 +1,87 @@
+import os
+import unittest
+import util
+from jgi_mg_assembly.utils.bbmap_stats import (
+    read_bbmap_stats,
+    read_covstats,
+    alignment_summary
+)
+
+COVSTATS_HEADER = "#ID\tAvg_fold\tLength\tRef_GC\tCovered_percent\tCovered_bases\tPlus_reads\tMinus_reads\tRead_GC\tMedian_fold\tStd_Dev\n"
+
+
+class bbmap_stats_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch_dir = util.get_config()["scratch"]
+        cls.bbmap_stats_file = util.file_to_scratch(os.path.join("data", "bbmap_stats.txt"), overwrite=True)
+        cls.cov_stats = util.file_to_scratch(os.path.join("data", "covstats.txt"), overwrite=True)
+
+    def _write_covstats(self, name, rows):
+        covstats_file = os.path.join(self.scratch_dir, name)
+        with open(covstats_file, "w") as f:
+            f.write(COVSTATS_HEADER)
+            for (length, plus_reads, minus_reads) in rows:
+                f.write("contig_{}\t1.0\t{}\t0.5\t100.0\t{}\t{}\t{}\t0.5\t1\t0.1\n".format(
+                    length, length, length, plus_reads, minus_reads))
+        return covstats_file
+
+    def test_read_bbmap_stats(self):
+        counts = read_bbmap_stats(self.bbmap_stats_file)
+        self.assertEqual(counts, {"aligned": 16, "input_reads": 358, "aligned_percent": 4})
+
+    def test_read_bbmap_stats_missing_counts(self):
+        stats_file = os.path.join(self.scratch_dir, "bad_bbmap_stats.txt")
+        with open(stats_file, "w") as f:
+            f.write("Nothing to see here\n")
+        counts = read_bbmap_stats(stats_file)
+        self.assertIn("Can't calculate number of mapped reads!", counts["error"])
+        self.assertIn("Can't calculate number of input reads!", counts["error"])
+        self.assertEqual(counts["aligned"], 0)
+        self.assertEqual(counts["input_reads"], 0)
+        self.assertEqual(counts["aligned_percent"], 0)
+
+    def test_read_covstats(self):
+        coverage = read_covstats(self.cov_stats)
+        self.assertEqual(len(coverage), 2)
+        self.assertEqual(coverage.ids, ["scaffold_1_c1", "scaffold_2_c1"])
+        self.assertEqual(coverage.columns["Length"].tolist(), [364, 361])
+        self.assertEqual(coverage.columns["Ref_GC"].tolist(), [0.6401, 0.7313])
+        self.assertEqual(coverage.reads.tolist(), [8, 8])
+        # only 16 of 358 reads mapped, so neither cutoff is reached
+        self.assertEqual(coverage.m50_m90(358), ("NA", "NA"))
+
+    def test_read_covstats_columns(self):
+        coverage = read_covstats(self.cov_stats, columns=["Length", "Avg_fold", "Ref_GC"])
+        self.assertEqual(len(coverage), 2)
+        self.assertIsNone(coverage.ids)
+        self.assertEqual(sorted(coverage.columns.keys()), ["Avg_fold", "Length", "Ref_GC"])
+        self.assertEqual(coverage.columns["Length"].dtype.kind, "i")
+        self.assertEqual(coverage.columns["Length"].tolist(), [364, 361])
+        self.assertEqual(coverage.columns["Avg_fold"].tolist(), [2.1978, 2.1939])
+        self.assertEqual(coverage.columns["Ref_GC"].tolist(), [0.6401, 0.7313])
+        # the last column gets the rest of the line, so it has to split cleanly too
+        self.assertEqual(read_covstats(self.cov_stats, columns=["Std_Dev"]).columns["Std_Dev"].tolist(), [0.68, 0.66])
+        with self.assertRaises(ValueError):
+            read_covstats(self.cov_stats, columns=["Length", "Not_a_column"])
+
+    def test_m50_m90(self):
+        # out of order on purpose - the curve goes from the longest contig down
+        covstats_file = self._write_covstats("m50_covstats.txt", [(500, 10, 10), (1000, 30, 30), (200, 5, 5), (100, 5, 5)])
+        coverage = read_covstats(covstats_file)
+        # strictly over the cutoff, so m90 is the contig after the one that gets to exactly 90%
+        self.assertEqual(coverage.m50_m90(100), (1000, 100))
+        lengths, fraction = coverage.cumulative_reads(100)
+        self.assertEqual(lengths.tolist(), [1000, 500, 200, 100])
+        self.assertEqual(fraction.tolist(), [0.6, 0.8, 0.9, 1.0])
+        self.assertEqual(coverage.m50_m90(0), ("NA", "NA"))
+
+    def test_alignment_summary(self):
+        summary = alignment_summary(self.bbmap_stats_file, self.cov_stats)
+        self.assertEqual(summary["aligned"], 16)
+        self.assertEqual(summary["input_reads"], 358)
+        self.assertEqual(summary["aligned_percent"], 4)
+        self.assertEqual(summary["m50"], "NA")
+        self.assertEqual(summary["m90"], "NA")
+        self.assertEqual(sorted(summary.keys()), ["aligned", "aligned_percent", "input_reads", "m50", "m90"])
+        self.assertNotIn("error", summary)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+from jgi_mg_assembly.runner.cache import (
+    ResultCache,
+    CACHE_HIT_PROFILE,
+    unshare_files
+)
+
+
+class cache_test(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.work_dir, "cache")
+        self.input_file = self._write(os.path.join(self.work_dir, "input.fq"), "@read\nACGT\n+\nIIII\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _write(self, path, contents):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def _run_step(self, output_dir, contents="corrected"):
+        output_file = self._write(os.path.join(output_dir, "bfc", "bfc_output.fastq"), contents)
+        return {
+            "corrected_reads": output_file,
+            "command": "bfc {} > {}".format(self.input_file, output_file),
+            "version_string": "BFC r181"
+        }
+
+    def test_store_and_fetch(self):
+        cache = ResultCache(self.cache_dir, 1)
+        key = cache.key("bfc", "BFC r181", [self.input_file], {"debug": False, "threads": 10})
+        out_dir1 = os.path.join(self.work_dir, "run1")
+        self.assertIsNone(cache.fetch(key, out_dir1))
+        output = self._run_step(out_dir1)
+        cache.store(key, output, out_dir1)
+
+        # a new run, in a different output directory, on a node with more cores.
+        cache = ResultCache(self.cache_dir, 1)
+        moved_input = os.path.join(self.work_dir, "other_input.fq")
+        shutil.copy(self.input_file, moved_input)
+        key2 = cache.key("bfc", "BFC r181", [moved_input], {"debug": False, "threads": 64})
+        self.assertEqual(key, key2)
+        out_dir2 = os.path.join(self.work_dir, "run2")
+        cached = cache.fetch(key2, out_dir2)
+        self.assertEqual(cached["corrected_reads"], os.path.join(out_dir2, "bfc", "bfc_output.fastq"))
+        self.assertIn(out_dir2, cached["command"])
+        with open(cached["corrected_reads"]) as f:
+            self.assertEqual(f.read(), "corrected")
+
+        # anything that changes the output changes the key
+        self.assertNotEqual(key, cache.key("bfc", "BFC r182", [self.input_file], {"debug": False}))
+        self.assertNotEqual(key, cache.key("bfc", "BFC r181", [self.input_file], {"debug": True}))
+        changed_input = self._write(os.path.join(self.work_dir, "changed.fq"), "@read\nACGA\n+\nIIII\n")
+        self.assertNotEqual(key, cache.key("bfc", "BFC r181", [changed_input], {"debug": False}))
+
+    def test_chained_steps_use_derived_digests(self):
+        cache = ResultCache(self.cache_dir, 1)
+        out_dir1 = os.path.join(self.work_dir, "run1")
+        key = cache.key("bfc", "v", [self.input_file], {})
+        output = self._run_step(out_dir1)
+        cache.store(key, output, out_dir1)
+        next_key = cache.key("seqtk", "v", [output["corrected_reads"]], {})
+
+        cache = ResultCache(self.cache_dir, 1)
+        out_dir2 = os.path.join(self.work_dir, "run2")
+        cached = cache.fetch(cache.key("bfc", "v", [self.input_file], {}), out_dir2)
+        self.assertEqual(cache.key("seqtk", "v", [cached["corrected_reads"]], {}), next_key)
+
+    def test_lru_eviction(self):
+        # room for two of the three entries
+        cache = ResultCache(self.cache_dir, 2500.0 / 1024 ** 3)
+        keys = list()
+        for i in range(3):
+            out_dir = os.path.join(self.work_dir, "run{}".format(i))
+            key = cache.key("bfc", "v", [self.input_file], {"run": i})
+            if i == 2:
+                # use the first entry, so the second is the least recently used
+                time.sleep(0.05)
+                self.assertIsNotNone(cache.fetch(keys[0], os.path.join(self.work_dir, "fetch")))
+                time.sleep(0.05)
+            cache.store(key, self._run_step(out_dir, "x" * 1000), out_dir)
+            keys.append(key)
+        fetch_dir = os.path.join(self.work_dir, "fetch2")
+        self.assertIsNotNone(cache.fetch(keys[0], fetch_dir))
+        self.assertIsNone(cache.fetch(keys[1], fetch_dir))
+        self.assertIsNotNone(cache.fetch(keys[2], fetch_dir))
+
+    def _sha1(self, path):
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def test_rerun_after_fetch_leaves_entry_unchanged(self):
+        cache = ResultCache(self.cache_dir, 1)
+        key = cache.key("bfc", "v", [self.input_file], {})
+        out_dir = os.path.join(self.work_dir, "run1")
+        cache.store(key, self._run_step(out_dir), out_dir)
+        entry_file = os.path.join(self.cache_dir, "entries", key, "files", "bfc", "bfc_output.fastq")
+        self.assertEqual(stat.S_IMODE(os.stat(entry_file).st_mode), 0o444)
+        entry_digest = self._sha1(entry_file)
+
+        # fetch it into a new run, then run the step again there, writing the same path.
+        out_dir2 = os.path.join(self.work_dir, "run2")
+        cached = cache.fetch(key, out_dir2)
+        unshare_files([cached["corrected_reads"]])
+        self._run_step(out_dir2, "rewritten")
+        self.assertEqual(self._sha1(entry_file), entry_digest)
+        with open(cached["corrected_reads"]) as f:
+            self.assertEqual(f.read(), "rewritten")
+
+    def test_missing_input_file(self):
+        cache = ResultCache(self.cache_dir, 1)
+        contigs = self._write(os.path.join(self.work_dir, "contigs.fasta"), ">c\nACGT\n")
+        no_scaffolds = cache.key("agp", "v", [None, contigs], {})
+        self.assertEqual(no_scaffolds, cache.key("agp", "v", [None, contigs], {}))
+        scaffolds = self._write(os.path.join(self.work_dir, "scaffolds.fasta"), ">s\nACGT\n")
+        self.assertNotEqual(no_scaffolds, cache.key("agp", "v", [scaffolds, contigs], {}))
+
+    def test_set_source(self):
+        cache = ResultCache(self.cache_dir, 1)
+        other_file = self._write(os.path.join(self.work_dir, "other.fq"), "@read\nTTTT\n+\nIIII\n")
+        cache.set_source(self.input_file, {"reads_upas": ["1/2/3"]})
+        cache.set_source(other_file, {"reads_upas": ["1/2/3"]})
+        # keyed by the source, not the contents
+        self.assertEqual(cache.key("bfc", "v", [self.input_file], {}),
+                         cache.key("bfc", "v", [other_file], {}))
+        cache.set_source(other_file, {"reads_upas": ["1/2/4"]})
+        self.assertNotEqual(cache.key("bfc", "v", [self.input_file], {}),
+                            cache.key("bfc", "v", [other_file], {}))
+
+    def test_fetch_marks_cache_hits(self):
+        cache = ResultCache(self.cache_dir, 1)
+        key = cache.key("bfc", "v", [self.input_file], {})
+        out_dir = os.path.join(self.work_dir, "run1")
+        output = self._run_step(out_dir)
+        output["resource_profile"] = {"wall_time": 100, "peak_rss_mb": 2000}
+        cache.store(key, output, out_dir)
+        cached = cache.fetch(key, os.path.join(self.work_dir, "run2"))
+        self.assertEqual(cached["resource_profile"], CACHE_HIT_PROFILE)
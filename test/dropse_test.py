@@ -0,0 +1,62 @@
+import gzip
+import os
+import unittest
+import util
+from jgi_mg_assembly.pipeline_steps.dropse import DropseRunner
+from jgi_mg_assembly.utils.fastq import PairedReadsFilter
+
+
+def _record(name, length=4):
+    return "@{}\n{}\n+\n{}\n".format(name, "A" * length, "I" * length).encode("utf-8")
+
+
+def _filter(data, chunk_size=None):
+    paired = PairedReadsFilter()
+    chunk_size = chunk_size or max(len(data), 1)
+    out = b"".join(paired.update(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+    return out + paired.finish(), paired
+
+
+class dropse_test(unittest.TestCase):
+
+    def test_drops_unpaired(self):
+        data = b"".join([_record("a/1"), _record("a/2"), _record("b/1"), _record("c/1"), _record("c/2"),
+                         _record("d 1:N:0"), _record("d 2:N:0"), _record("e/2")])
+        expected = b"".join([_record("a/1"), _record("a/2"), _record("c/1"), _record("c/2"),
+                             _record("d 1:N:0"), _record("d 2:N:0")])
+        for chunk_size in [None, 1, 5, 17, 64]:
+            (out, paired) = _filter(data, chunk_size)
+            self.assertEqual(out, expected)
+            self.assertEqual(paired.reads_in, 8)
+            self.assertEqual(paired.reads_out, 6)
+
+    def test_name_matching(self):
+        # names have to match exactly, other than a /1 or /2 suffix on both
+        (out, paired) = _filter(_record("a/1") + _record("ab/1") + _record("ab") + _record("abc"))
+        self.assertEqual(out, b"")
+        # three reads with the same name - the first two make a pair, the third is left over
+        (out, paired) = _filter(_record("x") + _record("x") + _record("x"))
+        self.assertEqual(out, _record("x") * 2)
+        (out, paired) = _filter(_record("x") + _record("x") + _record("x") + _record("x"))
+        self.assertEqual(out, _record("x") * 4)
+
+    def test_no_final_newline(self):
+        data = _record("a/1") + _record("a/2")
+        (out, paired) = _filter(data[:-1], 3)
+        self.assertEqual(out, data)
+
+    def test_dropse_runner(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        with open(reads_file, "rb") as f:
+            reads = f.read()
+        # drop the mate of the first read
+        single_file = os.path.join(util.get_config()["scratch"], "dropse_test_single.fq")
+        with open(single_file, "wb") as f:
+            f.write(b"\n".join(reads.split(b"\n")[4:]))
+        output_dir = os.path.join(util.get_config()["scratch"], "dropse_test")
+        dropse = DropseRunner(util.get_config()["scratch"], output_dir)
+        result = dropse.run(single_file, compress_threads=1)
+        with gzip.open(result["cleaned_reads"], "rb") as f:
+            self.assertEqual(f.read(), b"\n".join(reads.split(b"\n")[8:]))
+        self.assertEqual(result["reads_info"]["count"], 2498)
+        self.assertIn("seqtk dropse", result["version_string"])
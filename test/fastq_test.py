@@ -0,0 +1,101 @@
+import io
+import os
+import unittest
+import util
+from jgi_mg_assembly.utils.fastq import (
+    FastqStats,
+    FastqStatsTap,
+    read_length_stats,
+    is_gzipped
+)
+
+
+def _make_fastq(lengths, line_end="\n"):
+    records = list()
+    for i, length in enumerate(lengths):
+        records.append("@read_{}{end}{}{end}+{end}{}{end}".format(i, "A" * length, "I" * length, end=line_end))
+    return "".join(records).encode("utf-8")
+
+
+class fastq_test(unittest.TestCase):
+
+    def test_stats_summary(self):
+        stats = FastqStats()
+        stats.update(_make_fastq([100, 100, 100, 90, 80, 150]))
+        stats.finish()
+        summary = stats.summary()
+        self.assertEqual(summary["count"], 6)
+        self.assertEqual(summary["bases"], 620)
+        self.assertEqual(summary["max"], 150)
+        self.assertEqual(summary["min"], 80)
+        self.assertEqual(summary["avg"], 103.3)
+        self.assertEqual(summary["median"], 100)
+        self.assertEqual(summary["mode"], 100)
+        self.assertEqual(summary["std_dev"], 22.1)
+
+    def test_stats_any_chunking(self):
+        data = _make_fastq([5, 17, 3, 150, 151, 1, 60, 60])
+        whole = FastqStats()
+        whole.update(data)
+        whole.finish()
+        for chunk_size in [1, 2, 3, 7, 64, 1000]:
+            chunked = FastqStats()
+            for i in range(0, len(data), chunk_size):
+                chunked.update(data[i:i + chunk_size])
+            chunked.finish()
+            self.assertEqual(whole.summary(), chunked.summary())
+
+    def test_stats_line_endings(self):
+        expected = FastqStats()
+        expected.update(_make_fastq([10, 20, 30]))
+        expected.finish()
+
+        crlf = FastqStats()
+        crlf.update(_make_fastq([10, 20, 30], line_end="\r\n"))
+        crlf.finish()
+        self.assertEqual(expected.summary(), crlf.summary())
+
+        no_final_newline = FastqStats()
+        no_final_newline.update(_make_fastq([10, 20, 30])[:-1])
+        no_final_newline.finish()
+        self.assertEqual(expected.summary(), no_final_newline.summary())
+
+    def test_stats_empty(self):
+        stats = FastqStats()
+        stats.finish()
+        self.assertEqual(stats.summary()["count"], 0)
+        self.assertEqual(stats.summary()["bases"], 0)
+
+    def test_read_length_stats_file(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.forward.fq"), overwrite=True)
+        self.assertFalse(is_gzipped(reads_file))
+        hist_file = os.path.join(util.get_config()["scratch"], "fastq_test_hist.txt")
+        summary = read_length_stats(reads_file, hist_file)
+        self.assertEqual(summary["count"], 1250)
+        self.assertEqual(summary["bases"], 125000)
+        with open(hist_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "#Reads:\t1250")
+        self.assertEqual(lines[4], "#Avg:\t100.0")
+        self.assertEqual(lines[8], "#Read Length Histogram:")
+        self.assertEqual(lines[10], "100\t1250\t100.000%\t1250\t100.000%\t125000\t100.000%\t125000\t100.000%")
+        self.assertEqual(len(lines), 11)
+
+    def test_stats_tap(self):
+        data = _make_fastq([10, 20, 30, 40])
+        expected = FastqStats()
+        expected.update(data)
+        expected.finish()
+
+        sink = io.BytesIO()
+        write_tap = FastqStatsTap(sink)
+        write_tap.write(data[:13])
+        write_tap.write(data[13:])
+        self.assertEqual(sink.getvalue(), data)
+        write_tap.stats.finish()
+        self.assertEqual(write_tap.stats.summary(), expected.summary())
+
+        read_tap = FastqStatsTap(io.BytesIO(data))
+        self.assertEqual(read_tap.read(7) + read_tap.read(), data)
+        read_tap.close()
+        self.assertEqual(read_tap.stats.summary(), expected.summary())
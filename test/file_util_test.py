@@ -1,6 +1,8 @@
 import unittest
 import util
 import os
+import gzip
+import shutil
 from jgi_mg_assembly.utils.file import FileUtil
 
 
@@ -56,6 +58,73 @@ class file_util_test(unittest.TestCase):
         with self.assertRaises(Exception):
             file_util.fetch_reads_files(["not_an_upa"])
 
+    def test_fetch_reads_multiple_ok(self):
+        """
+        Multiple libraries get downloaded, and come back in the same order they were asked for.
+        """
+        reads_upa2 = util.load_pe_reads(
+            os.path.join("data", "small.forward.fq"),
+            os.path.join("data", "small.reverse.fq"),
+            name="MyOtherPairedEndLibrary")
+        file_util = self._get_file_util()
+        reads_dl = file_util.fetch_reads_files([reads_upa2, self.reads_upa])
+        self.assertEqual(list(reads_dl.keys()), [reads_upa2, self.reads_upa])
+        for upa in reads_dl:
+            self.assertTrue(os.path.exists(reads_dl[upa]))
+
+    def test_concatenate_reads_files_ok(self):
+        """
+        The files get appended onto the first one, and the rest get removed.
+        """
+        file_util = self._get_file_util()
+        reads_files = list()
+        for i in range(3):
+            reads_file = os.path.join(self.scratch_dir, "concat_test_{}.fq".format(i))
+            with open(reads_file, "w") as f:
+                f.write("@read_{}\nACGT\n+\nIIII\n".format(i))
+            reads_files.append(reads_file)
+        combined = file_util.concatenate_reads_files(reads_files)
+        self.assertEqual(combined, reads_files[0])
+        with open(combined, "r") as f:
+            self.assertEqual(f.read(), "".join("@read_{}\nACGT\n+\nIIII\n".format(i) for i in range(3)))
+        self.assertFalse(os.path.exists(reads_files[1]))
+        self.assertFalse(os.path.exists(reads_files[2]))
+
+        # a file that doesn't end with a newline doesn't run into the next one
+        reads_files = list()
+        for (i, contents) in enumerate(["@read_0\nACGT\n+\nIIII", "", "@read_1\nACGT\n+\nIIII\n"]):
+            reads_file = os.path.join(self.scratch_dir, "concat_newline_test_{}.fq".format(i))
+            with open(reads_file, "w") as f:
+                f.write(contents)
+            reads_files.append(reads_file)
+        with open(file_util.concatenate_reads_files(reads_files), "r") as f:
+            self.assertEqual(f.read(), "@read_0\nACGT\n+\nIIII\n@read_1\nACGT\n+\nIIII\n")
+
+        # a single file is left alone
+        self.assertEqual(file_util.concatenate_reads_files([combined]), combined)
+        with self.assertRaises(ValueError):
+            file_util.concatenate_reads_files([])
+
+    def test_upload_compressed_reads_ok(self):
+        """
+        Gzipped reads get decompressed and uploaded, and the decompressed copy gets cleaned up.
+        """
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        compressed_file = reads_file + ".gz"
+        with open(reads_file, "rb") as f_in, gzip.open(compressed_file, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        decompressed_file = os.path.join(self.scratch_dir, "upload_test_reads.fastq")
+        file_util = self._get_file_util()
+        reads_upa = file_util.upload_compressed_reads(
+            compressed_file, decompressed_file, util.get_ws_name(), "MyCompressedReads", self.reads_upa)
+        self.assertIsNotNone(reads_upa)
+        self.assertFalse(os.path.exists(decompressed_file))
+
+        with self.assertRaises(ValueError) as cm:
+            file_util.upload_compressed_reads(
+                "not_a_file", decompressed_file, util.get_ws_name(), "MyCompressedReads", self.reads_upa)
+        self.assertIn("does not exist", str(cm.exception))
+
     def test_upload_assembly_ok(self):
         """
         happy test - all fields properly made.
@@ -0,0 +1,64 @@
+import time
+import threading
+import unittest
+from jgi_mg_assembly.runner.graph import StepGraph
+
+
+class graph_test(unittest.TestCase):
+
+    def test_run_in_dependency_order(self):
+        graph = StepGraph()
+        graph.add_step("a", lambda results: 1)
+        graph.add_step("b", lambda results: results["a"] + 1, depends_on=["a"])
+        graph.add_step("c", lambda results: results["a"] + results["b"], depends_on=["a", "b"])
+        self.assertEqual(graph.run(), {"a": 1, "b": 2, "c": 3})
+
+    def test_independent_steps_run_concurrently(self):
+        # both of these wait on the other, so they only finish if they run at the same time.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def step(results):
+            barrier.wait()
+            return True
+
+        graph = StepGraph(max_workers=2)
+        graph.add_step("a", step)
+        graph.add_step("b", step)
+        self.assertEqual(graph.run(), {"a": True, "b": True})
+
+    def test_failed_step_stops_dependents(self):
+        ran = list()
+
+        def fail(results):
+            raise RuntimeError("step failed")
+
+        def slow(results):
+            time.sleep(0.1)
+            ran.append("slow")
+
+        graph = StepGraph()
+        graph.add_step("fail", fail)
+        graph.add_step("slow", slow)
+        graph.add_step("after", lambda results: ran.append("after"), depends_on=["fail"])
+        with self.assertRaises(RuntimeError) as cm:
+            graph.run()
+        self.assertIn("step failed", str(cm.exception))
+        self.assertEqual(ran, ["slow"])
+
+    def test_bad_graph(self):
+        graph = StepGraph()
+        graph.add_step("a", lambda results: 1, depends_on=["not_a_step"])
+        with self.assertRaises(ValueError) as cm:
+            graph.run()
+        self.assertIn("unknown step", str(cm.exception))
+
+        graph = StepGraph()
+        graph.add_step("a", lambda results: 1, depends_on=["b"])
+        graph.add_step("b", lambda results: 1, depends_on=["a"])
+        with self.assertRaises(ValueError) as cm:
+            graph.run()
+        self.assertIn("circular dependencies", str(cm.exception))
+
+        with self.assertRaises(ValueError) as cm:
+            graph.add_step("a", lambda results: 1)
+        self.assertIn("already added", str(cm.exception))
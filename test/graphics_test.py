@@ -0,0 +1,31 @@
+import os
+import unittest
+import util
+from matplotlib import pyplot as plt
+from jgi_mg_assembly.utils.graphics import generate_graphics
+from jgi_mg_assembly.utils.util import mkdir
+
+
+class graphics_test(unittest.TestCase):
+
+    def _check_graphics(self, name, density_threshold, workers=None):
+        cov_file = util.file_to_scratch(os.path.join("data", "covstats.txt"), overwrite=True)
+        output_dir = os.path.join(util.get_config()["scratch"], name)
+        mkdir(output_dir)
+        files = generate_graphics(cov_file, output_dir, density_threshold=density_threshold, workers=workers)
+        self.assertEqual(sorted(files.keys()), ["avg_fold_vs_len", "gc_hist", "gc_vs_avg_fold"])
+        for f in files.values():
+            self.assertTrue(os.path.isfile(f))
+            self.assertEqual(os.path.dirname(f), output_dir)
+
+    def test_scatter(self):
+        self._check_graphics("graphics_scatter", 1000)
+
+    def test_in_process(self):
+        self._check_graphics("graphics_in_process", 1000, workers=1)
+        # every figure gets closed once it's saved
+        self.assertEqual(plt.get_fignums(), [])
+
+    def test_density(self):
+        # two contigs is over the threshold, so the scatter plots get binned
+        self._check_graphics("graphics_density", 1, workers=3)
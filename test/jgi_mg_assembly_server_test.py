@@ -38,6 +38,9 @@ class jgi_mg_assemblyTest(unittest.TestCase):
         cls.callback_url = os.environ['SDK_CALLBACK_URL']
         cls.reads_upa = util.load_pe_reads(os.path.join("data", "small.forward.fq"),
                                            os.path.join("data", "small.reverse.fq"))
+        cls.reads_upa2 = util.load_pe_reads(os.path.join("data", "small.forward.fq"),
+                                            os.path.join("data", "small.reverse.fq"),
+                                            name="MyOtherPairedEndLibrary")
 
     @classmethod
     def tearDownClass(cls):
@@ -92,6 +95,31 @@ class jgi_mg_assemblyTest(unittest.TestCase):
         self.assertIn("cleaned_reads_upa", output)
         pprint(output)
 
+    def test_run_pipeline_multiple_reads(self):
+        output = self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
+            "reads_upa": self.reads_upa,
+            "reads_upas": [self.reads_upa2],
+            "output_assembly_name": "MyCoAssembly",
+            "workspace_name": util.get_ws_name(),
+            "skip_rqcfilter": 1,
+            "debug": 1
+        })[0]
+        self.assertIn("report_name", output)
+        self.assertIn("report_ref", output)
+        self.assertIn("assembly_upa", output)
+        pprint(output)
+
+    def test_run_pipeline_default_reads_upas(self):
+        # the app's default for reads_upas is [""]
+        output = self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
+            "reads_upa": self.reads_upa,
+            "reads_upas": [""],
+            "output_assembly_name": "MyAssemblyWithDefaults",
+            "workspace_name": util.get_ws_name(),
+            "skip_rqcfilter": 1
+        })[0]
+        self.assertIn("assembly_upa", output)
+
     def test_run_pipeline_missing_inputs(self):
         with self.assertRaises(ValueError):
             self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
@@ -99,6 +127,24 @@ class jgi_mg_assemblyTest(unittest.TestCase):
                 "output_assembly_name": "MyNewAssembly",
                 "workspace_name": util.get_ws_name()
             })
+        with self.assertRaises(ValueError):
+            self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
+                "reads_upas": [],
+                "output_assembly_name": "MyNewAssembly",
+                "workspace_name": util.get_ws_name()
+            })
+        with self.assertRaises(ValueError):
+            self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
+                "reads_upas": [""],
+                "output_assembly_name": "MyNewAssembly",
+                "workspace_name": util.get_ws_name()
+            })
+        with self.assertRaises(ValueError):
+            self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
+                "reads_upas": self.reads_upa,
+                "output_assembly_name": "MyNewAssembly",
+                "workspace_name": util.get_ws_name()
+            })
         with self.assertRaises(ValueError):
             self.getImpl().run_mg_assembly_pipeline(self.getContext(), {
                 "reads_upa": self.reads_upa,
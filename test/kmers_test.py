@@ -0,0 +1,107 @@
+import gzip
+import os
+import unittest
+import numpy as np
+import util
+from jgi_mg_assembly.utils.kmers import (
+    HyperLogLog,
+    count_kmers,
+    kmer_hashes
+)
+
+
+def _random_reads(num_reads, length, seed=1):
+    rng = np.random.RandomState(seed)
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    return [bases[rng.randint(0, 4, length)].tobytes() for _ in range(num_reads)]
+
+
+def _reverse_complement(sequence):
+    return sequence[::-1].translate(bytes.maketrans(b"ACGT", b"TGCA"))
+
+
+def _distinct_kmers(reads, k):
+    kmers = set()
+    for read in reads:
+        for i in range(len(read) - k + 1):
+            kmer = read[i:i + k]
+            if b"N" not in kmer:
+                kmers.add(min(kmer, _reverse_complement(kmer)))
+    return kmers
+
+
+class kmers_test(unittest.TestCase):
+
+    def test_kmer_hashes(self):
+        # 3 k-mers, canonical - so the same for the reverse complement, just in the opposite order
+        hashes = kmer_hashes([b"ACGTA"], 3)
+        self.assertEqual(len(hashes), 3)
+        self.assertEqual(list(hashes), list(kmer_hashes([_reverse_complement(b"ACGTA")], 3))[::-1])
+        self.assertEqual(list(hashes), list(kmer_hashes([b"acgta"], 3)))
+        # k-mers with an N, or spanning two reads, are left out
+        self.assertEqual(len(kmer_hashes([b"ACGNACGTT", b"AC"], 3)), 4)
+        self.assertEqual(len(kmer_hashes([b"AC"], 3)), 0)
+        self.assertEqual(len(kmer_hashes([], 3)), 0)
+        with self.assertRaises(ValueError):
+            kmer_hashes([b"ACGT"], 0)
+
+    def test_long_kmer_hashes(self):
+        # k-mers longer than 32 bases get hashed from several packed words
+        reads = _random_reads(40, 200) + [b"ACGTN" * 40]
+        for k in [32, 33, 64, 77, 127]:
+            hashes = kmer_hashes(reads, k)
+            distinct = _distinct_kmers(reads, k)
+            self.assertEqual(len(set(hashes.tolist())), len(distinct))
+            reverse = kmer_hashes([_reverse_complement(r) for r in reads], k)
+            self.assertEqual(sorted(hashes.tolist()), sorted(reverse.tolist()))
+
+    def test_estimate(self):
+        reads = _random_reads(20000, 150)
+        exact = len(np.unique(kmer_hashes(reads)))
+        hll = HyperLogLog()
+        hll.add_sequences(reads)
+        self.assertEqual(hll.kmers, 20000 * 120)
+        self.assertAlmostEqual(hll.estimate() / float(exact), 1, delta=0.03)
+        # adding the same k-mers again, from either strand, doesn't change anything
+        estimate = hll.estimate()
+        hll.add_sequences([_reverse_complement(r) for r in reads[:1000]])
+        self.assertEqual(hll.estimate(), estimate)
+
+        small = HyperLogLog()
+        small.add_sequences(reads[:10])
+        self.assertAlmostEqual(small.estimate(), 1200, delta=12)
+        self.assertEqual(HyperLogLog().estimate(), 0)
+
+    def test_merge(self):
+        reads = _random_reads(4000, 100)
+        first = HyperLogLog()
+        first.add_sequences(reads[:2000])
+        second = HyperLogLog()
+        second.add_sequences(reads[2000:])
+        both = HyperLogLog()
+        both.add_sequences(reads)
+        merged = first.copy()
+        merged.merge(second)
+        self.assertEqual(merged.estimate(), both.estimate())
+        self.assertNotEqual(first.estimate(), both.estimate())
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(k=21))
+
+    def test_count_kmers(self):
+        # reads from a 20 kb "genome", so most of the k-mers are seen more than once
+        rng = np.random.RandomState(2)
+        genome = np.frombuffer(b"ACGT", dtype=np.uint8)[rng.randint(0, 4, 20000)].tobytes()
+        reads = list()
+        for start in rng.randint(0, len(genome) - 150, 3000):
+            read = genome[start:start + 150]
+            reads.append(read if len(reads) % 2 else _reverse_complement(read))
+        reads_file = os.path.join(util.get_config()["scratch"], "count_kmers_test.fq.gz")
+        with gzip.open(reads_file, "wb") as f:
+            for (i, read) in enumerate(reads):
+                f.write(b"@read_%d\n%s\n+\n%s\n" % (i, read, b"I" * len(read)))
+        counts = count_kmers(reads_file, ks=[21, 55, 127], threads=3)
+        self.assertEqual(sorted(counts.keys()), [21, 55, 127])
+        for k in [21, 55, 127]:
+            exact = len(_distinct_kmers(reads, k))
+            self.assertAlmostEqual(counts[k] / float(exact), 1, delta=0.03)
+        self.assertEqual(count_kmers(reads_file, ks=[55], threads=1)[55], counts[55])
@@ -0,0 +1,67 @@
+import os
+import shutil
+import unittest
+import util
+from jgi_mg_assembly.runner.manifest import (
+    StepManifest,
+    run_key
+)
+
+
+class manifest_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch_dir = util.get_config()["scratch"]
+
+    def setUp(self):
+        self.output_dir = os.path.join(self.scratch_dir, "manifest_test")
+        if os.path.exists(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.makedirs(self.output_dir)
+        self.input_file = os.path.join(self.output_dir, "input.txt")
+        self.output_file = os.path.join(self.output_dir, "output.txt")
+        with open(self.input_file, "w") as f:
+            f.write("some input")
+        with open(self.output_file, "w") as f:
+            f.write("some output")
+
+    def test_run_key(self):
+        key = run_key("1/2/3", {"debug": True})
+        self.assertEqual(key, run_key("1/2/3", {"debug": True}))
+        self.assertNotEqual(key, run_key("1/2/4", {"debug": True}))
+        self.assertNotEqual(key, run_key("1/2/3", {"debug": False}))
+
+    def test_resume_completed_step(self):
+        manifest = StepManifest(self.output_dir, "key")
+        manifest.start("step", [self.input_file])
+        manifest.complete("step", {"output_file": self.output_file, "count": 5})
+
+        reloaded = StepManifest(self.output_dir, "key")
+        self.assertEqual(reloaded.completed_output("step", [self.input_file]),
+                         {"output_file": self.output_file, "count": 5})
+        self.assertIsNone(reloaded.completed_output("other_step", [self.input_file]))
+
+    def test_no_resume_on_different_key(self):
+        manifest = StepManifest(self.output_dir, "key")
+        manifest.start("step", [self.input_file])
+        manifest.complete("step", {"output_file": self.output_file})
+        self.assertIsNone(StepManifest(self.output_dir, "other_key").completed_output("step", [self.input_file]))
+
+    def test_no_resume_on_changed_files(self):
+        manifest = StepManifest(self.output_dir, "key")
+        manifest.start("step", [self.input_file])
+        manifest.complete("step", {"output_file": self.output_file})
+        with open(self.input_file, "a") as f:
+            f.write(" that changed")
+        self.assertIsNone(manifest.completed_output("step", [self.input_file]))
+
+        manifest.start("step", [self.input_file])
+        manifest.complete("step", {"output_file": self.output_file})
+        os.remove(self.output_file)
+        self.assertIsNone(manifest.completed_output("step", [self.input_file]))
+
+    def test_no_resume_on_failed_step(self):
+        manifest = StepManifest(self.output_dir, "key")
+        manifest.start("step", [self.input_file])
+        manifest.fail("step", "it broke")
+        self.assertIsNone(StepManifest(self.output_dir, "key").completed_output("step", [self.input_file]))
@@ -0,0 +1,72 @@
+import gzip
+import os
+import unittest
+import numpy as np
+import util
+from kmers_test import (
+    _distinct_kmers,
+    _reverse_complement
+)
+from jgi_mg_assembly.pipeline_steps.spades import SPADES_KMERS
+from jgi_mg_assembly.runner.pipeline import Pipeline
+from jgi_mg_assembly.utils.kmers import assembly_memory_gb
+
+
+class pipeline_test(unittest.TestCase):
+
+    def _get_pipeline(self):
+        return Pipeline("http://localhost:5000", util.get_config()["scratch"])
+
+    def test_get_reads_upas(self):
+        pipeline = self._get_pipeline()
+        self.assertEqual(pipeline._get_reads_upas({"reads_upa": "1/2/3", "reads_upas": [""]}), ["1/2/3"])
+        self.assertEqual(pipeline._get_reads_upas({"reads_upa": "1/2/3", "reads_upas": ["", "1/3/1", "1/2/3"]}),
+                         ["1/2/3", "1/3/1"])
+        self.assertEqual(pipeline._get_reads_upas({"reads_upa": "", "reads_upas": ["1/3/1"]}), ["1/3/1"])
+        self.assertEqual(pipeline._get_reads_upas({"reads_upas": [""]}), [])
+
+    def test_validate_reads_upas(self):
+        pipeline = self._get_pipeline()
+        params = {"output_assembly_name": "MyNewAssembly", "workspace_name": "some_ws"}
+        pipeline._validate_params(dict(params, reads_upa="1/2/3", reads_upas=[""]))
+        with self.assertRaises(ValueError) as cm:
+            pipeline._validate_params(dict(params, reads_upas=[""]))
+        self.assertIn("Missing a Reads object!", str(cm.exception))
+        with self.assertRaises(ValueError) as cm:
+            pipeline._validate_params(dict(params, reads_upas="1/2/3"))
+        self.assertIn("must be a list", str(cm.exception))
+
+    def test_check_memory_use(self):
+        # reads from a 20 kb "genome", so the distinct k-mers can be counted exactly
+        rng = np.random.RandomState(3)
+        genome = np.frombuffer(b"ACGT", dtype=np.uint8)[rng.randint(0, 4, 20000)].tobytes()
+        reads = list()
+        for start in rng.randint(0, len(genome) - 150, 3000):
+            read = genome[start:start + 150]
+            reads.append(read if len(reads) % 2 else _reverse_complement(read))
+        reads_file = os.path.join(util.get_config()["scratch"], "check_memory_use_test.fq.gz")
+        with gzip.open(reads_file, "wb") as f:
+            for (i, read) in enumerate(reads):
+                f.write(b"@read_%d\n%s\n+\n%s\n" % (i, read, b"I" * len(read)))
+        pipeline = self._get_pipeline()
+        mem_estimate = pipeline._check_memory_use(reads_file, max_memory=1, threads=2)
+        exact = dict((str(k), len(_distinct_kmers(reads, k))) for k in SPADES_KMERS)
+        self.assertEqual(sorted(mem_estimate["kmer_counts"].keys()), sorted(exact.keys()))
+        for k in exact:
+            self.assertAlmostEqual(mem_estimate["kmer_counts"][k] / float(exact[k]), 1, delta=0.03)
+        self.assertEqual(mem_estimate["estimate"],
+                         assembly_memory_gb(max(mem_estimate["kmer_counts"].values())))
+        self.assertAlmostEqual(mem_estimate["estimate"], assembly_memory_gb(max(exact.values())),
+                               delta=0.03 * mem_estimate["estimate"])
+        self.assertEqual(mem_estimate["size"], os.path.getsize(reads_file) / 1024.0 ** 3)
+        # the estimate is over the limit, so it's rejected
+        with self.assertRaises(RuntimeError):
+            pipeline._check_memory_use(reads_file, max_memory=mem_estimate["estimate"] / 2, threads=1)
+
+    def test_preflight(self):
+        pipeline = self._get_pipeline()
+        reads_file = os.path.join(os.path.dirname(__file__), "data", "small.inter.fq")
+        sizing = pipeline._preflight(reads_file)
+        self.assertEqual(sizing["size"], os.path.getsize(reads_file) / 1024.0 ** 3)
+        self.assertTrue(sizing["exact"])
+        self.assertGreater(sizing["bases"], 0)
@@ -0,0 +1,62 @@
+import gzip
+import os
+import unittest
+import util
+from jgi_mg_assembly.utils.kmers import count_kmers
+from jgi_mg_assembly.utils.preflight import size_reads
+
+
+class preflight_test(unittest.TestCase):
+
+    def test_size_whole_file(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        sizing = size_reads(reads_file)
+        self.assertTrue(sizing["exact"])
+        self.assertEqual(sizing["file_size"], 612500)
+        self.assertEqual(sizing["uncompressed_size"], 612500)
+        self.assertEqual(sizing["compression_ratio"], 1)
+        self.assertEqual(sizing["reads"], 2500)
+        self.assertEqual(sizing["bases"], 250000)
+        self.assertEqual(sizing["kmers"], sizing["sampled_kmers"])
+
+        gzipped_file = reads_file + ".gz"
+        with open(reads_file, "rb") as f, gzip.open(gzipped_file, "wb") as out:
+            out.write(f.read())
+        gzipped = size_reads(gzipped_file)
+        self.assertTrue(gzipped["exact"])
+        self.assertEqual(gzipped["file_size"], os.path.getsize(gzipped_file))
+        self.assertEqual(gzipped["uncompressed_size"], 612500)
+        self.assertGreater(gzipped["compression_ratio"], 1)
+        for key in ["reads", "bases", "kmers"]:
+            self.assertEqual(gzipped[key], sizing[key])
+
+    def test_size_from_sample(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        sizing = size_reads(reads_file, sample_bytes=200000)
+        self.assertFalse(sizing["exact"])
+        # the sample is cut down to whole records
+        self.assertEqual(sizing["sampled_reads"], 816)
+        self.assertEqual(sizing["sampled_bases"], 81600)
+        self.assertAlmostEqual(sizing["reads"], 2500, delta=5)
+        self.assertAlmostEqual(sizing["bases"], 250000, delta=500)
+        self.assertGreater(sizing["kmers"], sizing["sampled_kmers"])
+        self.assertLessEqual(sizing["kmer_growth"], 1)
+        # the extrapolated count leans high, but not by much more than a linear one would
+        whole = size_reads(reads_file)
+        self.assertGreaterEqual(sizing["kmers"], whole["kmers"] * 0.9)
+        self.assertLessEqual(sizing["kmers"], sizing["sampled_kmers"] * 250000 / 81600.0 * 1.01)
+
+    def test_size_for_several_ks(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        sizing = size_reads(reads_file, sample_bytes=200000, ks=[33, 77, 127])
+        self.assertEqual(sorted(sizing["kmer_counts"].keys()), ["127", "33", "77"])
+        # the reads are 100 bases long, so there aren't any 127-mers
+        self.assertEqual(sizing["kmer_counts"]["127"], 0)
+        self.assertGreater(sizing["kmer_counts"]["33"], sizing["kmer_counts"]["77"])
+        self.assertEqual(sizing["k"], 33)
+        self.assertEqual(sizing["kmers"], sizing["kmer_counts"]["33"])
+        # the extrapolated counts lean high compared to counting the whole file, but not by much
+        counted = count_kmers(reads_file, ks=[33, 77])
+        for k in [33, 77]:
+            self.assertGreaterEqual(sizing["kmer_counts"][str(k)], counted[k] * 0.9)
+            self.assertLessEqual(sizing["kmer_counts"][str(k)], counted[k] * 1.5)
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+import util
+from jgi_mg_assembly.utils.profiler import (
+    ProcessProfiler,
+    combine_profiles
+)
+
+
+class profiler_test(unittest.TestCase):
+
+    def test_profile_process_tree(self):
+        # a parent that starts a child which holds ~100MB and burns some CPU
+        child = "x = bytearray(100 * 1024 * 1024); import time; t = time.time()\nwhile time.time() - t < 0.6: pass"
+        parent = "import subprocess, sys; subprocess.check_call([sys.executable, '-c', {}])".format(repr(child))
+        p = subprocess.Popen([sys.executable, "-c", parent])
+        profiler = ProcessProfiler(p.pid, interval=0.1)
+        profiler.start()
+        self.assertEqual(profiler.wait(p), 0)
+        profile = profiler.stop()
+        self.assertEqual(p.returncode, 0)
+        self.assertGreaterEqual(profile["processes"], 2)
+        self.assertGreater(profile["peak_rss"], 100 * 1024 * 1024)
+        self.assertGreater(profile["cpu_time"], 0.3)
+        self.assertGreaterEqual(profile["wall_time"], 0.6)
+
+    def test_totals_between_samples(self):
+        # the child burns CPU and writes a file, then exits, all before the first sample
+        child = "import os, time; t = time.time()\nwhile time.time() - t < 0.5: pass\n" + \
+                "f = open({}, 'wb'); f.write(os.urandom(4 * 1024 * 1024)); f.flush(); os.fsync(f.fileno())".format(
+                    repr(os.path.join(util.get_config()["scratch"], "profiler_test.bin")))
+        parent = "import subprocess, sys; subprocess.check_call([sys.executable, '-c', {}]); sys.exit(3)".format(repr(child))
+        p = subprocess.Popen([sys.executable, "-c", parent])
+        profiler = ProcessProfiler(p.pid, interval=30)
+        profiler.start()
+        self.assertEqual(profiler.wait(p), 3)
+        self.assertEqual(p.wait(), 3)
+        profile = profiler.stop()
+        self.assertGreater(profile["cpu_time"], 0.4)
+        self.assertGreaterEqual(profile["write_bytes"], 4 * 1024 * 1024)
+
+    def test_combine_profiles(self):
+        self.assertIsNone(combine_profiles([]))
+        profiles = [
+            {"wall_time": 1.5, "cpu_time": 3.0, "peak_rss": 100, "read_bytes": 10, "write_bytes": 20, "processes": 1},
+            {"wall_time": 2.5, "cpu_time": 1.0, "peak_rss": 300, "read_bytes": 5, "write_bytes": 0, "processes": 2}
+        ]
+        self.assertEqual(combine_profiles(profiles), {
+            "wall_time": 4.0, "cpu_time": 4.0, "peak_rss": 300, "read_bytes": 15, "write_bytes": 20, "processes": 3
+        })
@@ -1,7 +1,12 @@
 import unittest
 import os
+import gzip
+import shutil
 import util
-from jgi_mg_assembly.pipeline_steps.readlength import ReadLengthRunner
+from jgi_mg_assembly.pipeline_steps.readlength import (
+    ReadLengthRunner,
+    READLENGTH_VERSION
+)
 
 class TestReadlength(unittest.TestCase):
     def test_readlength(self):
@@ -19,5 +24,27 @@ class TestReadlength(unittest.TestCase):
         self.assertEqual(reads_info["mode"], 100)
         self.assertEqual(reads_info["std_dev"], 0.0)
         self.assertTrue(os.path.exists(reads_info["output_file"]))
-        self.assertIn("readlength.sh", reads_info["command"])
-        self.assertIn("BBTools", reads_info["version_string"])
\ No newline at end of file
+        self.assertIn("read_length_stats", reads_info["command"])
+        self.assertIn("BBTools", reads_info["version_string"])
+        self.assertEqual(readlength.version_string(), READLENGTH_VERSION)
+        self.assertEqual(reads_info["version_string"], READLENGTH_VERSION)
+
+    def test_readlength_gzipped(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        gz_reads_file = reads_file + ".gz"
+        with open(reads_file, "rb") as f_in, gzip.open(gz_reads_file, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        readlength = ReadLengthRunner(util.get_config()["scratch"], util.get_config()["scratch"])
+        reads_info = readlength.run(reads_file, "plain_reads_info_file.txt")
+        gz_reads_info = readlength.run(gz_reads_file, "gz_reads_info_file.txt")
+        self.assertEqual(reads_info["count"], 2500)
+        for key in ["count", "bases", "max", "min", "avg", "median", "mode", "std_dev"]:
+            self.assertEqual(reads_info[key], gz_reads_info[key])
+        with open(reads_info["output_file"]) as f1, open(gz_reads_info["output_file"]) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_readlength_missing_file(self):
+        readlength = ReadLengthRunner(util.get_config()["scratch"], util.get_config()["scratch"])
+        with self.assertRaises(ValueError) as cm:
+            readlength.run("not_a_file", "reads_info_file.txt")
+        self.assertIn("can't be found", str(cm.exception))
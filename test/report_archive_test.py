@@ -0,0 +1,57 @@
+import gzip
+import os
+import unittest
+import zipfile
+import util
+from jgi_mg_assembly.utils.report_archive import ReportArchive
+
+
+class report_archive_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch_dir = util.get_config()["scratch"]
+
+    def _write(self, name, contents):
+        path = os.path.join(self.scratch_dir, name)
+        with open(path, "wb") as f:
+            f.write(contents)
+        return path
+
+    def test_step_outputs(self):
+        run_log = self._write("archive_spades.log", b"assembling\n" * 1000)
+        params_log = self._write("archive_params.txt", b"-k 33,55,77\n")
+        coverage = self._write("archive_covstats.txt.gz", gzip.compress(b"#ID\tAvg_fold\n" * 100))
+        zip_file = os.path.join(self.scratch_dir, "archive_test.zip")
+        archive = ReportArchive(zip_file, compresslevel=1)
+        archive.add_step_output("spades", {
+            "run_log": run_log,
+            "params_log": params_log,
+            "warnings_log": os.path.join(self.scratch_dir, "not_a_file.log"),
+            "command": "spades.py"
+        })
+        archive.add_step_output("bbmap", {"coverage_file": coverage})
+        # already added, so these are skipped
+        archive.add_step_output("spades", {"run_log": run_log})
+        archive.add_file(params_log, "spades/archive_params.txt")
+        archive.add_file(params_log, "pipeline_info.json")
+        self.assertEqual(archive.close(), zip_file)
+
+        with zipfile.ZipFile(zip_file) as z:
+            self.assertEqual(sorted(z.namelist()), [
+                "bbmap/archive_covstats.txt.gz",
+                "pipeline_info.json",
+                "spades/archive_params.txt",
+                "spades/archive_spades.log"
+            ])
+            self.assertEqual(z.getinfo("spades/archive_spades.log").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(z.getinfo("bbmap/archive_covstats.txt.gz").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(z.read("spades/archive_spades.log"), b"assembling\n" * 1000)
+            self.assertIsNone(z.testzip())
+
+    def test_closed(self):
+        archive = ReportArchive(os.path.join(self.scratch_dir, "archive_closed.zip"))
+        archive.close()
+        # closing again is fine, adding more isn't
+        archive.close()
+        with self.assertRaises(ValueError):
+            archive.add_file(os.path.join(self.scratch_dir, "archive_closed.zip"), "again.zip")
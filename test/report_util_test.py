@@ -69,6 +69,7 @@ class report_util_test(unittest.TestCase):
             },
             "bfc": {
                 "command": "bfc command",
+                "parameters": "-1 -k 21 -t 10",
                 "version_string": "bfc version"
             },
             "seqtk": {
@@ -90,6 +91,73 @@ class report_util_test(unittest.TestCase):
         self.assertIn('report_ref', report_info)
         self.assertIn('report_name', report_info)
 
+    def test_prepare_and_upload_report_ok(self):
+        ru = self._get_report_util()
+        prepared_report = ru.prepare_report(self._pipeline_output())
+        self.assertIn("html_links", prepared_report)
+        self.assertIn("file_links", prepared_report)
+        self.assertIn("shock_id", prepared_report["file_links"][0])
+        report_info = ru.upload_report(prepared_report, util.get_ws_name(), [])
+        self.assertIn('report_ref', report_info)
+        self.assertIn('report_name', report_info)
+
+        with self.assertRaises(AssertionError) as err:
+            ru.upload_report(prepared_report, None, [])
+        self.assertIn("A workspace name is required", str(err.exception))
+
+    def _pipeline_output(self):
+        return {
+            "bbmap": {
+                "stats_file": self.bbmap_stats_file,
+                "coverage_file": self.cov_stats,
+                "command": "bbmap cmd",
+                "version_string": "bbmap version"
+            },
+            "stats": {
+                "stats_txt": self.assembly_stats_file,
+                "stats_tsv": self.assembly_stats_tsv,
+                "command": "stats command",
+                "version_string": "stats version"
+            },
+            "rqcfilter": {
+                "run_log": self.rqcfilter_log,
+                "command": "rqcfilter command",
+                "version_string": "rqcfilter version"
+            },
+            "reads_info_prefiltered": {
+                "count": 10000,
+                "command": "reads_info_prefiltered command",
+                "version_string": "reads info version"
+            },
+            "reads_info_filtered": {
+                "count": 8000,
+                "command": "reads_info_filtered command",
+                "version_string": "reads info version"
+            },
+            "reads_info_corrected": {
+                "count": 7000,
+                "command": "reads_info_corrected command",
+                "version_string": "reads info version"
+            },
+            "bfc": {
+                "command": "bfc command",
+                "parameters": "-1 -k 21 -t 10",
+                "version_string": "bfc version"
+            },
+            "seqtk": {
+                "command": "seqtk command",
+                "version_string": "seqtk verseion"
+            },
+            "spades": {
+                "command": "spades command",
+                "version_string": "spades version"
+            },
+            "agp": {
+                "command": "agp command",
+                "version_string": "agp version"
+            },
+        }
+
     def test_make_report_bad_inputs(self):
         pipeline_output = {
             "bbmap": {
@@ -126,6 +194,7 @@ class report_util_test(unittest.TestCase):
             },
             "bfc": {
                 "command": "bfc command",
+                "parameters": "-1 -k 21 -t 10",
                 "version_string": "bfc version"
             },
             "seqtk": {
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from jgi_mg_assembly.utils.resources import (
+    ResourcePlan,
+    cgroup_cpu_limit,
+    cgroup_memory_limit,
+    available_memory_gb
+)
+
+
+class resources_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cgroup_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cgroup_root)
+
+    def _write(self, path, contents):
+        path = os.path.join(self.cgroup_root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def test_no_cgroup_limits(self):
+        self.assertIsNone(cgroup_cpu_limit(self.cgroup_root))
+        self.assertIsNone(cgroup_memory_limit(self.cgroup_root))
+
+    def test_cgroup_v2_limits(self):
+        self._write("cpu.max", "max 100000\n")
+        self._write("memory.max", "max\n")
+        self.assertIsNone(cgroup_cpu_limit(self.cgroup_root))
+        self.assertIsNone(cgroup_memory_limit(self.cgroup_root))
+
+        self._write("cpu.max", "1600000 100000\n")
+        self._write("memory.max", "{}\n".format(64 * 1024 ** 3))
+        self.assertEqual(cgroup_cpu_limit(self.cgroup_root), 16)
+        self.assertEqual(cgroup_memory_limit(self.cgroup_root), 64 * 1024 ** 3)
+
+    def test_cgroup_v1_limits(self):
+        self._write(os.path.join("cpu", "cpu.cfs_quota_us"), "-1\n")
+        self._write(os.path.join("cpu", "cpu.cfs_period_us"), "100000\n")
+        self._write(os.path.join("memory", "memory.limit_in_bytes"), "9223372036854771712\n")
+        self.assertIsNone(cgroup_cpu_limit(self.cgroup_root))
+        self.assertIsNone(cgroup_memory_limit(self.cgroup_root))
+
+        self._write(os.path.join("cpu", "cpu.cfs_quota_us"), "800000\n")
+        self._write(os.path.join("memory", "memory.limit_in_bytes"), "{}\n".format(32 * 1024 ** 3))
+        self.assertEqual(cgroup_cpu_limit(self.cgroup_root), 8)
+        self.assertEqual(cgroup_memory_limit(self.cgroup_root), 32 * 1024 ** 3)
+
+    def test_available_memory(self):
+        meminfo = self._write("meminfo", "MemTotal:       {} kB\nMemFree:        1000 kB\n".format(128 * 1024 ** 2))
+        self.assertEqual(available_memory_gb(self.cgroup_root, meminfo), 128)
+        self._write("memory.max", "{}\n".format(48 * 1024 ** 3))
+        self.assertEqual(available_memory_gb(self.cgroup_root, meminfo), 48)
+
+    def test_large_node_plan(self):
+        plan = ResourcePlan(128, 2000, max_memory_gb=1500)
+        self.assertEqual(plan.usable_memory_gb, 1500)
+        self.assertEqual(plan.spades_threads, 128)
+        self.assertEqual(plan.spades_memory_gb, 1500)
+        self.assertEqual(plan.rqcfilter_threads, 128)
+        self.assertEqual(plan.rqcfilter_memory_gb, 1500)
+        self.assertEqual(plan.kmer_count_threads, 128)
+        self.assertEqual(plan.bfc_threads, 128)
+        self.assertEqual(plan.bfc_genome_size, "10g")
+        self.assertEqual(plan.compress_threads, 8)
+        self.assertEqual(plan.bbmap_memory_gb, 100)
+        self.assertEqual(plan.agp_memory_gb, 40)
+
+    def test_small_node_plan(self):
+        plan = ResourcePlan(4, 16)
+        self.assertEqual(plan.usable_memory_gb, 14)
+        self.assertEqual(plan.spades_threads, 4)
+        self.assertEqual(plan.bfc_genome_size, "3g")
+        self.assertEqual(plan.compress_threads, 1)
+        self.assertEqual(plan.bbmap_memory_gb, 8)
+        self.assertEqual(plan.agp_memory_gb, 4)
+        # BBMap and AGP can run at the same time, so together they have to fit.
+        self.assertLessEqual(plan.bbmap_memory_gb + plan.agp_memory_gb, plan.usable_memory_gb)
+
+        plan = plan.with_estimate(10)
+        self.assertEqual(plan.mem_estimate_gb, 10)
+        self.assertEqual(plan.to_dict()["spades_memory_gb"], 14)
+
+        # BFC's genome size is capped by the size of the input reads
+        plan = plan.with_input_bases(1.5e9)
+        self.assertEqual(plan.bfc_genome_size, "2g")
+        self.assertEqual(plan.with_estimate(12).to_dict()["input_bases"], 1.5e9)
+        self.assertEqual(plan.with_input_bases(100).bfc_genome_size, "1g")
+
+    def test_estimate_sizes_spades(self):
+        plan = ResourcePlan(128, 2000, max_memory_gb=1500)
+        self.assertEqual(plan.spades_memory_gb, 1500)
+        # the estimate doesn't change what SPAdes gets, it only fails the job early
+        self.assertEqual(plan.with_estimate(100).spades_memory_gb, 1500)
+        self.assertEqual(plan.with_estimate(0.2).to_dict()["spades_memory_gb"], 1500)
+        plan.with_estimate(1500).check_estimate()
+        with self.assertRaises(RuntimeError) as cm:
+            plan.with_estimate(1600).check_estimate()
+        self.assertIn("1600 GB", str(cm.exception))
@@ -0,0 +1,75 @@
+import gzip
+import os
+import stat
+import unittest
+import util
+from jgi_mg_assembly.pipeline_steps.rqcfilter import RQCFilterRunner
+
+# Stands in for rqcfilter2.sh - gzips the input reads into path/out, and logs its arguments.
+FAKE_RQCFILTER = """#!/bin/sh
+for arg in "$@"; do
+    case $arg in
+        in=*) reads=${arg#in=} ;;
+        path=*) path=${arg#path=} ;;
+        out=*) out=${arg#out=} ;;
+    esac
+done
+echo "rqcfilter2.sh $@" >&2
+gzip -c "$reads" > "$path/$out"
+"""
+
+
+class rqcfilter_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch_dir = util.get_config()["scratch"]
+        cls.fake_rqcfilter = os.path.join(cls.scratch_dir, "fake_rqcfilter2.sh")
+        with open(cls.fake_rqcfilter, "w") as f:
+            f.write(FAKE_RQCFILTER)
+        os.chmod(cls.fake_rqcfilter, os.stat(cls.fake_rqcfilter).st_mode | stat.S_IXUSR)
+
+    def _runner(self, name, **kwargs):
+        output_dir = os.path.join(self.scratch_dir, name)
+        runner = RQCFilterRunner(None, self.scratch_dir, output_dir, {}, local=True, **kwargs)
+        runner.base_command = self.fake_rqcfilter
+        return runner
+
+    def test_run_local(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        runner = self._runner("rqcfilter_local", rqcfilter_data="/data/RQCFilterData", threads=4, max_memory_gb=64)
+        result = runner.run(reads_file)
+        self.assertEqual(result["output_directory"], os.path.join(self.scratch_dir, "rqcfilter_local", "rqcfilter"))
+        self.assertEqual(os.path.dirname(result["filtered_fastq_file"]), result["output_directory"])
+        with gzip.open(result["filtered_fastq_file"], "rb") as filtered, open(reads_file, "rb") as reads:
+            self.assertEqual(filtered.read(), reads.read())
+        with open(result["run_log"]) as log:
+            self.assertTrue(log.read().startswith("rqcfilter2.sh -Xmx64g jni=t in={}".format(reads_file)))
+        for param in ["threads=4", "rqcfilterdata=/data/RQCFilterData", "minlength=51", "removehuman=1"]:
+            self.assertIn(" {} ".format(param), result["command"])
+        self.assertNotIn("maxmem", result["command"])
+        self.assertIn("resource_profile", result)
+
+    def test_run_local_max_memory(self):
+        # never more than the maxmem parameter, and no threads or data path unless they're given
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        result = self._runner("rqcfilter_local_mem", max_memory_gb=2000).run(reads_file)
+        self.assertIn(" -Xmx500g ", result["command"])
+        self.assertNotIn("threads=", result["command"])
+        self.assertNotIn("rqcfilterdata=", result["command"])
+
+    def test_run_local_fail(self):
+        runner = self._runner("rqcfilter_local_fail")
+        runner.base_command = "false"
+        with self.assertRaises(RuntimeError):
+            runner.run(os.path.join(self.scratch_dir, "not_reads.fq"))
+
+    def test_run_skip(self):
+        reads_file = util.file_to_scratch(os.path.join("data", "small.inter.fq"), overwrite=True)
+        runner = RQCFilterRunner(None, self.scratch_dir, os.path.join(self.scratch_dir, "rqcfilter_skip"),
+                                 {"skip_rqcfilter": True})
+        result = runner.run(reads_file)
+        # the reads are linked as they are, not compressed or copied
+        self.assertTrue(os.path.samefile(result["filtered_fastq_file"], reads_file))
+        self.assertEqual(os.path.basename(result["filtered_fastq_file"]), "small.inter.fq")
+        self.assertEqual(os.path.getsize(result["run_log"]), 0)
+        self.assertIn("skipped", result["command"])
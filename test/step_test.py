@@ -1,3 +1,4 @@
+import io
 import unittest
 from jgi_mg_assembly.pipeline_steps.step import Step
 import util
@@ -31,4 +32,54 @@ class StepTest(unittest.TestCase):
             (exit_code, command) = mystep.run()
         self.assertIn("Successfully ran {}".format(name), out.getvalue())
         self.assertEqual(exit_code, 0)
-        self.assertEqual("ls", command)
\ No newline at end of file
+        self.assertEqual("ls", command)
+
+    def test_step_streaming(self):
+        mystep = Step("Just cat", "cat", "cat", util.get_config()["scratch"], "output_dir", False)
+        source = io.BytesIO(b"some data\n" * 1000)
+        sink = io.BytesIO()
+        with util.captured_stdout() as (out, err):
+            (exit_code, command) = mystep.run_streaming("-", stdin=source, stdout=sink)
+        self.assertIn("Successfully ran Just cat", out.getvalue())
+        self.assertEqual(exit_code, 0)
+        self.assertEqual("cat -", command)
+        self.assertEqual(sink.getvalue(), b"some data\n" * 1000)
+
+    def test_step_piped(self):
+        first = Step("Just printf", "printf", "printf", util.get_config()["scratch"], "output_dir", False)
+        second = Step("Just cat", "cat", "cat", util.get_config()["scratch"], "output_dir", False)
+        sink = io.BytesIO()
+        with util.captured_stdout() as (out, err):
+            process = first.start("some data\\n")
+            (exit_code, command) = second.run_streaming("-", stdin=process, stdout=sink)
+            (first_exit_code, first_command) = first.finish(process)
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(first_exit_code, 0)
+        self.assertEqual(first_command, "printf some data\\n")
+        self.assertEqual(sink.getvalue(), b"some data\n")
+        self.assertEqual(len(first.profiles), 1)
+        self.assertEqual(len(second.profiles), 1)
+
+    def test_step_streaming_bad_fn(self):
+        mystep = Step("Foo", "Bar", "foo", util.get_config()["scratch"], "output_dir", False)
+        with util.captured_stdout() as (out, err):
+            (exit_code, command) = mystep.run_streaming("flag1", stdout=io.BytesIO())
+        self.assertIn("raised an OSError", out.getvalue())
+        self.assertNotEqual(exit_code, 0)
+
+    def test_step_resource_profile(self):
+        mystep = Step("Busy python", "python", "python3", util.get_config()["scratch"], "output_dir", False)
+        self.assertIsNone(mystep.resource_profile())
+        script = "x = bytearray(50 * 1024 * 1024); sum(range(3000000))"
+        with util.captured_stdout() as (out, err):
+            (exit_code, command) = mystep.run("-c", script)
+            mystep.run("-c", "pass")
+        self.assertEqual(exit_code, 0)
+        self.assertIn("Pipeline step Busy python resource use", out.getvalue())
+        self.assertEqual(len(mystep.profiles), 2)
+        profile = mystep.resource_profile()
+        for key in ["wall_time", "cpu_time", "peak_rss", "read_bytes", "write_bytes", "processes"]:
+            self.assertIn(key, profile)
+        self.assertGreater(profile["wall_time"], 0)
+        self.assertEqual(profile["wall_time"], round(mystep.profiles[0]["wall_time"] + mystep.profiles[1]["wall_time"], 3))
+        self.assertEqual(profile["peak_rss"], max(p["peak_rss"] for p in mystep.profiles))
@@ -91,7 +91,7 @@ def file_to_scratch(source_file, overwrite=False):
     return scratch_file_path
 
 
-def load_pe_reads(fwd_file, rev_file):
+def load_pe_reads(fwd_file, rev_file, name='MyPairedEndLibrary'):
     """
     Copies from given dir to scratch. Then calls ReadsUtils to upload from scratch.
     """
@@ -104,7 +104,7 @@ def load_pe_reads(fwd_file, rev_file):
         'rev_file': rev_file_path,
         'sequencing_tech': 'Illumina',
         'wsname': get_ws_name(),
-        'name': 'MyPairedEndLibrary'
+        'name': name
     }
     return ru.upload_reads(pe_reads_params)['obj_ref']
 
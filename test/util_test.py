@@ -2,6 +2,7 @@ import os
 import unittest
 from jgi_mg_assembly.utils.util import (
     mkdir,
+    link_file,
     file_to_log
 )
 import util
@@ -36,3 +37,17 @@ class util_test(unittest.TestCase):
         with self.assertRaises(ValueError) as e:
             file_to_log("not_a_path")
         self.assertIn("File path does not exist", str(e.exception))
+
+    def test_link_file(self):
+        src = util.file_to_scratch(os.path.join("data", "dummy_log.txt"), overwrite=True)
+        dest = os.path.join(os.path.dirname(src), "linked_dummy_log.txt")
+        # a link left over from an earlier run would be the same file as src
+        if os.path.exists(dest):
+            os.remove(dest)
+        with open(dest, "w") as f:
+            f.write("this gets replaced")
+        link_file(src, dest)
+        # the same file, not a copy
+        self.assertTrue(os.path.samefile(src, dest))
+        with open(dest) as f:
+            self.assertEqual(f.read().strip(), "I am a log.")